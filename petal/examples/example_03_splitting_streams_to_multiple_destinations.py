@@ -15,10 +15,9 @@ def main():
         # This is a Splitter operator
         # It will receive a single input stream and will copy it to N output streams
         splitter = Splitter("split")
-        # Under the hood, it uses a deepcopy of the stream - but if you have many output streams
-        # and know that the consumers of the streams won't be mutating the data, you can implement
-        # a custom Splitter that just propagates the input stream without copying it.
-        # That's the beauty of Petal - easy extensibility!
+        # By default, it uses a deepcopy of the stream - but if you have many output streams
+        # and know that the consumers of the streams won't be mutating the data, you can pass
+        # ownership="immutable" (to the Splitter or the whole Pipeline) to share records without copying them.
 
         # To demonstrate the 2 branches of the ETL, we'll apply different transformations to each branch
         # For the first branch, we'll filter for INFO lines just like in example_02
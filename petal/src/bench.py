@@ -0,0 +1,279 @@
+"""
+Benchmarks of representative pipeline shapes against each execution mode, run with `petal bench`.
+
+Every case reads synthetic log files totalling `records` lines and writes its outputs to files,
+and reports its throughput (input records/sec), the latency until the first record reaches a sink,
+and the peak RSS. Results are stored as JSON, and a previous result file can be compared against.
+"""
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from petal.src.logger import configure, logger
+from petal.src.core.memory import current_rss
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FileReader import FileReader
+from petal.src.plugins.FileWriter import FileWriter
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import RegexMapper
+from petal.src.plugins.Splitter import Splitter
+from petal.src.plugins.StreamJoiner import StreamJoiner
+
+IP_PATTERN = r"(?:[0-9]{1,3}\.){3}[0-9]{1,3}"
+BENCH_MODES = ("batch", "streaming", "threaded", "async")
+
+
+def generate_input(file_path: str, records: int, record_width: int = 80, seed: int = 0) -> None:
+    """
+    Writes `records` synthetic log lines of `record_width` characters (plus the newline),
+    a mix of INFO/WARN application logs and PING/HELO VM events.
+    """
+    rng = random.Random(seed)
+    kinds = ("INFO", "WARN", "PING", "HELO")
+    with open(file_path, 'w') as f:
+        for idx in range(records):
+            ip = ".".join(str(rng.randrange(256)) for _ in range(3))
+            f.write(f"{rng.choice(kinds)} from 10.{ip} #{idx} ".ljust(record_width, 'x') + "\n")
+
+
+class TimedWriter(FileWriter):
+    """A FileWriter recording when its first record arrives."""
+
+    def __init__(self, operator_id: str, file_path: str):
+        super().__init__(operator_id, file_path)
+        self.first_output: Optional[float] = None
+
+    def _timed(self, data: Iterable[Any]) -> Iterable[Any]:
+        for item in data:
+            if self.first_output is None:
+                self.first_output = time.perf_counter()
+            yield item
+
+    def process(self, data: Iterable[str]) -> None:
+        super().process(self._timed(data))
+
+    def process_batches(self, batches: Iterable[list[str]], batch_size: int) -> None:
+        super().process_batches(self._timed(batches), batch_size)
+
+
+def linear(inputs: dict[str, str], out_dir: str) -> list[TimedWriter]:
+    sink = TimedWriter("write", os.path.join(out_dir, "linear.txt"))
+    (FileReader("read", inputs["all"]) >> RegexFilter("filter_pings", "PING|HELO")
+     >> RegexMapper("map_to_ip_addr", IP_PATTERN) >> sink)
+    return [sink]
+
+
+def fan_out(inputs: dict[str, str], out_dir: str) -> list[TimedWriter]:
+    splitter = Splitter("split")
+    sinks = [TimedWriter(f"write_{name}", os.path.join(out_dir, f"fan_out_{name}.txt"))
+             for name in ("pings", "helos", "all")]
+    FileReader("read", inputs["all"]) >> splitter
+    splitter >> RegexFilter("filter_pings", "PING") >> sinks[0]
+    splitter >> RegexFilter("filter_helos", "HELO") >> sinks[1]
+    splitter >> sinks[2]
+    return sinks
+
+
+def fan_in(inputs: dict[str, str], out_dir: str) -> list[TimedWriter]:
+    joiner = StreamJoiner("join")
+    for idx, path in enumerate(inputs["parts"]):
+        FileReader(f"read_{idx}", path) >> joiner
+    sink = TimedWriter("write", os.path.join(out_dir, "fan_in.txt"))
+    joiner >> sink
+    return [sink]
+
+
+def example_05(inputs: dict[str, str], out_dir: str) -> list[TimedWriter]:
+    # The topology of examples/example_05_multi_step_etl.py, writing to a file instead of SQS
+    log_file = FileReader("log_file", inputs["app_logs"])
+    events_file = FileReader("events_file", inputs["vm_events"])
+    event_file_splitter = Splitter("event_file_splitter")
+    map_to_ip_addr = RegexMapper("map_to_ip_addr", IP_PATTERN)
+    ping_splitter = Splitter("ping_splitter")
+    joiner = StreamJoiner("joiner")
+    write_to_ping_file = TimedWriter("write_to_ping_file", os.path.join(out_dir, "example_05_pings.txt"))
+    write_to_queue = TimedWriter("write_to_queue", os.path.join(out_dir, "example_05_queue.txt"))
+
+    log_file >> joiner >> write_to_queue
+    events_file >> event_file_splitter
+    event_file_splitter >> RegexFilter("filter_for_helo_lines", "HELO") >> map_to_ip_addr >> joiner
+    event_file_splitter >> RegexFilter("filter_for_ping_events", "PING") >> ping_splitter
+    ping_splitter >> joiner
+    ping_splitter >> write_to_ping_file
+    return [write_to_ping_file, write_to_queue]
+
+
+SHAPES: dict[str, Callable[[dict, str], list[TimedWriter]]] = {
+    "linear": linear,
+    "fan_out": fan_out,
+    "fan_in": fan_in,
+    "example_05": example_05,
+}
+
+
+def generate_inputs(directory: str, records: int, record_width: int) -> dict[str, Any]:
+    """
+    Generates the input files of every shape, each shape reading `records` lines in total.
+    """
+    def generate(name: str, count: int, seed: int) -> str:
+        path = os.path.join(directory, name)
+        generate_input(path, count, record_width, seed)
+        return path
+
+    return {
+        "all": generate("all.txt", records, 0),
+        "parts": [generate(f"part_{idx}.txt", records // 3 + (idx < records % 3), idx + 1) for idx in range(3)],
+        "app_logs": generate("app_logs.txt", records // 2, 4),
+        "vm_events": generate("vm_events.txt", records - records // 2, 5),
+    }
+
+
+def run_case(shape: str, mode: str, inputs: dict[str, Any], out_dir: str, records: int,
+             batch_size: Optional[int] = None) -> dict:
+    with Pipeline(f"bench_{shape}", mode="batch" if mode == "async" else mode, batch_size=batch_size) as dag:
+        sinks = SHAPES[shape](inputs, out_dir)
+
+    rss_before = current_rss()
+    started = time.perf_counter()
+    if mode == "async":
+        import asyncio
+        asyncio.run(dag.run_async())
+    else:
+        dag.run()
+    wall_time = time.perf_counter() - started
+
+    first_outputs = [sink.first_output for sink in sinks if sink.first_output is not None]
+    return {
+        "shape": shape,
+        "mode": mode,
+        "batch_size": batch_size,
+        "records": records,
+        "wall_time": wall_time,
+        "records_per_sec": records / wall_time if wall_time else None,
+        "first_output_latency": min(first_outputs) - started if first_outputs else None,
+        "peak_rss": dag.peak_rss,
+        "peak_rss_increase": dag.peak_rss - rss_before if dag.peak_rss and rss_before else None,
+    }
+
+
+def _median_case(runs: list[dict]) -> dict:
+    # The run with the median wall time, so all of its numbers come from the same run
+    result = dict(sorted(runs, key=lambda run: run["wall_time"])[len(runs) // 2])
+    result["wall_times"] = [run["wall_time"] for run in runs]
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(records: int = 100_000, record_width: int = 80, shapes: Iterable[str] = tuple(SHAPES),
+              modes: Iterable[str] = BENCH_MODES, batch_size: Optional[int] = None, repeat: int = 3,
+              work_dir: Optional[str] = None) -> dict:
+    """
+    Runs every shape in every mode `repeat` times, keeping the median run of each case.
+
+    :param records: Number of input records read by each case
+    :param record_width: Characters per record
+    :param shapes: Names of the shapes to run, see SHAPES
+    :param modes: Execution modes to run, see BENCH_MODES
+    :param batch_size: Pipeline batch size, None exchanges records one at a time
+    :param repeat: Number of runs of each case
+    :param work_dir: Where the inputs and outputs are written, defaults to a temporary directory
+    :return: The suite's results, as stored by `petal bench --output`
+    """
+    shapes, modes = list(shapes), list(modes)
+    for shape in shapes:
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown shape '{shape}', expected one of {tuple(SHAPES)}")
+    for mode in modes:
+        if mode not in BENCH_MODES:
+            raise ValueError(f"Unknown mode '{mode}', expected one of {BENCH_MODES}")
+
+    level = logger.level
+    # Per-operator info logs would be part of the measurements
+    configure(level=logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+            inputs = generate_inputs(directory, records, record_width)
+            results = []
+            for shape in shapes:
+                for mode in modes:
+                    runs = [run_case(shape, mode, inputs, directory, records, batch_size) for _ in range(repeat)]
+                    results.append(_median_case(runs))
+    finally:
+        configure(level=level)
+
+    return {
+        "commit": _git_commit(),
+        "created": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": {"records": records, "record_width": record_width, "batch_size": batch_size, "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[dict]:
+    """
+    Matches the cases of two suite results, with the relative change of their throughput
+    (positive is faster) and of their latency to first output (positive is slower).
+    """
+    def key(result):
+        return result["shape"], result["mode"], result.get("batch_size")
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    changes = []
+    for result in current["results"]:
+        previous = baseline_results.get(key(result))
+        if previous is None:
+            continue
+        changes.append({
+            "shape": result["shape"],
+            "mode": result["mode"],
+            "records_per_sec": _change(result["records_per_sec"], previous["records_per_sec"]),
+            "first_output_latency": _change(result["first_output_latency"], previous["first_output_latency"]),
+        })
+    return changes
+
+
+def _change(current: Optional[float], previous: Optional[float]) -> Optional[float]:
+    if current is None or not previous:
+        return None
+    return current / previous - 1
+
+
+def format_results(suite: dict, changes: Optional[list[dict]] = None) -> str:
+    changes = {(change["shape"], change["mode"]): change for change in changes or []}
+    lines = [f"{'shape':<12} {'mode':<10} {'records/sec':>12} {'first output':>13} {'peak RSS':>10}"]
+    for result in suite["results"]:
+        latency = result["first_output_latency"]
+        line = (f"{result['shape']:<12} {result['mode']:<10} {result['records_per_sec']:>12,.0f} "
+                f"{'-' if latency is None else f'{latency * 1000:.1f} ms':>13} "
+                f"{(result['peak_rss'] or 0) / (1 << 20):>7.1f} MiB")
+        change = changes.get((result["shape"], result["mode"]))
+        if change and change["records_per_sec"] is not None:
+            line += f"  ({change['records_per_sec']:+.1%} records/sec)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def save(suite: dict, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(suite, f, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -1,13 +1,77 @@
 import argparse
-from petal.examples.example_01_noop import main as noop_pipeline
+import runpy
+from datetime import datetime
+
+from petal.src.core.cache import DEFAULT_CACHE_DIR, OperatorCache
+
+
+def run(args):
+    if args.run_default:
+        from petal.examples.example_01_noop import main as noop_pipeline
+        noop_pipeline()
+    elif args.file:
+        runpy.run_path(args.file, run_name="__main__")
+    else:
+        raise SystemExit("petal run: expected the filepath of a pipeline, or --run-default")
+
+
+def cache_info(args):
+    cache = OperatorCache(args.dir)
+    if not cache.exists():
+        print(f"No cache in {args.dir}")
+        return
+    entries = cache.entries()
+    for entry in reversed(entries):
+        last_used = datetime.fromtimestamp(entry["last_used"]).isoformat(sep=' ', timespec='seconds')
+        print(f"{entry['key'][:16]}  {entry['operator_id']:<24} {entry['bytes']:>12}  {last_used}")
+    print(f"{len(entries)} entries, {sum(entry['bytes'] for entry in entries)} bytes in {args.dir}")
+
+
+def cache_clear(args):
+    removed = OperatorCache(args.dir).clear()
+    print(f"Removed {removed} entries from {args.dir}")
+
+
+def run_bench(args):
+    # Imported here since it imports every plugin it benchmarks, which only `petal bench` needs
+    from petal.src import bench
+    try:
+        suite = bench.run_suite(records=args.records, record_width=args.width,
+                                shapes=args.shapes or tuple(bench.SHAPES), modes=args.modes or bench.BENCH_MODES,
+                                batch_size=args.batch_size, repeat=args.repeat)
+    except ValueError as e:
+        raise SystemExit(f"petal bench: {e}")
+    changes = bench.compare(suite, bench.load(args.compare)) if args.compare else None
+    print(bench.format_results(suite, changes))
+    if args.output:
+        bench.save(suite, args.output)
+        print(f"Results written to {args.output}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Run ETL pipeline")
-    parser.add_argument('--run-default', action='store_true', help='Run default pipeline')
-    parser.add_argument('run', type=str, required=True, help='The filepath of the Petal ETL to be executed.')
-    args = parser.parse_args()
+    commands = parser.add_subparsers(dest="command", required=True)
 
-    print(f"Invoked petal with args: {args}")
-    if args.run:
-        noop_pipeline()
+    run_parser = commands.add_parser("run", help="Run a pipeline")
+    run_parser.add_argument('file', type=str, nargs='?', help='The filepath of the Petal ETL to be executed.')
+    run_parser.add_argument('--run-default', action='store_true', help='Run default pipeline')
+    run_parser.set_defaults(func=run)
+
+    cache_parser = commands.add_parser("cache", help="Inspect or clear the operator output cache")
+    cache_parser.add_argument('action', choices=["info", "clear"])
+    cache_parser.add_argument('--dir', default=DEFAULT_CACHE_DIR, help='The cache directory')
+    cache_parser.set_defaults(func=lambda args: cache_info(args) if args.action == "info" else cache_clear(args))
+
+    bench_parser = commands.add_parser("bench", help="Benchmark pipeline shapes against each execution mode")
+    bench_parser.add_argument('--records', type=int, default=100_000, help='Input records per case')
+    bench_parser.add_argument('--width', type=int, default=80, help='Characters per record')
+    bench_parser.add_argument('--shapes', nargs='+', help='Pipeline shapes to run, all of them by default')
+    bench_parser.add_argument('--modes', nargs='+', help='Execution modes to run, all of them by default')
+    bench_parser.add_argument('--batch-size', type=int, default=None, help='Pipeline batch size')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='Runs per case, the median is reported')
+    bench_parser.add_argument('--output', help='Write the results to this JSON file')
+    bench_parser.add_argument('--compare', help='A previous JSON result file to compare against')
+    bench_parser.set_defaults(func=run_bench)
+
+    args = parser.parse_args()
+    args.func(args)
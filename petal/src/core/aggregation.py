@@ -0,0 +1,196 @@
+"""
+Incremental aggregation state, used by the GroupBy and Aggregate operators.
+
+A Combiner folds records into a small state one at a time and merges states together, so aggregating
+a stream only keeps one state per open key and window, however many records go through.
+Windows split a stream by the timestamps of its records, see TumblingWindow and SlidingWindow.
+"""
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterator, Optional
+
+from petal.src.core.cache import callable_fingerprint
+
+
+class Combiner(ABC):
+    """
+    :param value: Extracts the aggregated value from a record, defaults to the record itself
+    """
+
+    def __init__(self, value: Optional[Callable[[Any], Any]] = None):
+        self.value = value
+
+    @abstractmethod
+    def create(self) -> Any:
+        """The state of an empty group."""
+        pass
+
+    @abstractmethod
+    def add(self, state: Any, value: Any) -> Any:
+        """Returns the state with one more value."""
+        pass
+
+    @abstractmethod
+    def merge(self, state: Any, other: Any) -> Any:
+        """Returns the state of the two groups combined."""
+        pass
+
+    def result(self, state: Any) -> Any:
+        return state
+
+    def add_record(self, state: Any, record: Any) -> Any:
+        return self.add(state, record if self.value is None else self.value(record))
+
+    def config(self) -> Optional[tuple]:
+        """Identifies the combiner for the operator cache, None if it can't be."""
+        if self.value is None:
+            return type(self).__name__, None
+        fingerprint = callable_fingerprint(self.value)
+        return None if fingerprint is None else (type(self).__name__, fingerprint)
+
+
+class Count(Combiner):
+    def create(self) -> int:
+        return 0
+
+    def add(self, state: int, value: Any) -> int:
+        return state + 1
+
+    def merge(self, state: int, other: int) -> int:
+        return state + other
+
+
+class Sum(Combiner):
+    def create(self) -> Any:
+        return 0
+
+    def add(self, state: Any, value: Any) -> Any:
+        return state + value
+
+    def merge(self, state: Any, other: Any) -> Any:
+        return state + other
+
+
+class Min(Combiner):
+    """None for an empty group."""
+
+    def create(self) -> Any:
+        return None
+
+    def add(self, state: Any, value: Any) -> Any:
+        return value if state is None or value < state else state
+
+    def merge(self, state: Any, other: Any) -> Any:
+        return state if other is None else self.add(state, other)
+
+
+class Max(Combiner):
+    """None for an empty group."""
+
+    def create(self) -> Any:
+        return None
+
+    def add(self, state: Any, value: Any) -> Any:
+        return value if state is None or value > state else state
+
+    def merge(self, state: Any, other: Any) -> Any:
+        return state if other is None else self.add(state, other)
+
+
+def _mix(value: Any) -> int:
+    # Spreads Python's hash over 64 bits (the splitmix64 finalizer), small ints hash to themselves
+    x = hash(value) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+class ApproxDistinct(Combiner):
+    """
+    Approximate number of distinct values, with a HyperLogLog of 2^precision one-byte registers:
+    the standard error is about 1.04 / sqrt(2^precision), 1.6% with the default 4KB per group.
+    Values must be hashable. Python salts the hash of strings per process, so states are only
+    comparable within a single process.
+    """
+
+    def __init__(self, value: Optional[Callable[[Any], Any]] = None, precision: int = 12):
+        super().__init__(value)
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = 1 << precision
+
+    def create(self) -> bytearray:
+        return bytearray(self.registers)
+
+    def add(self, state: bytearray, value: Any) -> bytearray:
+        x = _mix(value)
+        idx = x & (self.registers - 1)
+        # Position of the first set bit of the remaining bits
+        rank = 64 - self.precision - (x >> self.precision).bit_length() + 1
+        if rank > state[idx]:
+            state[idx] = rank
+        return state
+
+    def merge(self, state: bytearray, other: bytearray) -> bytearray:
+        return bytearray(map(max, state, other))
+
+    def result(self, state: bytearray) -> int:
+        m = self.registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in state)
+        zeros = state.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def config(self) -> Optional[tuple]:
+        config = super().config()
+        return None if config is None else (*config, self.precision)
+
+
+class Window:
+    """
+    Windows of `size` time units starting every `slide` units, `size` must be a multiple of `slide`.
+    Records are folded into panes of `slide` units, and each window merges the panes it covers,
+    so a record is only ever added to a single state.
+    """
+
+    def __init__(self, size: float, slide: float):
+        if size <= 0 or slide <= 0:
+            raise ValueError("Window size and slide must be positive")
+        panes = size / slide
+        if abs(panes - round(panes)) > 1e-9:
+            raise ValueError("The window size must be a multiple of its slide")
+        self.size = size
+        self.slide = slide
+        self.panes = round(panes)
+
+    def pane(self, timestamp: float) -> float:
+        return math.floor(timestamp / self.slide) * self.slide
+
+    def first_window(self, pane: float) -> float:
+        """Start of the earliest window covering the pane."""
+        return pane - (self.panes - 1) * self.slide
+
+    def windows(self, start: float, end: float) -> Iterator[float]:
+        """Starts of the windows from `start`, ending at or before `end`."""
+        while start + self.size <= end:
+            yield start
+            start += self.slide
+
+    def config(self) -> tuple:
+        return type(self).__name__, self.size, self.slide
+
+
+class TumblingWindow(Window):
+    """Back to back windows of `size` time units, every record is in exactly one."""
+
+    def __init__(self, size: float):
+        super().__init__(size, size)
+
+
+class SlidingWindow(Window):
+    """Overlapping windows of `size` time units starting every `slide` units."""
+    pass
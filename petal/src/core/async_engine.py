@@ -0,0 +1,213 @@
+import asyncio
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator
+
+from petal.src.core.streams import END, Failure
+from petal.src.logger import logger
+
+# Max number of records handed over at once between the event loop and the thread of a sync operator
+SYNC_CHUNK_SIZE = 256
+
+
+class Channel:
+    """
+    A bounded queue between two operators (maxsize 0 means unbounded).
+    Once the consumer closes it, the producer's puts are dropped instead of blocking.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+        # Statistics for the operators' metrics
+        self.sent = 0
+        self.received = 0
+        self.peak = 0
+        self.blocked = 0.0
+        self.waited = 0.0
+
+    async def put(self, item: Any) -> None:
+        if self.closed:
+            return
+        if self.queue.full():
+            blocked_since = time.perf_counter()
+            await self.queue.put(item)
+            self.blocked += time.perf_counter() - blocked_since
+        else:
+            self.queue.put_nowait(item)
+        self.peak = max(self.peak, self.queue.qsize())
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+    async def get_many(self, limit: int) -> list:
+        # Waits for one item, then takes the ones already queued behind it
+        items = [await self.queue.get()]
+        while len(items) < limit and not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    def close(self) -> None:
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        while True:
+            if self.queue.empty():
+                waiting_since = time.perf_counter()
+                item = await self.queue.get()
+                self.waited += time.perf_counter() - waiting_since
+            else:
+                item = self.queue.get_nowait()
+            if item is END:
+                return
+            if isinstance(item, Failure):
+                raise item.exc
+            self.received += 1
+            yield item
+
+    def sync_iter(self, loop: asyncio.AbstractEventLoop, chunk_size: int = SYNC_CHUNK_SIZE) -> Iterator[Any]:
+        # Lets a sync operator running on a worker thread pull from the event loop, a chunk of records at a time
+        while True:
+            waiting_since = time.perf_counter()
+            items = asyncio.run_coroutine_threadsafe(self.get_many(chunk_size), loop).result()
+            self.waited += time.perf_counter() - waiting_since
+            for item in items:
+                if item is END:
+                    return
+                if isinstance(item, Failure):
+                    raise item.exc
+                self.received += 1
+                yield item
+
+
+class Outbox:
+    """
+    Hands the output records of a sync operator, running on a worker thread, over to its output channels.
+    Records are appended without waiting on the event loop, which drains them in bulk as soon as it can,
+    so the thread only blocks (backpressure) once `limit` records are waiting to be drained.
+    """
+
+    def __init__(self, outputs: list[Channel], loop: asyncio.AbstractEventLoop, limit: int = SYNC_CHUNK_SIZE):
+        self.outputs = outputs
+        self.loop = loop
+        self.limit = limit
+        self.items = []
+        # Whether a drain is scheduled or running on the event loop
+        self.draining = False
+        self.condition = threading.Condition()
+        self._task = None
+
+    def put(self, item: Any) -> None:
+        with self.condition:
+            while len(self.items) >= self.limit:
+                self.condition.wait()
+            self.items.append(item)
+            scheduled = not self.draining
+            self.draining = True
+        if scheduled:
+            self.loop.call_soon_threadsafe(self._start_drain)
+            # Lets the event loop thread run the drain now, rather than after the GIL's switch interval
+            time.sleep(0)
+
+    def flush(self) -> None:
+        """Waits until every record put has been handed over to the output channels."""
+        with self.condition:
+            while self.draining:
+                self.condition.wait()
+
+    def _start_drain(self) -> None:
+        self._task = self.loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while True:
+            with self.condition:
+                items, self.items = self.items, []
+                if not items:
+                    self.draining = False
+                self.condition.notify_all()
+            if not items:
+                return
+            for item in items:
+                await _broadcast(self.outputs, item)
+
+
+async def _broadcast(outputs: list[Channel], item: Any) -> None:
+    for channel in outputs:
+        channel.sent += 1
+        await channel.put(item)
+
+
+async def run_operator(operator, inputs: list[Channel], outputs: list[Channel], executor: ThreadPoolExecutor,
+                       instrumentation=None) -> None:
+    """
+    Runs a single operator, pulling from its input channels and pushing every output record to all
+    of its output channels. Async operators run on the event loop, sync operators on the executor.
+    """
+    loop = asyncio.get_running_loop()
+    metrics = instrumentation.metrics(operator) if instrumentation else None
+    started = time.perf_counter()
+    sync_cpu_time = 0.0
+    try:
+        logger.info("\tExecuting operator: %s", operator.operator_id)
+        if instrumentation:
+            instrumentation.before(operator, metrics)
+        if inspect.isasyncgenfunction(operator.process):
+            async for item in operator.process(*inputs):
+                await _broadcast(outputs, item)
+        elif inspect.iscoroutinefunction(operator.process):
+            result = await operator.process(*inputs)
+            await _forward(result, outputs)
+        else:
+            def run_sync():
+                nonlocal sync_cpu_time
+                cpu = time.thread_time()
+                try:
+                    result = operator.process(*[channel.sync_iter(loop) for channel in inputs])
+                    if result is None or isinstance(result, (str, bytes)):
+                        return
+                    outbox = Outbox(outputs, loop)
+                    try:
+                        for item in result:
+                            outbox.put(item)
+                    finally:
+                        outbox.flush()
+                finally:
+                    sync_cpu_time = time.thread_time() - cpu
+
+            await loop.run_in_executor(executor, run_sync)
+        await _broadcast(outputs, END)
+    except BaseException as e:
+        await _broadcast(outputs, Failure(e))
+        raise
+    finally:
+        for channel in inputs:
+            channel.close()
+        if instrumentation:
+            _record_metrics(metrics, inputs, outputs, time.perf_counter() - started, sync_cpu_time)
+            instrumentation.after(operator, metrics)
+
+
+def _record_metrics(metrics, inputs: list[Channel], outputs: list[Channel], elapsed: float, cpu_time: float) -> None:
+    # Counted on the channels, the end of stream marker is sent on every output too
+    metrics.records_in = sum(channel.received for channel in inputs)
+    metrics.records_out = max((channel.sent - 1 for channel in outputs), default=0)
+    metrics.blocked_upstream = sum(channel.waited for channel in inputs)
+    metrics.blocked_downstream = sum(channel.blocked for channel in outputs)
+    metrics.peak_buffer = max((channel.peak for channel in outputs), default=0)
+    metrics.wall_time = elapsed - metrics.blocked_upstream - metrics.blocked_downstream
+    metrics.cpu_time = cpu_time
+
+
+async def _forward(result: Any, outputs: list[Channel]) -> None:
+    if result is None or isinstance(result, (str, bytes)):
+        return
+    if hasattr(result, '__aiter__'):
+        async for item in result:
+            await _broadcast(outputs, item)
+        return
+    for item in result:
+        await _broadcast(outputs, item)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from petal.src.logger import logger
+
+DEFAULT_CACHE_DIR = ".petal_cache"
+
+# Returned by OperatorCache.get when there is no entry, since None is a valid operator output
+MISS = object()
+
+
+def file_fingerprint(file_path: str) -> tuple:
+    """
+    Identifies a version of a file by its path, size and modification time.
+    """
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+
+def callable_fingerprint(func: Callable) -> Optional[tuple]:
+    """
+    Identifies a function by its name, bytecode and default argument values, so editing its body or its defaults
+    invalidates the cache. Changes to the globals or the other functions it calls are not detected.
+    Returns None for functions whose behaviour can't be fingerprinted (closures, builtins, defaults without
+    a stable repr...).
+    """
+    code = getattr(func, '__code__', None)
+    if code is None or getattr(func, '__closure__', None):
+        return None
+    defaults = _stable_repr((func.__defaults__, func.__kwdefaults__))
+    if defaults is None:
+        return None
+    return func.__module__, func.__qualname__, code.co_code, repr(code.co_consts), code.co_names, defaults
+
+
+def _stable_repr(value: Any) -> Optional[str]:
+    # The default repr of objects holds their address, which changes on every run
+    try:
+        text = repr(value)
+    except Exception:
+        return None
+    return None if " at 0x" in text else text
+
+
+def cache_key(operator, upstream_keys: list[Optional[str]]) -> Optional[str]:
+    """
+    Content address of an operator's output: a hash of its class, its configuration
+    and the keys of its upstream operators. None if the operator (or an upstream) is not cacheable.
+    """
+    config = operator.cache_config()
+    if config is None or any(key is None for key in upstream_keys):
+        return None
+    operator_class = type(operator)
+    payload = repr((operator_class.__module__, operator_class.__qualname__, sorted(config.items()), upstream_keys))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class OperatorCache:
+    """
+    On-disk cache of materialized operator outputs, keyed by cache_key.
+    Least recently used entries are evicted once the cache grows past `max_bytes`.
+    The directory is only created by the first write.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def get(self, key: str) -> Any:
+        path = self._path(key, "pkl")
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return MISS
+        # Entries are evicted by least recent modification time, so touch the entry on every hit
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value: Any, operator_id: str = "") -> bool:
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.info("\tCache: not caching the output of %s, it can't be pickled: %s", operator_id, e)
+            return False
+        if len(data) > self.max_bytes:
+            return False
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename, so a concurrent reader never sees a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with open(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key, "pkl"))
+            with open(self._path(key, "json"), 'w') as f:
+                json.dump({"operator_id": operator_id, "created": time.time()}, f)
+            self._evict()
+        return True
+
+    def exists(self) -> bool:
+        return os.path.isdir(self.directory)
+
+    def entries(self) -> list[dict]:
+        """
+        Lists the cache entries, least recently used first.
+        """
+        if not self.exists():
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            key = name[:-len(".pkl")]
+            try:
+                stat = os.stat(self._path(key, "pkl"))
+                with open(self._path(key, "json")) as f:
+                    metadata = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                metadata = {}
+            except OSError:
+                continue
+            entries.append({"key": key, "operator_id": metadata.get("operator_id", ""), "bytes": stat.st_size,
+                            "created": metadata.get("created"), "last_used": stat.st_mtime})
+        return sorted(entries, key=lambda entry: entry["last_used"])
+
+    def size(self) -> int:
+        return sum(entry["bytes"] for entry in self.entries())
+
+    def remove(self, key: str) -> None:
+        for ext in ("pkl", "json"):
+            try:
+                os.remove(self._path(key, ext))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> int:
+        entries = self.entries()
+        for entry in entries:
+            self.remove(entry["key"])
+        return len(entries)
+
+    def _evict(self) -> None:
+        entries = self.entries()
+        total = sum(entry["bytes"] for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                return
+            logger.info("\tCache: evicting the output of %s (%s bytes)", entry['operator_id'], entry['bytes'])
+            self.remove(entry["key"])
+            total -= entry["bytes"]
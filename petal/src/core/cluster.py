@@ -0,0 +1,369 @@
+"""
+A multi-process execution backend: the pipeline's process coordinates a cluster of worker processes,
+talking to them over TCP sockets, see LocalCluster.
+
+Each operator targeting the cluster is placed on one of its workers. When it runs, its operator (pickled,
+see BaseOperator.__getstate__) and its input streams are sent to that worker as batches of pickled records,
+and its output is streamed back the same way while it runs. A worker runs each operator on its own thread,
+so operators on different workers run in parallel, each with its own GIL.
+"""
+import multiprocessing
+import pickle
+import queue
+import secrets
+import threading
+import time
+import traceback
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Iterable, Iterator, Optional
+
+from petal.src.logger import logger
+from petal.src.core.executors import Executor
+from petal.src.core.operators.BaseOperator import BaseOperator
+from petal.src.core.parallel import check_picklable
+from petal.src.core.streams import END, Failure, invoke
+from petal.src.core.utils import chunked, flatten
+
+# Message types, the first item of every message
+_STAGE = "stage"  # (_STAGE, operator, number of inputs, batch_size, chunk_size), opens the connection running an operator
+_BATCH = "batch"  # (_BATCH, input index, records), input index is None for output batches
+_END_INPUT = "end"  # (_END_INPUT, input index)
+_FAIL = "fail"  # (_FAIL, description), an input stream failed on the coordinator
+_DONE = "done"  # (_DONE, stats of the run)
+_ERROR = "error"  # (_ERROR, exception, formatted traceback)
+_SHUTDOWN = "shutdown"
+
+# Max number of input batches a worker buffers for an operator with a single input
+_BUFFERED_BATCHES = 4
+
+
+def _send(conn: Connection, message: tuple) -> int:
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    conn.send_bytes(data)
+    return len(data)
+
+
+def _recv(conn: Connection) -> tuple[tuple, int]:
+    data = conn.recv_bytes()
+    return pickle.loads(data), len(data)
+
+
+# -------------------------------
+# WORKER
+# -------------------------------
+
+def _serve(address_conn: Connection, host: str, authkey: bytes) -> None:
+    """
+    Main function of a worker process: accepts a connection per operator run, until told to shut down.
+    """
+    listener = Listener((host, 0), authkey=authkey)
+    address_conn.send(listener.address)
+    address_conn.close()
+    while True:
+        try:
+            conn = listener.accept()
+            message, _ = _recv(conn)
+        except (multiprocessing.AuthenticationError, EOFError, OSError):
+            continue
+        if message[0] == _SHUTDOWN:
+            conn.close()
+            break
+        threading.Thread(target=_run_stage, args=(conn, *message[1:]), daemon=True).start()
+    listener.close()
+
+
+def _portable(exc: BaseException, formatted: str) -> BaseException:
+    # Exceptions are re-raised on the coordinator, unless they can't make the trip
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return RuntimeError(formatted)
+
+
+def _run_stage(conn: Connection, operator: BaseOperator, n_inputs: int, batch_size: Optional[int],
+               chunk_size: int) -> None:
+    # Inputs arrive on a thread of their own, so the operator can consume them while sending its output
+    buffers = [queue.Queue(maxsize=_BUFFERED_BATCHES if n_inputs == 1 else 0) for _ in range(n_inputs)]
+    finished = threading.Event()
+    counts = {"records_in": 0, "records_out": 0}
+
+    def put(buffer: queue.Queue, item: Any) -> None:
+        # Block while the buffer is full, but give up once the operator is done
+        while not finished.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def receive() -> None:
+        ended = 0
+        try:
+            while ended < n_inputs:
+                message, _ = _recv(conn)
+                if message[0] == _BATCH:
+                    counts["records_in"] += len(message[2])
+                    put(buffers[message[1]], message[2])
+                elif message[0] == _END_INPUT:
+                    ended += 1
+                    put(buffers[message[1]], END)
+                else:
+                    for buffer in buffers:
+                        put(buffer, Failure(RuntimeError(f"Input failed on the coordinator: {message[1]}")))
+                    return
+        except (EOFError, OSError):
+            for buffer in buffers:
+                put(buffer, Failure(ConnectionError("The coordinator closed the connection")))
+
+    def batches(buffer: queue.Queue) -> Iterator[Any]:
+        while True:
+            item = buffer.get()
+            if item is END:
+                return
+            if isinstance(item, Failure):
+                raise item.exc
+            yield item
+
+    started, started_cpu = time.perf_counter(), time.thread_time()
+    threading.Thread(target=receive, daemon=True).start()
+    try:
+        inputs = [batches(buffer) if batch_size else flatten(batches(buffer)) for buffer in buffers]
+        result = invoke(operator, inputs, batch_size)
+        if result is not None and not isinstance(result, (str, bytes)):
+            for batch in (result if batch_size else chunked(result, chunk_size)):
+                counts["records_out"] += len(batch)
+                _send(conn, (_BATCH, None, batch))
+        _send(conn, (_DONE, {**counts, "wall_time": time.perf_counter() - started,
+                             "cpu_time": time.thread_time() - started_cpu}))
+    except (EOFError, OSError):
+        # The coordinator stopped reading the output
+        pass
+    except BaseException as e:
+        formatted = traceback.format_exc()
+        try:
+            _send(conn, (_ERROR, _portable(e, formatted), formatted))
+        except OSError:
+            pass
+    finally:
+        finished.set()
+        conn.close()
+
+
+# -------------------------------
+# COORDINATOR
+# -------------------------------
+
+class WorkerLoad:
+    """
+    What a worker of a LocalCluster has run since the cluster started, see LocalCluster.load().
+    """
+
+    def __init__(self, worker: int, pid: int, address: tuple):
+        self.worker = worker
+        self.pid = pid
+        self.address = address
+        # Ids of the operators placed on the worker
+        self.operators: list[str] = []
+        # Number of operators running on it right now, and of completed runs
+        self.running = 0
+        self.runs = 0
+        self.records_in = 0
+        self.records_out = 0
+        # Bytes of pickled messages sent to and received from the worker
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # Seconds the operators spent running on the worker, and on its CPU
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def to_dict(self) -> dict:
+        return {**vars(self), "operators": list(self.operators)}
+
+
+class LocalCluster(Executor):
+    """
+    A coordinator (the pipeline's process) and `workers` worker processes on this machine, connected by sockets
+    on `host`. Operators targeting the cluster (see BaseOperator.run_on) must be picklable, and run on a copy:
+    any state they keep (eg. collected records, metrics) stays on the worker, and their commit() and abort() run
+    on the coordinator, so operators relying on them (eg. checkpointed readers) must run locally.
+
+    The workers are started on first use (or by start()) and live until shutdown(), or the end of the process,
+    so the cluster can be shared by several pipelines and runs. It can be used as a context manager.
+    """
+
+    def __init__(self, workers: int = 2, chunk_size: int = 1024, host: str = "127.0.0.1",
+                 start_method: str = "spawn", start_timeout: float = 30.0):
+        """
+        :param workers: Number of worker processes
+        :param chunk_size: Max number of records per batch sent over a socket, when the pipeline isn't batched
+            (a batched pipeline's batches are sent as they are)
+        :param host: Address the workers listen on
+        :param start_method: multiprocessing start method of the workers. "fork" starts faster, but isn't safe
+            once the coordinator runs threads
+        :param start_timeout: Seconds to wait for each worker to start listening
+        """
+        if workers < 1 or chunk_size < 1:
+            raise ValueError("workers and chunk_size must be at least 1")
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.host = host
+        self.start_method = start_method
+        self.start_timeout = start_timeout
+        # Only the workers of this cluster accept its connections
+        self._authkey = secrets.token_bytes(32)
+        self._processes: list = []
+        self._loads: list[WorkerLoad] = []
+        # Operator id -> index of the worker it's placed on
+        self._placement: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._processes:
+                return
+            context = multiprocessing.get_context(self.start_method)
+            pipes = []
+            for idx in range(self.workers):
+                receiver, sender = context.Pipe(duplex=False)
+                # Daemonic, so workers never outlive the coordinator
+                process = context.Process(target=_serve, args=(sender, self.host, self._authkey),
+                                          name=f"petal-worker-{idx}", daemon=True)
+                process.start()
+                sender.close()
+                pipes.append(receiver)
+                self._processes.append(process)
+            for idx, (receiver, process) in enumerate(zip(pipes, self._processes)):
+                if not receiver.poll(self.start_timeout):
+                    self._stop_processes()
+                    raise RuntimeError(f"Worker {idx} didn't start within {self.start_timeout}s")
+                self._loads.append(WorkerLoad(idx, process.pid, receiver.recv()))
+                receiver.close()
+            self._placement = {}
+        logger.info("LocalCluster: started %d workers at %s", self.workers,
+                    ", ".join(f"{host}:{port}" for host, port in (load.address for load in self._loads)))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for load in self._loads:
+                try:
+                    with Client(load.address, authkey=self._authkey) as conn:
+                        _send(conn, (_SHUTDOWN,))
+                except OSError:
+                    pass
+            self._stop_processes()
+
+    def _stop_processes(self) -> None:
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._loads = []
+
+    def validate(self, operator: BaseOperator) -> None:
+        if type(operator).commit is not BaseOperator.commit or type(operator).abort is not BaseOperator.abort:
+            raise ValueError(f"{operator.operator_id}: operators with commit() or abort() state can't run on a "
+                             f"LocalCluster, only on the coordinator")
+        if getattr(operator, 'parallelism', 1) > 1:
+            raise ValueError(f"{operator.operator_id}: workers of a LocalCluster can't start process pools, "
+                             f"parallelism must be 1")
+        check_picklable(operator, f"{operator.operator_id}: operator")
+
+    def place(self, operator_id: str) -> WorkerLoad:
+        """
+        The worker running the operator: the one with the fewest operators (then the least CPU time used)
+        when it first runs, the same one afterwards.
+        """
+        with self._lock:
+            if operator_id not in self._placement:
+                load = min(self._loads, key=lambda load: (len(load.operators), load.cpu_time))
+                load.operators.append(operator_id)
+                self._placement[operator_id] = load.worker
+            return self._loads[self._placement[operator_id]]
+
+    def load(self) -> list[dict]:
+        """
+        What each worker has run so far, see WorkerLoad.
+        """
+        with self._lock:
+            return [load.to_dict() for load in self._loads]
+
+    def execute(self, operator, inputs: list, batch_size: Optional[int] = None) -> Iterator[Any]:
+        self.start()
+        return self._run(operator, inputs, batch_size, self.place(operator.operator_id))
+
+    def _run(self, operator, inputs: list, batch_size: Optional[int], load: WorkerLoad) -> Iterator[Any]:
+        conn = Client(load.address, authkey=self._authkey)
+        send_lock = threading.Lock()
+        stopped = threading.Event()
+        # Failures of the input streams, raised instead of the error they cause on the worker
+        errors = []
+
+        def send(message: tuple) -> None:
+            with send_lock:
+                size = _send(conn, message)
+            with self._lock:
+                load.bytes_sent += size
+
+        def feed(idx: int, data: Optional[Iterable[Any]]) -> None:
+            # Every input is sent from its own thread, so an operator can consume its inputs in any order
+            data = () if data is None else data
+            try:
+                for batch in (data if batch_size else chunked(data, self.chunk_size)):
+                    if stopped.is_set():
+                        return
+                    send((_BATCH, idx, batch))
+                send((_END_INPUT, idx))
+            except (EOFError, OSError):
+                # The worker closed the connection, and reports why if it failed
+                pass
+            except BaseException as e:
+                errors.append(e)
+                try:
+                    send((_FAIL, f"{type(e).__name__}: {e}"))
+                except OSError:
+                    pass
+
+        with self._lock:
+            load.running += 1
+        try:
+            send((_STAGE, operator, len(inputs), batch_size, self.chunk_size))
+            for idx, data in enumerate(inputs):
+                threading.Thread(target=feed, args=(idx, data), daemon=True,
+                                 name=f"petal-feed-{operator.operator_id}-{idx}").start()
+            while True:
+                try:
+                    message, size = _recv(conn)
+                except (EOFError, OSError) as e:
+                    raise ConnectionError(f"Lost worker {load.worker} running operator '{operator.operator_id}'") from e
+                with self._lock:
+                    load.bytes_received += size
+                if message[0] == _BATCH:
+                    if batch_size:
+                        yield message[2]
+                    else:
+                        yield from message[2]
+                elif message[0] == _DONE:
+                    self._record(operator.operator_id, load, message[1])
+                    return
+                else:
+                    if errors:
+                        raise errors[0]
+                    logger.error("Operator '%s' failed on worker %d:\n%s", operator.operator_id, load.worker, message[2])
+                    raise message[1]
+        finally:
+            stopped.set()
+            conn.close()
+            with self._lock:
+                load.running -= 1
+
+    def _record(self, operator_id: str, load: WorkerLoad, stats: dict) -> None:
+        with self._lock:
+            load.runs += 1
+            load.records_in += stats["records_in"]
+            load.records_out += stats["records_out"]
+            load.wall_time += stats["wall_time"]
+            load.cpu_time += stats["cpu_time"]
+        logger.info("\tLocalCluster: %s ran on worker %d (%d records in, %d out, %.3fs CPU)", operator_id,
+                    load.worker, stats["records_in"], stats["records_out"], stats["cpu_time"])
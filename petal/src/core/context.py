@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 _pipeline_context_stack = []
 
 
@@ -5,6 +7,19 @@ def get_current_pipeline():
     return _pipeline_context_stack[-1] if _pipeline_context_stack else None
 
 
+@contextmanager
+def detached():
+    """
+    Operators created within this context don't register with the current pipeline, eg. the ones
+    added to an execution plan, which must not replace the user's operators in the pipeline's nodes.
+    """
+    _pipeline_context_stack.append(None)
+    try:
+        yield
+    finally:
+        _pipeline_context_stack.pop()
+
+
 """
 DAG Implementation
 """
@@ -15,6 +30,8 @@ class PipelineContext:
         _pipeline_context_stack.append(self)
         self.nodes = {}
         self.edges = set()
+        # Sub-DAGs replicated when the plan is built, see petal.src.core.partition
+        self.partitions = []
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -0,0 +1,57 @@
+"""
+Execution backends: where an operator's process() actually runs.
+
+Every operator has an execution target (see BaseOperator.run_on), "local" by default, ie. in the pipeline's
+own process. Other targets are the names of the Executors passed to the Pipeline, eg.
+`Pipeline("etl", executors={"cluster": LocalCluster(workers=4)})` (see petal.src.core.cluster).
+The pipeline still wires the operators together the same way in every mode: an executor is only handed
+an operator along with its input streams, and returns its output stream.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from petal.src.core.streams import invoke
+
+# Target of the operators running in the pipeline's process
+LOCAL = "local"
+
+
+class Executor(ABC):
+
+    def start(self) -> None:
+        """
+        Called before every run using the executor, must be idempotent.
+        """
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+    def validate(self, operator) -> None:
+        """
+        Pre-flight checks of an operator targeting this executor, run by Pipeline.validate().
+        Raises ValueError if the operator can't run on it.
+        """
+        pass
+
+    @abstractmethod
+    def execute(self, operator, inputs: list, batch_size: Optional[int] = None) -> Any:
+        """
+        Runs the operator on its input streams, like petal.src.core.streams.invoke: the inputs and the output
+        are streams of record batches if batch_size is set, of records otherwise. The output may be lazy.
+        """
+        pass
+
+    def __enter__(self) -> "Executor":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+
+class LocalExecutor(Executor):
+    """Runs operators in the calling thread of the pipeline's process."""
+
+    def execute(self, operator, inputs: list, batch_size: Optional[int] = None) -> Any:
+        return invoke(operator, inputs, batch_size)
@@ -0,0 +1,127 @@
+import os
+import threading
+from collections.abc import Iterator
+from typing import Any, Iterable, Optional
+
+from petal.src.core.spill import Materializer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss() -> Optional[int]:
+    """
+    Resident set size of this process in bytes, None where it can't be read (no /proc).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss() -> Optional[int]:
+    """
+    Peak resident set size of this process over its whole lifetime, in bytes.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in kilobytes everywhere else
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class PeakMemoryMonitor:
+    """
+    Tracks the peak RSS while the block runs, by sampling it on a background thread.
+    Where the current RSS can't be read, falls back to the process' lifetime peak.
+
+        with PeakMemoryMonitor() as monitor:
+            ...
+        monitor.peak
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self) -> "PeakMemoryMonitor":
+        self.sample()
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._poll, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        self.sample()
+        if self.peak is None:
+            self.peak = max_rss()
+
+    def sample(self) -> None:
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class OutputStore:
+    """
+    The materialized operator outputs of a run, each released as soon as its last consumer has read it,
+    so only the outputs still waiting for a consumer are alive at any time. Thread safe.
+    """
+
+    def __init__(self, upstream: dict[str, list[str]], to_run: Iterable[str], preloaded: Optional[dict] = None,
+                 materializer: Optional[Materializer] = None):
+        """
+        :param upstream: Operator id -> ids of its upstream operators
+        :param to_run: The operators that will execute, ie. read their inputs from the store
+        :param preloaded: Outputs available before the run starts (eg. from the cache)
+        :param materializer: Materializes the outputs, possibly spilling them to disk past a memory budget
+        """
+        self.materializer = materializer or Materializer()
+        self._refcounts = {}
+        for op_id in to_run:
+            for parent in upstream[op_id]:
+                self._refcounts[parent] = self._refcounts.get(parent, 0) + 1
+        self._outputs = {}
+        self._lock = threading.Lock()
+        for op_id, output in (preloaded or {}).items():
+            self.put(op_id, output)
+
+    def put(self, op_id: str, output: Any) -> Any:
+        """
+        Materializes an operator's output (draining lazy iterators) and stores it, returns the materialized output.
+        """
+        # Outputs nobody reads (sinks, unused branches) are never stored
+        if not self._refcounts.get(op_id):
+            return list(output) if isinstance(output, Iterator) else output
+        output = self.materializer.materialize(op_id, output)
+        with self._lock:
+            self._outputs[op_id] = output
+        return output
+
+    def consume(self, op_ids: list[str]) -> list[Any]:
+        """
+        Returns the outputs of `op_ids`, releasing those that have no consumer left.
+        """
+        with self._lock:
+            outputs = [self._outputs[op_id] for op_id in op_ids]
+            for op_id in op_ids:
+                self._refcounts[op_id] -= 1
+                if self._refcounts[op_id] == 0:
+                    del self._outputs[op_id]
+                    self.materializer.release(op_id)
+        return outputs
+
+    def __len__(self) -> int:
+        return len(self._outputs)
@@ -0,0 +1,253 @@
+"""
+Per-operator runtime metrics, collected when a Pipeline is created with metrics=True (or with hooks or a profiler).
+
+Times exclude the time an operator spends waiting on its upstream operators (blocked_upstream),
+so in streaming mode, where operators run interleaved in the same threads, wall_time and cpu_time
+still measure each operator's own work. Bytes are the length of str/bytes records, other records count 0.
+"""
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+PROFILERS = ("cpu", "memory")
+
+
+class OperatorMetrics:
+
+    def __init__(self, operator_id: str, operator_type: str):
+        self.operator_id = operator_id
+        self.operator_type = operator_type
+        self.records_in = 0
+        self.records_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.batches_out = 0
+        # Seconds spent in the operator itself
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        # Seconds spent waiting for input records, and for room in full output buffers
+        self.blocked_upstream = 0.0
+        self.blocked_downstream = 0.0
+        # Max number of records (or batches) waiting in the operator's output buffers
+        self.peak_buffer = 0
+        # Per stage record counts of fused operators
+        self.stages: Optional[dict] = None
+        # Captured by the optional profilers
+        self.profile: Optional[str] = None
+        self.memory_peak: Optional[int] = None
+        self._upstream_cpu = 0.0
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+
+class RunMetrics:
+    """
+    The metrics of a single pipeline run, see Pipeline.run_metrics.
+    """
+
+    def __init__(self, pipeline_name: str, mode: str):
+        self.pipeline_name = pipeline_name
+        self.mode = mode
+        self.started_at = time.time()
+        self.wall_time = 0.0
+        self.peak_rss: Optional[int] = None
+        self.operators: dict[str, OperatorMetrics] = {}
+        self._lock = threading.Lock()
+
+    def operator(self, operator) -> OperatorMetrics:
+        with self._lock:
+            if operator.operator_id not in self.operators:
+                self.operators[operator.operator_id] = OperatorMetrics(operator.operator_id, type(operator).__name__)
+            return self.operators[operator.operator_id]
+
+    def slowest(self, n: int = 5) -> list[OperatorMetrics]:
+        return sorted(self.operators.values(), key=lambda metrics: metrics.wall_time, reverse=True)[:n]
+
+    def summary(self) -> dict:
+        return {
+            "pipeline": self.pipeline_name,
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "wall_time": self.wall_time,
+            "peak_rss": self.peak_rss,
+            "operators": {op_id: metrics.to_dict() for op_id, metrics in self.operators.items()},
+        }
+
+    def to_json(self, path: Optional[str] = None, indent: int = 2) -> str:
+        """
+        Returns the run summary as JSON, and writes it to `path` if given.
+        """
+        text = json.dumps(self.summary(), indent=indent)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+class MetricsHook:
+    """
+    Callbacks invoked while a pipeline runs, override any of them.
+    In streaming mode, they run in whichever thread executes the operator.
+    """
+
+    def before_operator(self, operator, metrics: OperatorMetrics) -> None:
+        pass
+
+    def after_operator(self, operator, metrics: OperatorMetrics) -> None:
+        pass
+
+    def on_batch(self, operator, batch: list, metrics: OperatorMetrics) -> None:
+        """
+        Called for every output batch of an operator, when the pipeline has a batch_size.
+        """
+        pass
+
+
+def _size(record: Any) -> int:
+    return len(record) if isinstance(record, (str, bytes, bytearray)) else 0
+
+
+def _count(item: Any, batched: bool) -> tuple[int, int]:
+    if batched:
+        return len(item), sum(_size(record) for record in item)
+    return 1, _size(item)
+
+
+class Instrumentation:
+    """
+    Collects the metrics of one run, by wrapping the operators' input and output streams.
+    """
+
+    def __init__(self, run_metrics: RunMetrics, hooks: Optional[list[MetricsHook]] = None,
+                 batched: bool = False, profile: Optional[str] = None):
+        self.run_metrics = run_metrics
+        self.hooks = hooks or []
+        self.batched = batched
+        self.profile = profile
+
+    def metrics(self, operator) -> OperatorMetrics:
+        return self.run_metrics.operator(operator)
+
+    def before(self, operator, metrics: OperatorMetrics) -> None:
+        for hook in self.hooks:
+            hook.before_operator(operator, metrics)
+
+    def after(self, operator, metrics: OperatorMetrics) -> None:
+        if hasattr(operator, 'stage_metrics'):
+            metrics.stages = operator.stage_metrics
+        for hook in self.hooks:
+            hook.after_operator(operator, metrics)
+
+    def on_batch(self, operator, batch: list, metrics: OperatorMetrics) -> None:
+        metrics.batches_out += 1
+        for hook in self.hooks:
+            hook.on_batch(operator, batch, metrics)
+
+    @contextmanager
+    def measure(self, operator, metrics: OperatorMetrics) -> Iterator[None]:
+        """
+        Times (and optionally profiles) a block running the whole operator, eg. in batch mode or a streaming sink.
+        """
+        self.before(operator, metrics)
+        blocked, upstream_cpu = metrics.blocked_upstream, metrics._upstream_cpu
+        # The profilers are only imported when used, they're a noticeable share of the package's import time
+        profiler = None
+        if self.profile == "cpu":
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+        elif self.profile == "memory":
+            import tracemalloc
+        started_tracing = self.profile == "memory" and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.profile == "memory":
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            metrics.wall_time += time.perf_counter() - wall - (metrics.blocked_upstream - blocked)
+            metrics.cpu_time += time.thread_time() - cpu - (metrics._upstream_cpu - upstream_cpu)
+            if profiler is not None:
+                stats = io.StringIO()
+                pstats.Stats(profiler, stream=stats).sort_stats("cumulative").print_stats(20)
+                metrics.profile = stats.getvalue()
+            if self.profile == "memory":
+                metrics.memory_peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self.after(operator, metrics)
+
+    def count_input(self, data: Any, metrics: OperatorMetrics) -> None:
+        # Materialized inputs, in batch and threaded modes
+        if isinstance(data, (list, tuple)):
+            metrics.records_in += len(data)
+            metrics.bytes_in += sum(_size(record) for record in data)
+        elif hasattr(data, '__len__'):
+            metrics.records_in += len(data)
+
+    def count_output(self, data: Any, metrics: OperatorMetrics) -> None:
+        if isinstance(data, (list, tuple)):
+            metrics.records_out += len(data)
+            metrics.bytes_out += sum(_size(record) for record in data)
+        elif hasattr(data, '__len__') and not isinstance(data, (str, bytes)):
+            metrics.records_out += len(data)
+
+    def batches(self, operator, batches: Iterable[list], metrics: OperatorMetrics) -> Iterator[list]:
+        for batch in batches:
+            self.on_batch(operator, batch, metrics)
+            yield batch
+
+    def input(self, stream: Iterable[Any], metrics: OperatorMetrics) -> Iterator[Any]:
+        """
+        Counts the records pulled from an input stream, and the time spent waiting for them.
+        """
+        iterator = iter(stream)
+        while True:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                metrics.blocked_upstream += time.perf_counter() - wall
+                metrics._upstream_cpu += time.thread_time() - cpu
+            records, size = _count(item, self.batched)
+            metrics.records_in += records
+            metrics.bytes_in += size
+            yield item
+
+    def output(self, operator, stream: Iterable[Any], metrics: OperatorMetrics) -> Iterator[Any]:
+        """
+        Times each pull from a lazy operator's output, minus the time spent pulling its inputs.
+        """
+        self.before(operator, metrics)
+        try:
+            iterator = iter(stream)
+            while True:
+                blocked, upstream_cpu = metrics.blocked_upstream, metrics._upstream_cpu
+                wall, cpu = time.perf_counter(), time.thread_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    metrics.wall_time += time.perf_counter() - wall - (metrics.blocked_upstream - blocked)
+                    metrics.cpu_time += time.thread_time() - cpu - (metrics._upstream_cpu - upstream_cpu)
+                records, size = _count(item, self.batched)
+                metrics.records_out += records
+                metrics.bytes_out += size
+                if self.batched:
+                    self.on_batch(operator, item, metrics)
+                yield item
+        finally:
+            self.after(operator, metrics)
@@ -1,16 +1,30 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from types import SimpleNamespace
+from typing import Any, Iterable, Optional
 from petal.src.core.context import get_current_pipeline
+from petal.src.core.executors import LOCAL
+from petal.src.logger import operator_logger
+from petal.src.core.ownership import DEEPCOPY
+from petal.src.core.utils import chunked, flatten
 
 
 class BaseOperator(ABC):
+    # Whether the operator forwards its single input unchanged, so the optimizer may remove it
+    pass_through = False
+
     def __init__(self, operator_id: str):
         self.operator_id = operator_id
+        # Child of the petal logger, see petal.src.logger.set_operator_level
+        self.log = operator_logger(operator_id)
+        # Data ownership mode for this operator, falls back to the pipeline's when unset
+        self.ownership: Optional[str] = None
+        # Where the operator runs, see run_on
+        self.execution = LOCAL
 
         # Register self to current DAG
-        pipeline = get_current_pipeline()
-        if pipeline:
-            pipeline.add_node(self)
+        self.pipeline = get_current_pipeline()
+        if self.pipeline:
+            self.pipeline.add_node(self)
 
     def __rshift__(self, other):
         raise NotImplementedError
@@ -18,7 +32,78 @@ class BaseOperator(ABC):
     def __lshift__(self, other):
         raise NotImplementedError
 
+    def __getstate__(self) -> dict:
+        # Operators are pickled to run in other processes (see petal.src.core.cluster) on their own:
+        # without the rest of the graph, and with only the pipeline settings they fall back to
+        state = self.__dict__.copy()
+        for attr in ("upstream", "downstream"):
+            if attr in state:
+                state[attr] = []
+        if state.get("pipeline") is not None:
+            pipeline = state["pipeline"]
+            state["pipeline"] = SimpleNamespace(**{attr: getattr(pipeline, attr) for attr in ("ownership", "memory_budget", "spill_dir")
+                                                   if hasattr(pipeline, attr)})
+        return state
+
+    def run_on(self, target: str) -> "BaseOperator":
+        """
+        Sets where the operator runs: "local" (the default) is the pipeline's own process, any other target is
+        the name of one of the pipeline's executors, see petal.src.core.executors. Returns the operator.
+        """
+        self.execution = target
+        return self
+
+    def data_ownership(self) -> str:
+        if self.ownership:
+            return self.ownership
+        return getattr(self.pipeline, 'ownership', DEEPCOPY)
+
+    def validate(self) -> None:
+        """
+        Pre-flight checks run by Pipeline.validate() before anything executes.
+        Raises ValueError if the operator is misconfigured.
+        """
+        pass
+
+    def cache_config(self) -> Optional[dict]:
+        """
+        The configuration that determines this operator's output given its inputs, used to key
+        the operator output cache (see petal.src.core.cache). None means the output can't be cached,
+        which is the default: operators opt in, and operators with side effects (eg. Writers) never should.
+        """
+        return None
+
+    def commit(self) -> None:
+        """
+        Called on every operator once a run has completed successfully, ie. once every sink has processed
+        (and acknowledged) its input. Operators tracking progress across runs (eg. a FileReader's checkpoint)
+        persist it here, so a failed run is re-processed from the last commit.
+        """
+        pass
+
+    def abort(self) -> None:
+        """
+        Called on every operator instead of commit() when a run fails. Operators holding on to resources
+        for the records of the run (eg. messages leased from a queue) release them here.
+        """
+        pass
+
     @abstractmethod
     def process(self, *inputs: Any) -> Any:
         pass
 
+    def process_batches(self, *inputs: Iterable[list], batch_size: int) -> Optional[Iterable[list]]:
+        """
+        Batch protocol, used when the pipeline has a batch_size.
+        Each input is a stream of record batches, and the output is returned the same way.
+        This default adapts the record-at-a-time `process`, batch-native operators override it.
+
+        :param inputs: One stream of batches per upstream operator
+        :param batch_size: The pipeline's batch size, for re-batching the output
+        :return: A stream of batches, or None for Sinks
+        """
+        result = self.process(*[flatten(batches) for batches in inputs])
+        if result is None or isinstance(result, (str, bytes)):
+            return None
+        return chunked(result, batch_size)
+
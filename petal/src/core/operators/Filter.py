@@ -1,13 +1,70 @@
-import copy
-from typing import Any, Callable, Iterable
+from itertools import compress
+from typing import Any, Callable, Iterable, Optional
 
+from petal.src.core.cache import callable_fingerprint
 from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own, validate_ownership
+from petal.src.core.parallel import check_picklable, filter_chunk, parallel_apply
+from petal.src.core.utils import chunked, flatten
 
 
 class Filter(NonTerminalOperator):
-    def __init__(self, operator_id: str, filter_func: Callable):
+    def __init__(self, operator_id: str, filter_func: Callable, ownership: Optional[str] = None,
+                 parallelism: int = 1, chunk_size: int = 1024, ordered: bool = True, vectorized: bool = False):
+        """
+        :param operator_id: Unique id of the operator
+        :param filter_func: The filter function applied to each record
+        :param ownership: Data ownership mode, see petal.src.core.ownership
+        :param parallelism: Number of worker processes, 1 runs in-process
+        :param chunk_size: Number of records sent to a worker process at once
+            (and per call of a vectorized function when the pipeline isn't batched)
+        :param ordered: Whether parallel output keeps the input order
+        :param vectorized: Whether filter_func takes a whole batch (list or NumPy array) and returns a boolean mask for a whole batch
+        """
         super().__init__(operator_id)
+        if parallelism < 1 or chunk_size < 1:
+            raise ValueError("parallelism and chunk_size must be at least 1")
+        if parallelism > 1 and vectorized:
+            raise ValueError("vectorized operators run in-process, parallelism must be 1")
         self.filter_func = filter_func
+        self.ownership = validate_ownership(ownership)
+        self.parallelism = parallelism
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.vectorized = vectorized
+
+    def validate(self) -> None:
+        if self.parallelism > 1:
+            check_picklable(self.filter_func, f"{self.operator_id}: filter_func")
+
+    def cache_config(self) -> Optional[dict]:
+        fingerprint = callable_fingerprint(self.filter_func)
+        if fingerprint is None:
+            return None
+        return {"filter_func": fingerprint, "vectorized": self.vectorized, "unordered": self.parallelism > 1 and not self.ordered}
 
     def process(self, data: Iterable[Any]) -> Iterable[Any]:
-        return filter(self.filter_func, copy.deepcopy(data))
+        if self.vectorized:
+            return flatten(self._process_batches(chunked(data, self.chunk_size)))
+        if self.parallelism > 1:
+            # Records are pickled across the process boundary, so they never need copying here
+            return parallel_apply(filter_chunk, self.filter_func, data, self.parallelism, self.chunk_size, self.ordered)
+        return filter(self.filter_func, own(data, self.data_ownership()))
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterable[list]:
+        if self.parallelism > 1:
+            return super().process_batches(batches, batch_size=batch_size)
+        return self._process_batches(batches)
+
+    def _process_batches(self, batches: Iterable[list]) -> Iterable[list]:
+        ownership = self.data_ownership()
+        for batch in batches:
+            batch = own(batch, ownership)
+            if self.vectorized:
+                mask = self.filter_func(batch)
+                # NumPy arrays support boolean indexing, anything else is filtered with the mask
+                kept = batch[mask] if hasattr(batch, 'shape') else list(compress(batch, mask))
+            else:
+                kept = list(filter(self.filter_func, batch))
+            if len(kept):
+                yield kept
@@ -0,0 +1,76 @@
+from typing import Any, Iterable, Iterator, Optional
+
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import COPY_ON_WRITE, DEEPCOPY, IMMUTABLE, own
+
+# From the least to the most defensive
+_OWNERSHIP_STRICTNESS = (IMMUTABLE, COPY_ON_WRITE, DEEPCOPY)
+
+
+class FusedOperator(NonTerminalOperator):
+    """
+    A chain of Mappers and Filters executed in a single loop, created by the optimizer.
+    The input is copied once, with the most defensive ownership mode of the chain,
+    since the intermediate records are never seen outside of the chain.
+    Record counts are kept for each of the original operators in `stage_metrics`.
+    """
+
+    def __init__(self, operator_id: str, stages: list):
+        super().__init__(operator_id)
+        self.stages = stages
+        self.pipeline = stages[0].pipeline
+        self.execution = stages[0].execution
+        self._steps = [(isinstance(stage, Filter), stage.filter_func if isinstance(stage, Filter) else stage.mapping_func)
+                       for stage in stages]
+        self._records_in = [0] * len(stages)
+        self._records_out = [0] * len(stages)
+
+    @property
+    def stage_metrics(self) -> dict[str, dict[str, int]]:
+        return {stage.operator_id: {"records_in": records_in, "records_out": records_out}
+                for stage, records_in, records_out in zip(self.stages, self._records_in, self._records_out)}
+
+    def cache_config(self) -> Optional[dict]:
+        configs = [stage.cache_config() for stage in self.stages]
+        if any(config is None for config in configs):
+            return None
+        return {"stages": [(type(stage).__qualname__, sorted(config.items()))
+                           for stage, config in zip(self.stages, configs)]}
+
+    def data_ownership(self) -> str:
+        return max((stage.data_ownership() for stage in self.stages), key=_OWNERSHIP_STRICTNESS.index)
+
+    def process(self, data: Iterable[Any]) -> Iterable[Any]:
+        self._reset()
+        return self._run(own(data, self.data_ownership()))
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterable[list]:
+        self._reset()
+        return self._run_batches(batches)
+
+    def _reset(self) -> None:
+        self._records_in = [0] * len(self.stages)
+        self._records_out = [0] * len(self.stages)
+
+    def _run_batches(self, batches: Iterable[list]) -> Iterator[list]:
+        ownership = self.data_ownership()
+        for batch in batches:
+            kept = list(self._run(own(batch, ownership)))
+            if kept:
+                yield kept
+
+    def _run(self, records: Iterable[Any]) -> Iterator[Any]:
+        steps = self._steps
+        records_in, records_out = self._records_in, self._records_out
+        for record in records:
+            for idx, (is_filter, func) in enumerate(steps):
+                records_in[idx] += 1
+                if is_filter:
+                    if not func(record):
+                        break
+                else:
+                    record = func(record)
+                records_out[idx] += 1
+            else:
+                yield record
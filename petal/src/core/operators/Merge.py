@@ -0,0 +1,34 @@
+from itertools import chain
+from typing import Any, Iterable, Iterator, Optional
+
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.streams import interleave
+
+
+class Merge(NonTerminalOperator):
+    """
+    Merges the outputs of the replicas of an operator in a Partition (see petal.src.core.partition) back into
+    a single stream, created when the plan is built, with the id of the original operator. Streamed outputs are
+    merged as their records become available, so only the records of each replica keep their relative order.
+    """
+
+    def __init__(self, original, buffer_size: int = 1024):
+        super().__init__(original.operator_id)
+        self.pipeline = original.pipeline
+        self.buffer_size = buffer_size
+
+    def cache_config(self) -> Optional[dict]:
+        return None
+
+    def process(self, *data: Iterable[Any]) -> Iterable[Any]:
+        # Every record comes from a single replica, so it's never shared and needs no copy
+        return self._merge(data)
+
+    def process_batches(self, *batches: Iterable[list], batch_size: int) -> Iterable[list]:
+        return self._merge(batches)
+
+    def _merge(self, streams: tuple) -> Iterator[Any]:
+        if not any(isinstance(stream, Iterator) for stream in streams):
+            # Materialized outputs are all available already
+            return chain.from_iterable(streams)
+        return interleave(list(streams), self.buffer_size)
@@ -0,0 +1,41 @@
+from itertools import count
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional
+
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import IMMUTABLE
+
+
+class Partitioner(NonTerminalOperator):
+    """
+    Assigns every record to one of the replicas of a Partition (see petal.src.core.partition), created when
+    the plan is built: by the hash of its key, so that records with the same key always go to the same replica,
+    or round-robin without a key. Outputs `((replica index,), record)`, selected by one Route per replica.
+    """
+
+    def __init__(self, operator_id: str, replicas: int, key: Optional[Callable[[Any], Hashable]] = None):
+        super().__init__(operator_id)
+        self.replicas = replicas
+        self.key = key
+        # Every record goes to a single replica, whose operators copy it according to their own ownership
+        self.ownership = IMMUTABLE
+
+    def cache_config(self) -> Optional[dict]:
+        # Python salts the hash of strings per process, so assignments can't be reused across runs
+        return None
+
+    def process(self, data: Iterable[Any]) -> Iterator[tuple[tuple[int], Any]]:
+        assign = self._assigner()
+        return ((assign(record), record) for record in data)
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterator[list]:
+        assign = self._assigner()
+        for batch in batches:
+            yield [(assign(record), record) for record in batch]
+
+    def _assigner(self) -> Callable[[Any], tuple[int]]:
+        routes = [(idx,) for idx in range(self.replicas)]
+        replicas, key = self.replicas, self.key
+        if key is None:
+            counter = count()
+            return lambda record: routes[next(counter) % replicas]
+        return lambda record: routes[hash(key(record)) % replicas]
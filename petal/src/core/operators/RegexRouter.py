@@ -0,0 +1,36 @@
+from typing import Iterable, Iterator, Optional
+
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.regex import MultiPattern
+
+
+class RegexRouter(NonTerminalOperator):
+    """
+    Sibling regex filters reading the same input, evaluated together in a single pass per record,
+    created by the optimizer. Every record matching at least one pattern is output once, as
+    `(indices of the matching filters, record)`, and each original filter is replaced by a Route
+    selecting its own records. Records matching no pattern are dropped here.
+    """
+
+    def __init__(self, operator_id: str, filters: list):
+        super().__init__(operator_id)
+        self.filters = filters
+        self.pipeline = filters[0].pipeline
+        self.execution = filters[0].execution
+        self.patterns = MultiPattern([stage.filter_func.__self__ for stage in filters])
+
+    def cache_config(self) -> Optional[dict]:
+        return None
+
+    def process(self, data: Iterable[str]) -> Iterator[tuple[tuple[int, ...], str]]:
+        matches = self.patterns.matches
+        for record in data:
+            routes = matches(record)
+            if routes:
+                yield routes, record
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterator[list]:
+        for batch in batches:
+            routed = list(self.process(batch))
+            if routed:
+                yield routed
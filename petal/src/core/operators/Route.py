@@ -0,0 +1,39 @@
+from typing import Any, Iterable, Iterator, Optional
+
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own
+
+
+class Route(NonTerminalOperator):
+    """
+    One branch of a RegexRouter, created by the optimizer in place of the original filter (and with its id),
+    or of a Partitioner: outputs the records routed to branch number `index`.
+    """
+
+    def __init__(self, original, index: int, operator_id: Optional[str] = None):
+        super().__init__(operator_id or original.operator_id)
+        self.original = original
+        self.index = index
+        self.pipeline = original.pipeline
+        self.execution = original.execution
+        self.ownership = original.ownership
+
+    def cache_config(self) -> Optional[dict]:
+        return None
+
+    def process(self, data: Iterable[tuple[tuple[int, ...], Any]]) -> Iterable[Any]:
+        # Routing never mutates records, so only the defensive deepcopy policy copies, like a Splitter
+        return own(self._select(data), self.data_ownership(), writes=False)
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterator[list]:
+        ownership = self.data_ownership()
+        for batch in batches:
+            selected = list(self._select(batch))
+            if selected:
+                yield own(selected, ownership, writes=False)
+
+    def _select(self, data: Iterable[tuple[tuple[int, ...], Any]]) -> Iterator[Any]:
+        index = self.index
+        for routes, record in data:
+            if index in routes:
+                yield record
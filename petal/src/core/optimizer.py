@@ -0,0 +1,140 @@
+import re
+from typing import Optional
+
+from petal.src.logger import logger
+from petal.src.core.context import detached
+from petal.src.core.executors import LOCAL
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.FusedOperator import FusedOperator
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.operators.RegexRouter import RegexRouter
+from petal.src.core.operators.Route import Route
+from petal.src.core.ownership import DEEPCOPY
+from petal.src.core.plan import Plan
+from petal.src.core.regex import combinable
+
+
+def optimize(plan: Plan) -> Plan:
+    """
+    Rewrites a plan in place:
+    - removes pass-through operators (IdentityTransformers, Splitters), connecting their upstream to their consumers
+    - evaluates sibling regex filters reading the same input in a single pass, with a RegexRouter
+    - fuses chains of single-input/single-output Mappers and Filters into one FusedOperator
+    """
+    with detached():
+        _remove_pass_through(plan)
+        _route_regex_siblings(plan)
+        _fuse_chains(plan)
+    return plan
+
+
+def is_fusable(node) -> bool:
+    # Only the built-in record-at-a-time logic can be fused, not custom process() overrides
+    for base in (Mapper, Filter):
+        if isinstance(node, base):
+            return (type(node).process is base.process and type(node).process_batches is base.process_batches
+                    and node.parallelism == 1 and not node.vectorized and not node.pass_through)
+    return False
+
+
+def _remove_pass_through(plan: Plan) -> None:
+    for op_id in plan.execution_order():
+        node = plan.nodes[op_id]
+        if not node.pass_through or len(plan.upstream[op_id]) != 1:
+            continue
+        consumers = plan.consumers(plan.execution_order())
+        (parent,) = plan.upstream[op_id]
+        # A defensive copy only matters if the upstream output is also read by someone else
+        if node.data_ownership() == DEEPCOPY and len(consumers[parent]) > 1:
+            continue
+        logger.info("\tOptimizer: removing pass-through operator %s", op_id)
+        plan.bypass(op_id)
+
+
+def regex_search(node) -> Optional[re.Pattern]:
+    # The pattern of a Filter whose function is the search method of a compiled pattern, eg. a RegexFilter
+    func = node.filter_func
+    if getattr(func, '__name__', None) == "search" and isinstance(getattr(func, '__self__', None), re.Pattern):
+        return func.__self__
+    return None
+
+
+def _route_regex_siblings(plan: Plan) -> None:
+    execution_order = plan.execution_order()
+    consumers = plan.consumers(execution_order)
+    for parent in execution_order:
+        # Siblings sharing the same flags and execution target can be combined
+        siblings: dict[tuple[int, str], list[str]] = {}
+        for op_id in consumers[parent]:
+            node = plan.nodes[op_id]
+            if not is_fusable(node) or not isinstance(node, Filter) or len(plan.upstream[op_id]) != 1:
+                continue
+            pattern = regex_search(node)
+            if pattern is not None and combinable([pattern]):
+                siblings.setdefault((pattern.flags, node.execution), []).append(op_id)
+        for op_ids in siblings.values():
+            if len(op_ids) < 2:
+                continue
+            # The execution order of siblings isn't deterministic, their router's id should be
+            op_ids = sorted(op_ids)
+            filters = [plan.nodes[op_id] for op_id in op_ids]
+            try:
+                router = RegexRouter("|".join(op_ids), filters)
+            except ValueError as e:
+                logger.info("\tOptimizer: not routing %s: %s", op_ids, e)
+                continue
+            logger.info("\tOptimizer: routing %s with %s", op_ids, router.operator_id)
+            plan.nodes[router.operator_id] = router
+            plan.upstream[router.operator_id] = [parent]
+            for idx, (op_id, node) in enumerate(zip(op_ids, filters)):
+                plan.nodes[op_id] = Route(node, idx)
+                plan.upstream[op_id] = [router.operator_id]
+            plan.routed[router.operator_id] = op_ids
+
+
+def _fuse_chains(plan: Plan) -> None:
+    execution_order = plan.execution_order()
+    consumers = plan.consumers(execution_order)
+    fused = set()
+    for op_id in execution_order:
+        if op_id in fused or not is_fusable(plan.nodes[op_id]):
+            continue
+        chain = [op_id]
+        while len(consumers[chain[-1]]) == 1:
+            (child,) = consumers[chain[-1]]
+            node = plan.nodes[child]
+            if not is_fusable(node) or len(plan.upstream[child]) != 1 or node.execution != plan.nodes[op_id].execution:
+                break
+            chain.append(child)
+        if len(chain) < 2:
+            continue
+
+        fused.update(chain)
+        fused_id = "+".join(chain)
+        logger.info("\tOptimizer: fusing %s into %s", chain, fused_id)
+        node = FusedOperator(fused_id, [plan.nodes[stage] for stage in chain])
+        plan.replace(chain, fused_id, node, plan.upstream[chain[0]])
+        plan.fused[fused_id] = chain
+        # Consumers of the last stage now read from the fused operator
+        consumers[fused_id] = consumers[chain[-1]]
+
+
+def explain(plan: Plan) -> str:
+    lines = []
+    for op_id in plan.execution_order():
+        node = plan.nodes[op_id]
+        line = f"[{op_id}] {type(node).__name__}"
+        if plan.upstream[op_id]:
+            line += f" <- {', '.join(plan.upstream[op_id])}"
+        if op_id in plan.fused:
+            line += f" (fused: {' >> '.join(plan.fused[op_id])})"
+        if op_id in plan.routed:
+            line += f" (routes: {', '.join(plan.routed[op_id])})"
+        if node.execution != LOCAL:
+            line += f" (on: {node.execution})"
+        lines.append(line)
+    if plan.replicas:
+        lines.append(f"Replicated operators: {', '.join(f'{op_id} (x{len(replicas)})' for op_id, replicas in plan.replicas.items())}")
+    if plan.removed:
+        lines.append(f"Removed pass-through operators: {', '.join(plan.removed)}")
+    return "\n".join(lines)
@@ -0,0 +1,62 @@
+"""
+Data ownership policies - how much an operator copies the records it receives.
+
+- IMMUTABLE: records are treated as read-only and shared by reference, nothing is ever copied.
+- COPY_ON_WRITE: records are shared until they reach an operator that hands them to user code
+  (mapping, filter or reducer functions). Only there are mutable records copied, one at a time.
+  Operators that merely route records (eg. Splitter) never copy.
+- DEEPCOPY: every operator defensively deep-copies its whole input (the original behaviour).
+"""
+import copy
+from collections.abc import Iterator
+from typing import Any, Iterable, Optional
+
+from petal.src.core.utils import deepcopy_stream
+
+IMMUTABLE = "immutable"
+COPY_ON_WRITE = "copy_on_write"
+DEEPCOPY = "deepcopy"
+
+OWNERSHIP_MODES = (IMMUTABLE, COPY_ON_WRITE, DEEPCOPY)
+
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None), range)
+
+
+def validate_ownership(ownership: Optional[str]) -> Optional[str]:
+    if ownership is not None and ownership not in OWNERSHIP_MODES:
+        raise ValueError(f"Unknown data ownership mode '{ownership}', expected one of {OWNERSHIP_MODES}")
+    return ownership
+
+
+def is_immutable(record: Any) -> bool:
+    if isinstance(record, _IMMUTABLE_TYPES):
+        return True
+    if isinstance(record, (tuple, frozenset)):
+        return all(is_immutable(item) for item in record)
+    return False
+
+
+def copy_if_mutable(record: Any) -> Any:
+    return record if is_immutable(record) else copy.deepcopy(record)
+
+
+def own(data: Iterable[Any], ownership: str, writes: bool = True) -> Iterable[Any]:
+    """
+    Applies an ownership policy to an operator's input.
+
+    :param data: The input stream, either materialized or lazy
+    :param ownership: One of OWNERSHIP_MODES
+    :param writes: Whether the operator hands the records to code that could mutate them
+    :return: The input, copied as much as the policy requires
+    """
+    if ownership == IMMUTABLE or (ownership == COPY_ON_WRITE and not writes):
+        return data
+    if ownership == COPY_ON_WRITE:
+        if data is None:
+            return None
+        if isinstance(data, Iterator):
+            return map(copy_if_mutable, data)
+        if isinstance(data, (list, tuple)):
+            return list(map(copy_if_mutable, data))
+        return copy.deepcopy(data)
+    return deepcopy_stream(data)
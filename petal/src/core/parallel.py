@@ -0,0 +1,71 @@
+import pickle
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from typing import Any, Callable, Iterable, Iterator
+
+from petal.src.core.utils import chunked
+
+# The user function, installed once in each worker process rather than pickled with every chunk
+_worker_func = None
+
+
+def _init_worker(func: Callable) -> None:
+    global _worker_func
+    _worker_func = func
+
+
+def map_chunk(chunk: list) -> list:
+    return [_worker_func(record) for record in chunk]
+
+
+def filter_chunk(chunk: list) -> list:
+    return [record for record in chunk if _worker_func(record)]
+
+
+def check_picklable(obj: Any, description: str) -> None:
+    try:
+        pickle.dumps(obj)
+    except Exception as e:
+        raise ValueError(f"{description} must be picklable to run on a process pool: {e}") from e
+
+
+def parallel_apply(chunk_func: Callable[[list], list], func: Callable, data: Iterable[Any], parallelism: int,
+                   chunk_size: int, ordered: bool = True) -> Iterator[Any]:
+    """
+    Applies `func` to chunks of records on a pool of `parallelism` processes.
+    At most two chunks per worker are in flight at once, so lazy inputs are never fully materialized.
+
+    :param chunk_func: map_chunk or filter_chunk
+    :param func: The user function, must be picklable
+    :param data: The input stream
+    :param parallelism: Number of worker processes
+    :param chunk_size: Number of records sent to a worker at once
+    :param ordered: Whether to yield records in input order, or as soon as their chunk is done
+    :return: The processed records
+    """
+    # Importing the process pool pulls in multiprocessing, which most pipelines never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_in_flight = 2 * parallelism
+    chunks = chunked(data, chunk_size)
+
+    with ProcessPoolExecutor(max_workers=parallelism, initializer=_init_worker, initargs=(func,)) as pool:
+        if ordered:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(pool.submit(chunk_func, chunk))
+                if len(in_flight) >= max_in_flight:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+            return
+
+        in_flight = set()
+        for chunk in chunks:
+            in_flight.add(pool.submit(chunk_func, chunk))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        for future in as_completed(in_flight):
+            yield from future.result()
@@ -0,0 +1,141 @@
+"""
+Data-parallel replication of a sub-DAG, see Partition.
+"""
+import copy
+from typing import Any, Callable, Hashable, Optional
+
+from petal.src.logger import logger
+from petal.src.core.context import detached, get_current_pipeline
+from petal.src.core.operators.Merge import Merge
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.operators.Partitioner import Partitioner
+from petal.src.core.operators.Route import Route
+from petal.src.core.operators.Sink import Sink
+from petal.src.core.plan import Plan
+
+
+class Partition:
+    """
+    Replicates the operators created within its context `replicas` times, and splits their input between
+    the replicas: by the hash of `key(record)`, so records with the same key are always processed by the same
+    replica (eg. a per-IP GroupBy stays correct), or round-robin without a key. The outputs of the replicas
+    are merged back into a single stream for every consumer outside of the partition.
+
+        with Pipeline("etl", mode="streaming") as dag:
+            source = FileReader("logs", file_path="logs.txt")
+            with Partition("by_ip", 4, key=ip_of):
+                counts = source >> RegexFilter("helos", "HELO") >> GroupBy("counts", ip_of, {"helos": Count()})
+            counts >> FileWriter("counts", file_path="counts.txt")
+
+    Replicas are copies of the operators with the ids `<operator id>#<replica index>`, and run like any other
+    operator: concurrently in streaming and threaded modes, or on the workers of an executor with `target`
+    (see petal.src.core.executors). The partition is applied when the plan is built, before it is optimized.
+    Sources and sinks can't be replicated, they must be created outside of the partition.
+    """
+
+    def __init__(self, partition_id: str, replicas: int, key: Optional[Callable[[Any], Hashable]] = None,
+                 target: Optional[str] = None):
+        """
+        :param partition_id: Unique id of the partition, and of the operator splitting its input
+        :param replicas: Number of replicas of the sub-DAG
+        :param key: Extracts the partitioning key of an input record, must be hashable. None assigns records
+            round-robin. With several inputs, the same key function applies to all of them
+        :param target: Execution target of the replicated operators, see BaseOperator.run_on
+        """
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1")
+        self.partition_id = partition_id
+        self.replicas = replicas
+        self.key = key
+        self.target = target
+        # Ids of the operators created within the context
+        self.operator_ids: list[str] = []
+        self.pipeline = None
+
+    def __enter__(self) -> "Partition":
+        self.pipeline = get_current_pipeline()
+        if self.pipeline is None:
+            raise ValueError("A Partition must be created within a Pipeline")
+        self._existing = set(self.pipeline.nodes)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.operator_ids = [op_id for op_id in self.pipeline.nodes if op_id not in self._existing]
+        for other in self.pipeline.partitions:
+            if set(other.operator_ids).intersection(self.operator_ids):
+                raise ValueError(f"Partition '{self.partition_id}' can't be nested in partition '{other.partition_id}'")
+        if self.target is not None:
+            for op_id in self.operator_ids:
+                self.pipeline.nodes[op_id].run_on(self.target)
+        self.pipeline.partitions.append(self)
+
+    @detached()
+    def replicate(self, plan: Plan) -> None:
+        """
+        Rewrites the plan in place: every operator of the partition is replaced by its replicas, fed by a
+        Partitioner (and one Route per replica) for each input from outside of the partition, and by a Merge
+        of its replicas' outputs if it has consumers outside of the partition. These only belong to the plan,
+        and don't register with the pipeline.
+        """
+        members = [op_id for op_id in self.operator_ids if op_id in plan.nodes]
+        if not members:
+            return
+        member_set = set(members)
+        sources = [op_id for op_id in members if not plan.upstream[op_id]]
+        if sources:
+            raise ValueError(f"Partition '{self.partition_id}': sources can't be replicated, {sources} have no input")
+        sinks = [op_id for op_id in members
+                 if isinstance(plan.nodes[op_id], Sink) and not isinstance(plan.nodes[op_id], NonTerminalOperator)]
+        if sinks:
+            # Every replica would write to the same destination (eg. a FileWriter's file), overwriting the others
+            raise ValueError(f"Partition '{self.partition_id}': sinks can't be replicated, create {sinks} "
+                             f"outside of the partition")
+        consumers = plan.consumers(plan.execution_order())
+        inputs = list(dict.fromkeys(parent for op_id in members for parent in plan.upstream[op_id]
+                                    if parent not in member_set))
+
+        # Id of the partitioner of each input
+        partitioners = {}
+        for parent in inputs:
+            partitioner_id = self.partition_id if len(inputs) == 1 else f"{self.partition_id}:{parent}"
+            route_ids = [f"{partitioner_id}#{idx}" for idx in range(self.replicas)]
+            taken = [op_id for op_id in (partitioner_id, *route_ids) if op_id in plan.nodes]
+            if taken:
+                raise ValueError(f"Partition '{self.partition_id}': ids {taken} are already used by operators")
+            partitioner = Partitioner(partitioner_id, self.replicas, self.key)
+            partitioner.pipeline = self.pipeline
+            plan.nodes[partitioner_id] = partitioner
+            plan.upstream[partitioner_id] = [parent]
+            for idx, route_id in enumerate(route_ids):
+                plan.nodes[route_id] = Route(partitioner, idx, route_id)
+                plan.upstream[route_id] = [partitioner_id]
+            plan.partitions[partitioner_id] = route_ids
+            partitioners[parent] = partitioner_id
+
+        for op_id in members:
+            node = plan.nodes.pop(op_id)
+            upstream = plan.upstream.pop(op_id)
+            replica_ids = []
+            for idx in range(self.replicas):
+                replica_id = f"{op_id}#{idx}"
+                plan.nodes[replica_id] = _replica(node, replica_id)
+                plan.upstream[replica_id] = [f"{parent}#{idx}" if parent in member_set else f"{partitioners[parent]}#{idx}"
+                                             for parent in upstream]
+                replica_ids.append(replica_id)
+            plan.replicas[op_id] = replica_ids
+            if any(child not in member_set for child in consumers[op_id]):
+                # Consumers outside of the partition read the merged output, under the original id
+                plan.nodes[op_id] = Merge(node, getattr(self.pipeline, 'buffer_size', 1024))
+                plan.upstream[op_id] = replica_ids
+        logger.info("\tPartition '%s': %d replicas of %s", self.partition_id, self.replicas, members)
+
+
+def _replica(node, replica_id: str):
+    # Copied through BaseOperator.__getstate__, ie. without the rest of the graph
+    try:
+        replica = copy.deepcopy(node)
+    except Exception as e:
+        raise ValueError(f"{node.operator_id} can't be replicated, it must be deep-copyable: {e}") from e
+    replica.operator_id = replica_id
+    replica.pipeline = node.pipeline
+    return replica
@@ -1,35 +1,377 @@
-from types import GeneratorType
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
 
-from petal.src.logger import logger
+from petal.src.logger import logger, preview
+from petal.src.core.cache import MISS, OperatorCache, cache_key
 from petal.src.core.context import PipelineContext
-from petal.src.core.utils import is_dag, topological_sort
+from petal.src.core.executors import LOCAL, Executor, LocalExecutor
+from petal.src.core.memory import OutputStore, PeakMemoryMonitor
+from petal.src.core.metrics import PROFILERS, Instrumentation, MetricsHook, RunMetrics
+from petal.src.core.optimizer import explain, optimize
+from petal.src.core.ownership import DEEPCOPY, validate_ownership
+from petal.src.core.plan import Plan
+from petal.src.core.scheduler import schedule
+from petal.src.core.spill import Materializer, Serializer, get_serializer
+from petal.src.core.streams import FanOut, branches_are_independent, deferred, drain, invoke
+from petal.src.core.utils import chunked, flatten, is_async_operator, is_dag
+
+EXECUTION_MODES = ("batch", "streaming", "threaded")
 
 
 class Pipeline(PipelineContext):
-    def __init__(self, pipeline_name: str):
+    def __init__(self, pipeline_name: str, mode: str = "batch", buffer_size: int = 1024,
+                 ownership: str = DEEPCOPY, max_workers: Optional[int] = None, batch_size: Optional[int] = None,
+                 optimize: bool = False, cache: Optional[OperatorCache] = None, memory_budget: Optional[int] = None,
+                 spill_serializer: Union[str, Serializer] = "pickle", spill_dir: Optional[str] = None,
+                 metrics: bool = False, hooks: Optional[list[MetricsHook]] = None, profile: Optional[str] = None,
+                 executors: Optional[dict[str, Executor]] = None):
+        """
+        :param pipeline_name: Name of the pipeline, used in logs
+        :param mode: "batch" materializes each operator's output before running its consumers,
+            "streaming" wires the operators together as lazy iterators,
+            "threaded" is like batch but runs independent operators concurrently on a thread pool
+        :param buffer_size: Max number of records buffered per consumer of a fan-out point in streaming mode,
+            and between any two operators in run_async
+        :param ownership: Default data ownership mode of the operators ("immutable", "copy_on_write" or "deepcopy"),
+            see petal.src.core.ownership
+        :param max_workers: Size of the thread pool in threaded mode
+        :param batch_size: If set, operators exchange lists of up to batch_size records through their
+            process_batches method (see BaseOperator) instead of one record at a time. Applies to run()
+        :param optimize: Whether to rewrite the DAG before executing it, see petal.src.core.optimizer
+        :param cache: Reuse the outputs of operators whose configuration and inputs haven't changed since
+            a previous run, see petal.src.core.cache. Only in batch and threaded modes
+        :param memory_budget: Approximate number of bytes the materialized operator outputs may hold in memory.
+            Past it, outputs are spilled to temporary files, see petal.src.core.spill. Only in batch and threaded modes
+        :param spill_serializer: How spilled records are serialized: "pickle" (any record), "text" (strings)
+            or "bytes" (length-prefixed bytes), or a Serializer instance
+        :param spill_dir: Directory of the spill files, defaults to the system's temporary directory
+        :param metrics: Collect per-operator metrics (see petal.src.core.metrics) into `run_metrics`.
+            Implied by hooks and profile
+        :param hooks: MetricsHooks called before/after each operator and for each batch
+        :param profile: Capture a "cpu" (cProfile) or "memory" (tracemalloc peak) profile of each operator.
+            Only in batch mode, where operators run one at a time
+        :param executors: Execution backends by target name, for operators running outside of the pipeline's
+            process (see BaseOperator.run_on and petal.src.core.executors). Applies to run()
+        """
         super().__init__()
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode '{mode}', expected one of {EXECUTION_MODES}")
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if cache is not None and mode == "streaming":
+            raise ValueError("The operator cache needs materialized outputs, it can't be used in streaming mode")
+        if memory_budget is not None and mode == "streaming":
+            raise ValueError("memory_budget applies to materialized outputs, streaming mode doesn't materialize them")
+        if profile is not None and (profile not in PROFILERS or mode != "batch"):
+            raise ValueError(f"profile must be one of {PROFILERS}, and is only supported in batch mode")
+        if executors and LOCAL in executors:
+            raise ValueError(f"'{LOCAL}' is the pipeline's own process, it can't be used as an executor name")
         self.name = pipeline_name
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.ownership = validate_ownership(ownership)
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.optimize = optimize
+        self.cache = cache
+        self.memory_budget = memory_budget
+        self.spill_serializer = get_serializer(spill_serializer)
+        self.spill_dir = spill_dir
+        self.collect_metrics = metrics or bool(hooks) or profile is not None
+        self.hooks = hooks or []
+        self.profile = profile
+        self.executors = {LOCAL: LocalExecutor(), **(executors or {})}
+        # Peak resident memory of the process during the last run, in bytes
+        self.peak_rss: Optional[int] = None
+        # Metrics of the last run, if collected
+        self.run_metrics: Optional[RunMetrics] = None
 
     def validate(self):
         if not is_dag(self.edges):
             raise ValueError("Pipeline contains a cycle")
+        for node in self.nodes.values():
+            node.validate()
+            if node.execution not in self.executors:
+                raise ValueError(f"{node.operator_id}: unknown execution target '{node.execution}', "
+                                 f"expected one of {sorted(self.executors)}")
+            self.executors[node.execution].validate(node)
+
+    def plan(self) -> Plan:
+        """
+        Returns the graph of operators that run() will execute, rewritten by the optimizer if enabled.
+        """
+        plan = Plan.from_pipeline(self)
+        for partition in self.partitions:
+            partition.replicate(plan)
+        if self.optimize:
+            optimize(plan)
+        return plan
+
+    def explain(self) -> str:
+        """
+        Prints (and returns) the execution plan.
+        """
+        self.validate()
+        text = f"Pipeline: '{self.name}' ({self.mode}{', optimized' if self.optimize else ''})\n{explain(self.plan())}"
+        print(text)
+        return text
 
     def run(self):
         self.validate()
+        async_operators = [op_id for op_id, node in self.nodes.items() if is_async_operator(node)]
+        if async_operators:
+            raise ValueError(f"Operators {async_operators} have an async process(), use `await run_async()` instead")
+
+        plan = self.plan()
+        execution_order = plan.execution_order()
+
+        logger.info("Executing Pipeline: '%s' (%s)", self.name, self.mode)
+        logger.info("execution_order=%s", execution_order)
+        logger.info("plan.edges=%s", plan.edges)
+        for target in {node.execution for node in plan.nodes.values()}:
+            self.executors[target].start()
+
+        instrumentation = self._instrumentation(self.mode)
+        started = time.perf_counter()
+        try:
+            with PeakMemoryMonitor() as monitor:
+                if self.mode == "streaming":
+                    self._run_streaming(plan, execution_order, instrumentation)
+                else:
+                    cached, keys = {}, {}
+                    to_run = execution_order
+                    if self.cache is not None:
+                        to_run, keys = self._load_cached(plan, execution_order, cached)
+                    materializer = Materializer(self.memory_budget, self.spill_serializer, self.spill_dir)
+                    outputs = OutputStore(plan.upstream, to_run, cached, materializer)
+                    if self.mode == "threaded":
+                        self._run_threaded(plan, to_run, outputs, keys, instrumentation)
+                    else:
+                        self._run_batch(plan, to_run, outputs, keys, instrumentation)
+        except BaseException:
+            self._abort()
+            raise
+        self._report(monitor, started)
+        self._commit()
+
+    def _instrumentation(self, mode: str) -> Optional[Instrumentation]:
+        if not self.collect_metrics:
+            self.run_metrics = None
+            return None
+        self.run_metrics = RunMetrics(self.name, mode)
+        return Instrumentation(self.run_metrics, self.hooks, batched=bool(self.batch_size) and mode != "async",
+                               profile=self.profile)
+
+    def _report(self, monitor: PeakMemoryMonitor, started: float):
+        self.peak_rss = monitor.peak
+        if monitor.peak is not None:
+            logger.info("Pipeline '%s' peak RSS: %.1f MiB", self.name, monitor.peak / (1 << 20))
+        if self.run_metrics is not None:
+            self.run_metrics.wall_time = time.perf_counter() - started
+            self.run_metrics.peak_rss = monitor.peak
 
-        execution_order = topological_sort(self.edges)
-        context = {}
+    def _commit(self):
+        # Only reached when every operator succeeded, so all the records read have been processed by the sinks
+        for node in self.nodes.values():
+            node.commit()
 
-        logger.info(f"Executing Pipeline: '{self.name}'")
-        logger.info(f"{execution_order=}")
-        logger.info(f"{self.edges=}")
+    def _abort(self):
+        for node in self.nodes.values():
+            try:
+                node.abort()
+            except Exception:
+                # The run's own error is the one worth raising
+                logger.exception("Operator '%s' failed to abort", node.operator_id)
 
+    def _load_cached(self, plan: Plan, execution_order: list[str], cached: dict) -> tuple[list[str], dict]:
+        """
+        Loads the cached outputs needed by this run into `cached`, and returns the operators
+        left to execute along with the cache key of each operator (None if not cacheable).
+        An operator is skipped when its output is cached, or when none of its consumers execute.
+        """
+        keys = {}
         for op_id in execution_order:
-            node = self.nodes[op_id]
-            inputs = [context[parent.operator_id] for parent in getattr(node, 'upstream', [])]
-            logger.info(f"\tExecuting operator: {op_id} with {inputs=}")
-            result = node.process(*inputs)
-            # If it's a generator, materialize it for memoization
-            if isinstance(result, GeneratorType):
-                result = list(result)
-            context[op_id] = result
+            keys[op_id] = cache_key(plan.nodes[op_id], [keys[parent] for parent in plan.upstream[op_id]])
+
+        consumers = plan.consumers(execution_order)
+        to_run = set()
+        for op_id in reversed(execution_order):
+            children = consumers[op_id]
+            if children and not any(child in to_run for child in children):
+                continue
+            output = MISS if keys[op_id] is None else self.cache.get(keys[op_id])
+            if output is MISS:
+                to_run.add(op_id)
+            else:
+                logger.info("\tCache hit for operator: %s", op_id)
+                cached[op_id] = output
+        return [op_id for op_id in execution_order if op_id in to_run], keys
+
+    def _execute_operator(self, plan: Plan, op_id: str, outputs: OutputStore, keys: dict,
+                          instrumentation: Optional[Instrumentation] = None):
+        node = plan.nodes[op_id]
+        inputs = outputs.consume(plan.upstream[op_id])
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\tExecuting operator: %s with inputs=%s", op_id, preview(inputs))
+        metrics = instrumentation.metrics(node) if instrumentation else None
+        executor = self.executors[node.execution]
+        with instrumentation.measure(node, metrics) if instrumentation else nullcontext():
+            if self.batch_size:
+                batches = [chunked(() if data is None else data, self.batch_size) for data in inputs]
+                result = invoke(node, batches, self.batch_size, executor)
+                if result is not None:
+                    if instrumentation:
+                        result = instrumentation.batches(node, result, metrics)
+                    result = flatten(result)
+            else:
+                result = invoke(node, inputs, executor=executor)
+            # Lazy iterators (generator, map, filter...) are materialized for memoization
+            result = outputs.put(op_id, result)
+        if instrumentation:
+            for data in inputs:
+                instrumentation.count_input(data, metrics)
+            instrumentation.count_output(result, metrics)
+        if keys.get(op_id) is not None:
+            self.cache.put(keys[op_id], result, op_id)
+
+    def _run_batch(self, plan: Plan, execution_order: list[str], outputs: OutputStore, keys: dict,
+                   instrumentation: Optional[Instrumentation]):
+        for op_id in execution_order:
+            self._execute_operator(plan, op_id, outputs, keys, instrumentation)
+
+    def _run_threaded(self, plan: Plan, to_run: list[str], outputs: OutputStore, keys: dict,
+                      instrumentation: Optional[Instrumentation]):
+        # Each operator is dispatched as soon as all of its upstreams have completed,
+        # upstreams served from the cache are already in the store
+        running = set(to_run)
+        dependencies = {op_id: running.intersection(plan.upstream[op_id]) for op_id in to_run}
+        schedule(dependencies, lambda op_id: self._execute_operator(plan, op_id, outputs, keys, instrumentation),
+                 self.max_workers)
+
+    async def run_async(self):
+        """
+        Runs the pipeline on the current event loop. Operators with an `async def process` run as
+        coroutines (or async generators), sync operators are bridged through a thread pool.
+        Operators are connected by bounded queues, so a slow consumer applies backpressure.
+        """
+        # asyncio is a large share of the import time of the package, and only needed here
+        import asyncio
+        from petal.src.core.async_engine import Channel, run_operator
+
+        self.validate()
+        if self.cache is not None:
+            raise ValueError("The operator cache needs materialized outputs, it can't be used with run_async()")
+        remote = [op_id for op_id, node in self.nodes.items() if node.execution != LOCAL]
+        if remote:
+            raise ValueError(f"Operators {remote} run on executors, which only run() supports")
+
+        plan = self.plan()
+        execution_order = plan.execution_order()
+        consumers = plan.consumers(execution_order)
+
+        logger.info("Executing Pipeline: '%s' (async)", self.name)
+        logger.info("execution_order=%s", execution_order)
+        instrumentation = self._instrumentation("async")
+        started = time.perf_counter()
+
+        channels = {}
+        for op_id in execution_order:
+            children = consumers[op_id]
+            bounded = len(children) == 1 or op_id in plan.partitions or branches_are_independent(plan.edges, op_id, children)
+            channels[op_id] = [Channel(self.buffer_size if bounded else 0) for _ in children]
+
+        # Every sync operator holds a thread for its whole run, so the pool must fit all of them
+        sync_operators = [op_id for op_id in execution_order if not is_async_operator(plan.nodes[op_id])]
+        with PeakMemoryMonitor() as monitor, \
+                ThreadPoolExecutor(max_workers=max(len(sync_operators), 1), thread_name_prefix="petal") as executor:
+            # Inputs are handed over in the order of the operator's upstream list
+            unclaimed = {op_id: list(channels[op_id]) for op_id in execution_order}
+            tasks = []
+            for op_id in execution_order:
+                inputs = [unclaimed[parent].pop(0) for parent in plan.upstream[op_id]]
+                tasks.append(run_operator(plan.nodes[op_id], inputs, channels[op_id], executor, instrumentation))
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            self._abort()
+            raise errors[0]
+        self._report(monitor, started)
+        self._commit()
+
+    def _run_streaming(self, plan: Plan, execution_order: list[str], instrumentation: Optional[Instrumentation]):
+        consumers = plan.consumers(execution_order)
+
+        # Each operator's output streams (one per consumer), paired with the fan-out
+        # buffer slots that only that stream reads from, so they can be closed with it
+        streams = {}
+        fan_outs = []
+        sinks = []
+        for op_id in execution_order:
+            node = plan.nodes[op_id]
+            inputs, slots = [], []
+            for parent in plan.upstream[op_id]:
+                stream, stream_slots = streams[parent].pop(0)
+                inputs.append(stream)
+                slots.extend(stream_slots)
+            children = consumers[op_id]
+            metrics = instrumentation.metrics(node) if instrumentation else None
+            if instrumentation:
+                inputs = [instrumentation.input(stream, metrics) for stream in inputs]
+
+            if not children:
+                sinks.append((node, inputs, slots, metrics))
+                continue
+
+            output = deferred(node, inputs, self.batch_size, self.executors[node.execution])
+            if instrumentation:
+                output = instrumentation.output(node, output, metrics)
+            if len(children) == 1:
+                streams[op_id] = [(output, slots)]
+                continue
+
+            # The replicas of a partition only reconverge at Merges, which consume all of them concurrently
+            if op_id in plan.partitions or branches_are_independent(plan.edges, op_id, children):
+                # Streams carry whole batches when batched, keep the buffer at ~buffer_size records
+                buffer_size = max(self.buffer_size // (self.batch_size or 1), 1)
+            else:
+                logger.info("\tBranches of %s reconverge downstream, using unbounded buffers", op_id)
+                buffer_size = 0
+            fan_out = FanOut(output, len(children), buffer_size, upstream_slots=slots, metrics=metrics)
+            fan_outs.append(fan_out)
+            streams[op_id] = [(fan_out.consumer(idx), [(fan_out, idx)]) for idx in range(len(children))]
+
+        errors = []
+
+        def run_sink(node, inputs, slots, metrics):
+            try:
+                logger.info("\tExecuting operator: %s", node.operator_id)
+                with instrumentation.measure(node, metrics) if instrumentation else nullcontext():
+                    drain(invoke(node, inputs, self.batch_size, self.executors[node.execution]))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                for fan_out, idx in slots:
+                    fan_out.close(idx)
+
+        for fan_out in fan_outs:
+            fan_out.start()
+        threads = [threading.Thread(target=run_sink, args=sink, daemon=True) for sink in sinks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for fan_out in fan_outs:
+            fan_out.join()
+
+        errors.extend(fan_out.error for fan_out in fan_outs if fan_out.error is not None)
+        if errors:
+            raise errors[0]
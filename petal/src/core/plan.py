@@ -0,0 +1,73 @@
+from petal.src.core.utils import topological_sort
+
+
+class Plan:
+    """
+    The graph of operators a Pipeline actually executes.
+    It starts out as a copy of the Pipeline's DAG, and can then be rewritten by the optimizer
+    without touching the user's operators (their upstream/downstream lists stay as declared).
+    """
+
+    def __init__(self, nodes: dict, upstream: dict[str, list[str]]):
+        # Operator id -> operator
+        self.nodes = nodes
+        # Operator id -> ids of its upstream operators, in the order its inputs are passed
+        self.upstream = upstream
+        # Id of a fused operator -> ids of the original operators it replaces
+        self.fused: dict[str, list[str]] = {}
+        # Id of a regex router -> ids of the filters it routes records to
+        self.routed: dict[str, list[str]] = {}
+        # Id of a partitioner -> ids of the routes to each replica, see petal.src.core.partition
+        self.partitions: dict[str, list[str]] = {}
+        # Id of a replicated operator -> ids of its replicas
+        self.replicas: dict[str, list[str]] = {}
+        # Ids of the original operators optimized away
+        self.removed: list[str] = []
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "Plan":
+        op_ids = {op_id for edge in pipeline.edges for op_id in edge}
+        nodes = {op_id: pipeline.nodes[op_id] for op_id in op_ids}
+        upstream = {op_id: [parent.operator_id for parent in getattr(node, 'upstream', [])]
+                    for op_id, node in nodes.items()}
+        return cls(nodes, upstream)
+
+    @property
+    def edges(self) -> set[tuple[str, str]]:
+        return {(parent, op_id) for op_id, parents in self.upstream.items() for parent in parents}
+
+    def execution_order(self) -> list[str]:
+        order = topological_sort(self.edges)
+        # An operator left without any edge (eg. a sink whose only upstream was removed) still runs
+        return order + sorted(op_id for op_id in self.nodes if op_id not in set(order))
+
+    def consumers(self, execution_order: list[str]) -> dict[str, list[str]]:
+        # The consumers of each operator, one entry per edge, in the order inputs are wired
+        consumers = {op_id: [] for op_id in execution_order}
+        for op_id in execution_order:
+            for parent in self.upstream[op_id]:
+                consumers[parent].append(op_id)
+        return consumers
+
+    def replace(self, op_ids: list[str], new_id: str, new_node, upstream: list[str]) -> None:
+        """
+        Replaces the operators `op_ids` by a single operator reading from `upstream`.
+        Every consumer of any of the replaced operators reads from the new operator instead.
+        """
+        for op_id in op_ids:
+            del self.nodes[op_id]
+            del self.upstream[op_id]
+        self.nodes[new_id] = new_node
+        self.upstream[new_id] = upstream
+        for op_id, parents in self.upstream.items():
+            self.upstream[op_id] = [new_id if parent in op_ids else parent for parent in parents]
+
+    def bypass(self, op_id: str) -> None:
+        """
+        Removes a single-input operator, connecting its upstream directly to its consumers.
+        """
+        (parent,) = self.upstream.pop(op_id)
+        del self.nodes[op_id]
+        for child, parents in self.upstream.items():
+            self.upstream[child] = [parent if p == op_id else p for p in parents]
+        self.removed.append(op_id)
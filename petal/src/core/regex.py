@@ -0,0 +1,75 @@
+"""
+Evaluating several regular expressions over the same records in a single pass.
+"""
+import re
+from typing import Callable
+
+# Characters with a special meaning in a pattern
+_SPECIAL = set(".^$*+?{}[]\\|()")
+_QUANTIFIERS = set("*+?{")
+# Numbered or named backreferences, which can't be combined with other patterns
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    The literal text every match of the pattern starts with, "" if there's none (or it can't be told).
+    A pattern without special characters is its own prefix.
+    """
+    if '|' in pattern:
+        return ""
+    for idx, char in enumerate(pattern):
+        if char in _SPECIAL:
+            # The last literal is optional if it's quantified, eg. the "s" of "errors?"
+            return pattern[:idx - 1] if char in _QUANTIFIERS else pattern[:idx]
+    return pattern
+
+
+def is_literal(pattern: str) -> bool:
+    return not any(char in _SPECIAL for char in pattern)
+
+
+class MultiPattern:
+    """
+    Tells which of several compiled patterns are found in a record.
+    A single alternation of all the patterns is searched first, so records matching none of them
+    (usually most of them) are rejected in one pass. Only records with a match are then checked against
+    each pattern, from the position of that first match, using plain substring searches for literal patterns
+    and literal prefixes to skip most regex searches.
+    """
+
+    def __init__(self, patterns: list[re.Pattern]):
+        if not combinable(patterns):
+            raise ValueError("Patterns with different flags or backreferences can't be combined")
+        # Capturing groups make the alternation much slower, so every pattern is wrapped in a non-capturing one
+        try:
+            self.combined = re.compile("|".join(f"(?:{pattern.pattern})" for pattern in patterns), patterns[0].flags)
+        except re.error as e:
+            # eg. inline global flags, which are only allowed at the start of a pattern
+            raise ValueError(f"The patterns can't be combined: {e}") from e
+        self.checks = [self._check(pattern) for pattern in patterns]
+
+    @staticmethod
+    def _check(pattern: re.Pattern) -> Callable[[str, int], bool]:
+        case_sensitive = not pattern.flags & re.IGNORECASE
+        prefix = literal_prefix(pattern.pattern) if case_sensitive and not pattern.flags & re.VERBOSE else ""
+        if prefix and is_literal(pattern.pattern):
+            return lambda record, start: record.find(prefix, start) >= 0
+        if prefix:
+            return lambda record, start: record.find(prefix, start) >= 0 and pattern.search(record, start) is not None
+        return lambda record, start: pattern.search(record, start) is not None
+
+    def matches(self, record: str) -> tuple[int, ...]:
+        """The indices of the patterns found in the record."""
+        match = self.combined.search(record)
+        if match is None:
+            return ()
+        # No pattern can match before the first match of the alternation
+        start = match.start()
+        return tuple(idx for idx, check in enumerate(self.checks) if check(record, start))
+
+
+def combinable(patterns: list[re.Pattern]) -> bool:
+    return (len({pattern.flags for pattern in patterns}) == 1
+            and all(isinstance(pattern.pattern, str) and not _BACKREFERENCE.search(pattern.pattern)
+                    for pattern in patterns))
@@ -0,0 +1,98 @@
+"""
+Resolving operator classes by name, importing their module on first use.
+
+Built-in plugins are listed by module path, so looking one up only imports that plugin (and its own
+dependencies, eg. boto3 for the Sqs plugins, only once one of them is created). Other operators are registered
+with the @register_plugin decorator, or by third-party packages under the "petal.plugins" entry point group:
+
+    [project.entry-points."petal.plugins"]
+    MyReader = "my_package.readers:MyReader"
+
+Entry points are only scanned when a name isn't found otherwise.
+"""
+from typing import Callable, Optional
+
+ENTRY_POINT_GROUP = "petal.plugins"
+
+# Name of every built-in plugin, and the module defining it
+BUILTIN_PLUGINS = {
+    name: f"petal.src.plugins.{module}" for name, module in [
+        ("Aggregate", "Aggregate"),
+        ("AsyncSqsWriter", "AsyncSqsWriter"),
+        ("EmptySource", "EmptySource"),
+        ("FileReader", "FileReader"),
+        ("FileWriter", "FileWriter"),
+        ("GroupBy", "GroupBy"),
+        ("HashJoiner", "HashJoiner"),
+        ("IdentityTransformer", "IdentityTransformer"),
+        ("Joiner", "Joiner"),
+        ("KeyedJoiner", "KeyedJoiner"),
+        ("NoOpSink", "NoOpSink"),
+        ("RegexFilter", "RegexFilter"),
+        ("RegexMapper", "RegexMapper"),
+        ("SortMergeJoiner", "SortMergeJoiner"),
+        ("Splitter", "Splitter"),
+        ("SqsReader", "SqsReader"),
+        ("SqsWriter", "SqsWriter"),
+        ("MockSqsWriter", "SqsWriter"),
+        ("StreamJoiner", "StreamJoiner"),
+    ]
+}
+
+# Resolved and registered plugins by name
+_plugins: dict[str, type] = {}
+_entry_points: Optional[dict] = None
+
+
+def register_plugin(name: Optional[str] = None) -> Callable[[type], type]:
+    """
+    Class decorator registering an operator under `name`, its class name by default:
+
+        @register_plugin()
+        class Uppercase(Mapper):
+            ...
+
+    Raises ValueError if the name is already used by another plugin.
+    """
+    def register(cls: type) -> type:
+        plugin_name = name or cls.__name__
+        if plugin_name in BUILTIN_PLUGINS or _plugins.get(plugin_name, cls) is not cls:
+            raise ValueError(f"A plugin named '{plugin_name}' is already registered")
+        _plugins[plugin_name] = cls
+        return cls
+    return register
+
+
+def get_plugin(name: str) -> type:
+    """
+    The operator class registered under `name`, importing its module if needed.
+    Raises ValueError if there's no such plugin.
+    """
+    if name in _plugins:
+        return _plugins[name]
+    if name in BUILTIN_PLUGINS:
+        import importlib
+        cls = getattr(importlib.import_module(BUILTIN_PLUGINS[name]), name)
+    else:
+        entry_point = _scan_entry_points().get(name)
+        if entry_point is None:
+            raise ValueError(f"Unknown plugin '{name}', available plugins: {', '.join(available_plugins())}")
+        cls = entry_point.load()
+    _plugins[name] = cls
+    return cls
+
+
+def available_plugins() -> list[str]:
+    """The names of every known plugin, without importing them."""
+    return sorted(set(BUILTIN_PLUGINS).union(_plugins, _scan_entry_points()))
+
+
+def _scan_entry_points() -> dict:
+    global _entry_points
+    if _entry_points is None:
+        from importlib.metadata import entry_points
+        found = entry_points()
+        # entry_points() returns a dict of groups before Python 3.10
+        group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, 'select') else found.get(ENTRY_POINT_GROUP, [])
+        _entry_points = {entry_point.name: entry_point for entry_point in group}
+    return _entry_points
@@ -0,0 +1,71 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from petal.src.logger import logger
+
+
+def descendants(node: str, dependents: dict[str, set[str]]) -> set[str]:
+    result = set()
+    stack = [node]
+    while stack:
+        for child in dependents.get(stack.pop(), ()):
+            if child not in result:
+                result.add(child)
+                stack.append(child)
+    return result
+
+
+def schedule(dependencies: dict[str, set[str]], task: Callable[[str], Any],
+             max_workers: Optional[int] = None) -> dict[str, Any]:
+    """
+    Runs `task(node)` for every node on a thread pool, dispatching each node
+    as soon as all of its dependencies have completed.
+    If a task fails, the nodes depending on it are cancelled, independent
+    nodes still run to completion, and the first failure is re-raised.
+
+    :param dependencies: Mapping of each node id to the node ids it depends on
+    :param task: Function executing a single node, its return value is recorded
+    :param max_workers: Size of the thread pool (defaults to ThreadPoolExecutor's default)
+    :return: Mapping of each node id to its task's return value
+    """
+    dependents = {}
+    for node, parents in dependencies.items():
+        for parent in parents:
+            dependents.setdefault(parent, set()).add(node)
+
+    remaining = {node: len(parents) for node, parents in dependencies.items()}
+    results = {}
+    errors = []
+    cancelled = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="petal") as pool:
+        running = {}
+
+        def dispatch(node):
+            running[pool.submit(task, node)] = node
+
+        for node, count in remaining.items():
+            if count == 0:
+                dispatch(node)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+                    skipped = descendants(node, dependents)
+                    cancelled.update(skipped)
+                    logger.error("\tOperator %s failed, cancelling %s", node, sorted(skipped))
+                    continue
+
+                results[node] = future.result()
+                for child in dependents.get(node, ()):
+                    remaining[child] -= 1
+                    if remaining[child] == 0 and child not in cancelled:
+                        dispatch(child)
+
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,218 @@
+"""
+Spilling of materialized streams to disk.
+
+In batch and threaded modes, every operator output read by another operator is materialized.
+With a memory budget, outputs that would push the total past the budget are written to a temporary
+record file instead, and replayed lazily every time a consumer iterates over them.
+"""
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from typing import Any, BinaryIO, Iterable, Optional, Union
+
+from petal.src.logger import logger
+
+
+class Serializer(ABC):
+    """
+    Writes records to, and reads them back from, a binary record file.
+    """
+
+    @abstractmethod
+    def write(self, f: BinaryIO, records: Iterable[Any]) -> int:
+        """
+        Appends the records to the file, returns how many were written.
+        """
+        pass
+
+    @abstractmethod
+    def read(self, f: BinaryIO) -> Iterator[Any]:
+        pass
+
+
+class PickleSerializer(Serializer):
+    """Any picklable record."""
+
+    def write(self, f: BinaryIO, records: Iterable[Any]) -> int:
+        pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+        count = 0
+        for record in records:
+            pickler.dump(record)
+            # The pickler would otherwise keep every record alive to deduplicate references
+            pickler.clear_memo()
+            count += 1
+        return count
+
+    def read(self, f: BinaryIO) -> Iterator[Any]:
+        unpickler = pickle.Unpickler(f)
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+
+
+_ESCAPED = re.compile(r'\\(.)')
+
+
+class TextSerializer(Serializer):
+    """String records, one per line. Newlines and backslashes within a record are escaped."""
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+
+    def write(self, f: BinaryIO, records: Iterable[str]) -> int:
+        count = 0
+        for record in records:
+            f.write(record.replace('\\', '\\\\').replace('\n', '\\n').encode(self.encoding) + b'\n')
+            count += 1
+        return count
+
+    def read(self, f: BinaryIO) -> Iterator[str]:
+        for line in f:
+            record = line[:-1].decode(self.encoding)
+            if '\\' in record:
+                record = _ESCAPED.sub(lambda match: '\n' if match.group(1) == 'n' else match.group(1), record)
+            yield record
+
+
+class LengthPrefixedSerializer(Serializer):
+    """Bytes records, each prefixed with its length."""
+    _header = struct.Struct(">I")
+
+    def write(self, f: BinaryIO, records: Iterable[bytes]) -> int:
+        count = 0
+        for record in records:
+            if not isinstance(record, (bytes, bytearray)):
+                raise TypeError(f"The length-prefixed serializer only writes bytes, got {type(record).__name__}")
+            f.write(self._header.pack(len(record)))
+            f.write(record)
+            count += 1
+        return count
+
+    def read(self, f: BinaryIO) -> Iterator[bytes]:
+        while header := f.read(self._header.size):
+            (length,) = self._header.unpack(header)
+            yield f.read(length)
+
+
+SERIALIZERS = {"pickle": PickleSerializer, "text": TextSerializer, "bytes": LengthPrefixedSerializer}
+
+
+def get_serializer(serializer: Union[str, Serializer]) -> Serializer:
+    if isinstance(serializer, Serializer):
+        return serializer
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer '{serializer}', expected one of {tuple(SERIALIZERS)} or a Serializer")
+    return SERIALIZERS[serializer]()
+
+
+class SpilledRecords:
+    """
+    A materialized stream stored in a temporary record file. Every iteration replays the file lazily,
+    deserializing new records, so consumers never share records and copying the stream is a no-op.
+    The file is deleted once the object is garbage collected.
+    """
+
+    def __init__(self, serializer: Serializer, directory: Optional[str] = None):
+        self.serializer = serializer
+        fd, self.path = tempfile.mkstemp(prefix="petal_spill_", suffix=".records", dir=directory)
+        self._file = open(fd, 'wb', buffering=1 << 20)
+        self._len = 0
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+
+    def extend(self, records: Iterable[Any]) -> None:
+        self._len += self.serializer.write(self._file, records)
+
+    def seal(self) -> "SpilledRecords":
+        self._file.close()
+        return self
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path, 'rb', buffering=1 << 20) as f:
+            yield from self.serializer.read(f)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __copy__(self) -> "SpilledRecords":
+        return self
+
+    def __deepcopy__(self, memo) -> "SpilledRecords":
+        return self
+
+    def __getstate__(self):
+        raise TypeError("Spilled records are backed by a temporary file and can't be pickled")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Materializer:
+    """
+    Materializes operator outputs within a memory budget, spilling them to disk past it.
+    Record sizes are estimated with sys.getsizeof, so nested records are under-counted.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, serializer: Union[str, Serializer] = "pickle",
+                 spill_dir: Optional[str] = None):
+        self.memory_budget = memory_budget
+        self.serializer = get_serializer(serializer)
+        self.spill_dir = spill_dir
+        # Estimated bytes held by each in-memory output, by operator id
+        self._reserved: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        return sum(size for _, size in self._reserved.values())
+
+    def materialize(self, op_id: str, output: Any) -> Any:
+        if self.memory_budget is None or isinstance(output, SpilledRecords):
+            return list(output) if isinstance(output, Iterator) else output
+        if not isinstance(output, (Iterator, list, tuple)):
+            return output
+        with self._lock:
+            # The same list passed through by another operator is only counted once
+            if not isinstance(output, Iterator) and any(obj_id == id(output) for obj_id, _ in self._reserved.values()):
+                return output
+            available = self.memory_budget - self.used
+
+        records, size = [], sys.getsizeof([])
+        iterator = iter(output)
+        for record in iterator:
+            records.append(record)
+            size += sys.getsizeof(record) + 8
+            if size > available:
+                return self._spill(op_id, records, iterator)
+        if isinstance(output, list):
+            records = output
+        with self._lock:
+            self._reserved[op_id] = (id(records), size)
+        return records
+
+    def release(self, op_id: str) -> None:
+        with self._lock:
+            self._reserved.pop(op_id, None)
+
+    def _spill(self, op_id: str, head: list, tail: Iterator) -> SpilledRecords:
+        spilled = SpilledRecords(self.serializer, self.spill_dir)
+        logger.info("\tOutput of %s exceeds the memory budget, spilling it to %s", op_id, spilled.path)
+        spilled.extend(head)
+        head.clear()
+        spilled.extend(tail)
+        return spilled.seal()
@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+from typing import Any, Iterable, Iterator, Optional
+
+# Marks the end of a stream inside a consumer buffer
+END = object()
+
+
+class Failure:
+    """Put in a consumer buffer in place of END when its producer raised `exc`."""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class FanOut:
+    """
+    Pumps a single upstream iterator into one buffer per consumer.
+    Buffers hold at most `buffer_size` records (0 means unbounded), so a slow
+    consumer applies backpressure to the upstream instead of growing memory.
+    """
+
+    def __init__(self, source: Iterable[Any], n_consumers: int, buffer_size: int = 0,
+                 upstream_slots: Optional[list] = None, metrics=None):
+        self.source = source
+        # The source operator's OperatorMetrics, to record blocked time and buffer occupancy
+        self.metrics = metrics
+        # Buffer slots of upstream fan-outs that only this pump reads from
+        self.upstream_slots = upstream_slots or []
+        self.buffers = [queue.Queue(maxsize=buffer_size) for _ in range(n_consumers)]
+        self.closed = [False] * n_consumers
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._pump, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def join(self) -> None:
+        self.thread.join()
+
+    def consumer(self, idx: int) -> Iterator[Any]:
+        buffer = self.buffers[idx]
+        while True:
+            item = buffer.get()
+            if item is END:
+                return
+            if isinstance(item, Failure):
+                raise item.exc
+            yield item
+
+    def close(self, idx: int) -> None:
+        # The consumer is done - stop buffering records for it
+        self.closed[idx] = True
+        buffer = self.buffers[idx]
+        while True:
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                return
+
+    def _put(self, idx: int, item: Any) -> None:
+        # Block while the buffer is full, but give up once the consumer closes
+        buffer = self.buffers[idx]
+        if self.metrics is not None:
+            self._put_measured(buffer, idx, item)
+            return
+        while not self.closed[idx]:
+            try:
+                buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _put_measured(self, buffer: queue.Queue, idx: int, item: Any) -> None:
+        blocked_since = None
+        while not self.closed[idx]:
+            try:
+                if blocked_since is None:
+                    buffer.put_nowait(item)
+                else:
+                    buffer.put(item, timeout=0.1)
+            except queue.Full:
+                if blocked_since is None:
+                    blocked_since = time.perf_counter()
+                continue
+            break
+        if blocked_since is not None:
+            self.metrics.blocked_downstream += time.perf_counter() - blocked_since
+        self.metrics.peak_buffer = max(self.metrics.peak_buffer, buffer.qsize())
+
+    def _broadcast(self, item: Any) -> None:
+        for idx in range(len(self.buffers)):
+            self._put(idx, item)
+
+    def _pump(self) -> None:
+        try:
+            for item in self.source:
+                if all(self.closed):
+                    break
+                self._broadcast(item)
+            self._broadcast(END)
+        except BaseException as e:
+            self.error = e
+            self._broadcast(Failure(e))
+        finally:
+            for fan_out, idx in self.upstream_slots:
+                fan_out.close(idx)
+
+
+def interleave(streams: list[Iterable[Any]], buffer_size: int = 1024) -> Iterator[Any]:
+    """
+    Merges streams in the order their records become available, consuming each one on its own thread,
+    so a slow or blocked stream never holds back the others. Each stream's records keep their relative order.
+
+    :param streams: The streams to merge
+    :param buffer_size: Max number of records consumed but not yet yielded
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    closed = threading.Event()
+
+    def put(item: Any) -> bool:
+        # Block while the buffer is full, but give up once the merged stream is closed
+        while not closed.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump(stream: Iterable[Any]) -> None:
+        try:
+            for item in stream:
+                if not put(item):
+                    return
+            put(END)
+        except BaseException as e:
+            put(Failure(e))
+
+    threads = [threading.Thread(target=pump, args=(stream,), daemon=True) for stream in streams]
+    for thread in threads:
+        thread.start()
+    finished = 0
+    try:
+        while finished < len(threads):
+            item = buffer.get()
+            if item is END:
+                finished += 1
+            elif isinstance(item, Failure):
+                raise item.exc
+            else:
+                yield item
+    finally:
+        closed.set()
+
+
+def invoke(operator, inputs: list, batch_size: Optional[int] = None, executor=None) -> Any:
+    """
+    Runs an operator on its input streams, through the batch protocol if the pipeline is batched.
+    With an executor (see petal.src.core.executors), the operator runs wherever the executor runs it.
+    """
+    if executor is not None:
+        return executor.execute(operator, inputs, batch_size)
+    if batch_size:
+        return operator.process_batches(*inputs, batch_size=batch_size)
+    return operator.process(*inputs)
+
+
+def deferred(operator, inputs: list, batch_size: Optional[int] = None, executor=None) -> Iterator[Any]:
+    """
+    Calls the operator on first pull rather than at wiring time,
+    so the operator runs in whichever thread consumes its output.
+    """
+    result = invoke(operator, inputs, batch_size, executor)
+    if result is not None:
+        yield from result
+
+
+def drain(result: Any) -> None:
+    if result is None or isinstance(result, (str, bytes)):
+        return
+    if isinstance(result, Iterable):
+        for _ in result:
+            pass
+
+
+def branches_are_independent(edges: set[tuple[str, str]], node: str, consumers: list[str]) -> bool:
+    """
+    Returns True if removing `node` leaves every consumer in its own connected
+    component of the (undirected) graph. Only then can the fan-out buffers be
+    bounded without risking a deadlock: if two branches reconverge downstream
+    (eg. at a StreamJoiner), an order-dependent consumer may wait on one branch
+    while the upstream is blocked on the other branch's full buffer.
+    """
+    neighbours = {}
+    for src, dst in edges:
+        if node in (src, dst):
+            continue
+        neighbours.setdefault(src, set()).add(dst)
+        neighbours.setdefault(dst, set()).add(src)
+
+    seen = {}
+    for idx, consumer in enumerate(consumers):
+        if consumer in seen:
+            return False
+        stack = [consumer]
+        seen[consumer] = idx
+        while stack:
+            current = stack.pop()
+            for neighbour in neighbours.get(current, ()):
+                if neighbour in seen:
+                    if seen[neighbour] != idx:
+                        return False
+                    continue
+                seen[neighbour] = idx
+                stack.append(neighbour)
+    return True
@@ -1,4 +1,8 @@
+import copy
 from collections import defaultdict, deque
+from collections.abc import Iterator
+from itertools import chain, islice
+from typing import Any, Iterable
 
 
 def topological_sort(edges: set[tuple[str, str]]) -> list[str]:
@@ -48,3 +52,42 @@ def is_dag(edges: set[tuple[str, str]]) -> bool:
         return True
     except ValueError:
         return False
+
+
+def deepcopy_stream(data: Iterable[Any]) -> Iterable[Any]:
+    """
+    Defensively copies a stream of records.
+    Materialized inputs (lists, tuples...) are deep-copied up front like before,
+    lazy streams are deep-copied one record at a time as they are consumed.
+    """
+    if isinstance(data, Iterator):
+        return map(copy.deepcopy, data)
+    return copy.deepcopy(data)
+
+
+def chunked(data: Iterable[Any], chunk_size: int) -> Iterator[list]:
+    """
+    Lazily splits a stream of records into lists of at most `chunk_size` records.
+    """
+    iterator = iter(data)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def flatten(batches: Iterable[Iterable[Any]]) -> Iterator[Any]:
+    """
+    Lazily turns a stream of record batches back into a stream of records.
+    """
+    return chain.from_iterable(batches)
+
+
+def is_async_operator(operator) -> bool:
+    """
+    Whether the operator's process() is a coroutine or an async generator function.
+    """
+    # Imported here since importing inspect takes longer than the rest of petal.src.core
+    import inspect
+    return inspect.iscoroutinefunction(operator.process) or inspect.isasyncgenfunction(operator.process)
@@ -1,8 +1,100 @@
 import logging
+import os
+from typing import Any, Optional
 
 logger = logging.getLogger("petal")
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get("PETAL_LOG_LEVEL", "INFO").upper())
 handler = logging.StreamHandler()
 formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
+
+# Per-record messages (one per line read, record sent...) are logged at DEBUG, for 1 in `_sample_every` records
+_sample_every = 1
+# Max number of records, and characters per record, shown in a preview
+_preview_records = 3
+_preview_chars = 80
+
+
+def operator_logger(operator_id: str) -> logging.Logger:
+    """
+    The logger of a single operator, a child of the petal logger, so its level can be set independently.
+    """
+    return logger.getChild(operator_id)
+
+
+def set_operator_level(operator_id: str, level: Any) -> None:
+    operator_logger(operator_id).setLevel(level)
+
+
+def configure(level: Any = None, sample_every: Optional[int] = None, preview_records: Optional[int] = None,
+              preview_chars: Optional[int] = None) -> None:
+    """
+    :param level: Level of the petal logger, operators without their own level inherit it
+    :param sample_every: Log the per-record messages of 1 in `sample_every` records (when DEBUG is enabled)
+    :param preview_records: Max number of records shown when logging an operator's inputs
+    :param preview_chars: Max number of characters shown per record
+    """
+    global _sample_every, _preview_records, _preview_chars
+    if level is not None:
+        logger.setLevel(level)
+    if sample_every is not None:
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        _sample_every = sample_every
+    if preview_records is not None:
+        _preview_records = preview_records
+    if preview_chars is not None:
+        _preview_chars = preview_chars
+
+
+def quiet() -> None:
+    """
+    Performance mode: only warnings and errors are logged, so no per-record logging work is done at all.
+    """
+    configure(level=logging.WARNING)
+
+
+class RecordSampler:
+    """
+    Logs per-record messages (at DEBUG level by default) for 1 in `sample_every` records.
+    Whether they're enabled is decided once, so callers can skip the per-record work entirely:
+
+        sample = RecordSampler(self.log)
+        if not sample.enabled:
+            return fast_path()
+        for idx, record in enumerate(data):
+            sample(idx, "record %d: %s", idx, record)
+    """
+
+    def __init__(self, log: logging.Logger, sample_every: Optional[int] = None, level: int = logging.DEBUG):
+        self.log = log
+        self.sample_every = sample_every or _sample_every
+        self.level = level
+        self.enabled = log.isEnabledFor(level)
+
+    def __call__(self, idx: int, msg: str, *args: Any) -> None:
+        if self.enabled and idx % self.sample_every == 0:
+            self.log.log(self.level, msg, *args)
+
+
+def _truncate(text: str) -> str:
+    return text if len(text) <= _preview_chars else text[:_preview_chars] + "..."
+
+
+def preview(data: Any) -> str:
+    """
+    A truncated view of an operator's input or output: formatting it costs the same for 10 records as for 10M.
+    Logging calls should still check the level first, so nothing is built when the message is discarded,
+    and pass the string rather than the data, so log handlers never keep records alive.
+    """
+    if isinstance(data, (list, tuple)):
+        items = [preview(item) if isinstance(item, (list, tuple)) else _truncate(repr(item))
+                 for item in data[:_preview_records]]
+        more = f", ... ({len(data)} records)" if len(data) > _preview_records else ""
+        return f"[{', '.join(items)}{more}]"
+    if data is None or isinstance(data, (str, bytes, int, float)):
+        return _truncate(repr(data))
+    if hasattr(data, '__len__'):
+        return f"<{type(data).__name__} of {len(data)} records>"
+    return f"<{type(data).__name__}>"
@@ -1,5 +1,3 @@
-from petal.examples.example_01_noop import main as noop_pipeline
-
-
 def main():
+    from petal.examples.example_01_noop import main as noop_pipeline
     noop_pipeline()
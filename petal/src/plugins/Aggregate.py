@@ -0,0 +1,15 @@
+from typing import Any, Callable, Optional
+
+from petal.src.core.aggregation import Combiner, Window
+from petal.src.plugins.GroupBy import GroupBy
+
+
+class Aggregate(GroupBy):
+    """
+    Aggregates all the records together (or those of each window), see GroupBy.
+    """
+
+    def __init__(self, operator_id: str, aggregations: dict[str, Combiner], window: Optional[Window] = None,
+                 timestamp: Optional[Callable[[Any], float]] = None, allowed_lateness: float = 0,
+                 ownership: Optional[str] = None):
+        super().__init__(operator_id, None, aggregations, window, timestamp, allowed_lateness, ownership)
@@ -0,0 +1,113 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from petal.src.plugins.SqsWriter import SqsWriter
+
+
+class AsyncSqsWriter(SqsWriter):
+    """
+    An SqsWriter for Pipeline.run_async(): messages are read from the event loop and every SendMessageBatch
+    request is a task on it, so hundreds of requests can be in flight without a thread each.
+
+    With an asyncio SQS client (eg. aiobotocore's, whose calls are coroutines), requests are awaited directly.
+    The calls of a regular boto3 client block, so they run on a pool of `max_in_flight` threads instead.
+    Batching, retries and failures work like SqsWriter's.
+    """
+
+    def __init__(self, operator_id: str, queue_name: str, aws_region: Optional[str] = None,
+                 max_in_flight: int = 128, **kwargs):
+        """
+        :param max_in_flight: Number of SendMessageBatch requests sent concurrently
+        See SqsWriter for the other parameters.
+        """
+        super().__init__(operator_id, queue_name, aws_region, max_in_flight=max_in_flight, **kwargs)
+
+    @property
+    def async_client(self) -> bool:
+        return inspect.iscoroutinefunction(self.sqs_client.send_message_batch)
+
+    def validate_queue_exists(self, queue_name: str) -> Optional[str]:
+        # The queue url of an asyncio client can only be awaited, it's looked up when the run starts
+        if self.async_client:
+            return None
+        return super().validate_queue_exists(queue_name)
+
+    async def process(self, data: AsyncIterator[str]) -> None:
+        await self.send_messages_async(data)
+
+    async def send_messages_async(self, messages: AsyncIterator[str]) -> None:
+        """
+        Sends the messages to the queue, with up to `max_in_flight` batch requests in flight at once.
+        See SqsWriter.send_messages_to_queue.
+
+        :param messages: Async stream of messages to send
+        """
+        if self.queue_url is None:
+            response = await self.sqs_client.get_queue_url(QueueName=self.queue_name)
+            self.queue_url = response['QueueUrl']
+        self._reset()
+        started = time.perf_counter()
+        pool = None if self.async_client else ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                                                 thread_name_prefix=self.operator_id)
+        in_flight = set()
+        try:
+            async for batch in self._pack_batches_async(messages):
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                in_flight.add(asyncio.ensure_future(self._send_batch_async(batch, pool)))
+            for task in in_flight:
+                await task
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._finish(started)
+
+    async def _pack_batches_async(self, messages: AsyncIterator[str]) -> AsyncIterator[list[str]]:
+        # See SqsWriter.pack_batches
+        batch, batch_bytes = [], 0
+        async for message in messages:
+            size = self._message_size(message)
+            if self._batch_full(batch, batch_bytes, size):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(message)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    async def _send_batch_async(self, messages: list[str], pool: Optional[ThreadPoolExecutor]) -> None:
+        loop = asyncio.get_running_loop()
+        pending = {str(idx): message for idx, message in enumerate(messages)}
+        failed = []
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._delay(attempt))
+            if pool is None:
+                errors = await self._request_async(pending, retry=attempt > 0)
+            else:
+                errors = await loop.run_in_executor(pool, self._request, pending, attempt > 0)
+            pending = self._settle(pending, errors, failed, last_attempt=attempt == self.max_retries)
+            if not pending:
+                break
+        self._record_batch(messages, failed)
+
+    async def _request_async(self, entries: dict[str, str], retry: bool) -> dict[str, tuple[str, bool]]:
+        # See SqsWriter._request
+        started = time.perf_counter()
+        try:
+            response = await self.sqs_client.send_message_batch(QueueUrl=self.queue_url,
+                                                                Entries=self._entries(entries))
+        except Exception as e:
+            return self._request_failed(e, entries)
+        finally:
+            self._record_request(started, retry)
+        return self._failed_entries(response)
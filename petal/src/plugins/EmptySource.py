@@ -1,4 +1,3 @@
-from petal.src.logger import logger
 from petal.src.core.operators.Source import Source
 
 
@@ -7,5 +6,8 @@ class EmptySource(Source):
     def __init__(self, operator_id: str):
         super().__init__(operator_id)
 
+    def cache_config(self) -> dict:
+        return {}
+
     def process(self) -> None:
-        logger.info("EmptySource: no-op")
+        self.log.info("EmptySource: no-op")
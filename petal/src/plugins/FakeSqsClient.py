@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from botocore.exceptions import ClientError
+
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+
+class FakeSqsClient:
+    """
+    An in-memory stand-in for a boto3 SQS client, implementing the calls used by the Sqs plugins,
+    to test and benchmark pipelines without AWS. Like SQS, it rejects oversized batches, hides received
+    messages for their visibility timeout, and it can simulate network latency and entries failing server-side.
+    """
+
+    def __init__(self, queue_names: tuple[str, ...] = (), latency: float = 0.0, failure_rate: float = 0.0,
+                 fail_entry: Optional[Callable[[dict], Optional[str]]] = None, seed: int = 0):
+        """
+        :param queue_names: Queues that exist, more can be added with create_queue
+        :param latency: Seconds every call takes
+        :param failure_rate: Probability of each sent entry failing with a retryable InternalError
+        :param fail_entry: Called with every sent entry, returns an error code to fail it with
+            as a sender fault (not retryable), or None to accept it
+        :param seed: Seed of the simulated failures
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_entry = fail_entry
+        # Messages of each queue by url, in the order they were sent
+        self.queues: dict[str, list[dict]] = {}
+        self.calls: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        # Reentrant, as a reader's generator may release its messages when garbage collected during a call
+        self._lock = threading.RLock()
+        self._sent = threading.Condition(self._lock)
+        # Calls in flight right now, and the most seen at once
+        self._in_flight = 0
+        self.peak_in_flight = 0
+        for name in queue_names:
+            self.create_queue(QueueName=name)
+
+    def create_queue(self, QueueName: str) -> dict:
+        url = self._url(QueueName)
+        with self._lock:
+            self.queues.setdefault(url, [])
+        return {"QueueUrl": url}
+
+    def get_queue_url(self, QueueName: str) -> dict:
+        with self._call("GetQueueUrl"):
+            url = self._url(QueueName)
+            self._queue(url, "GetQueueUrl")
+            return {"QueueUrl": url}
+
+    def send_message_batch(self, QueueUrl: str, Entries: list[dict]) -> dict:
+        with self._call("SendMessageBatch"):
+            queue = self._queue(QueueUrl, "SendMessageBatch")
+            self._validate_batch(Entries, "SendMessageBatch")
+            if sum(len(entry["MessageBody"].encode('utf-8')) for entry in Entries) > MAX_BATCH_BYTES:
+                raise self._error("AWS.SimpleQueueService.BatchRequestTooLong",
+                                  f"Batch requests cannot be longer than {MAX_BATCH_BYTES} bytes.", "SendMessageBatch")
+
+            successful, failed = [], []
+            with self._lock:
+                for entry in Entries:
+                    code = self.fail_entry(entry) if self.fail_entry else None
+                    if code is not None:
+                        failed.append({"Id": entry["Id"], "SenderFault": True, "Code": code})
+                    elif self._rng.random() < self.failure_rate:
+                        failed.append({"Id": entry["Id"], "SenderFault": False, "Code": "InternalError"})
+                    else:
+                        message_id = str(uuid.uuid4())
+                        queue.append({"MessageId": message_id, "Body": entry["MessageBody"], "visible_at": 0.0,
+                                      "ReceiptHandle": None, "receive_count": 0})
+                        successful.append({"Id": entry["Id"], "MessageId": message_id})
+                self._sent.notify_all()
+            response = {"Successful": successful}
+            if failed:
+                response["Failed"] = failed
+            return response
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, WaitTimeSeconds: int = 0,
+                        VisibilityTimeout: int = 30, **kwargs) -> dict:
+        with self._call("ReceiveMessage"):
+            queue = self._queue(QueueUrl, "ReceiveMessage")
+            deadline = time.monotonic() + WaitTimeSeconds
+            with self._sent:
+                while True:
+                    now = time.monotonic()
+                    visible = [message for message in queue if message["visible_at"] <= now][:MaxNumberOfMessages]
+                    if visible or now >= deadline:
+                        break
+                    # Also wakes up to notice messages whose visibility timeout expired
+                    self._sent.wait(min(deadline - now, 0.05))
+                for message in visible:
+                    message["visible_at"] = now + VisibilityTimeout
+                    message["ReceiptHandle"] = str(uuid.uuid4())
+                    message["receive_count"] += 1
+                messages = [{"MessageId": message["MessageId"], "ReceiptHandle": message["ReceiptHandle"],
+                             "Body": message["Body"],
+                             "Attributes": {"ApproximateReceiveCount": str(message["receive_count"])}}
+                            for message in visible]
+            return {"Messages": messages} if messages else {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: list[dict]) -> dict:
+        with self._call("DeleteMessageBatch"):
+            queue = self._queue(QueueUrl, "DeleteMessageBatch")
+            self._validate_batch(Entries, "DeleteMessageBatch")
+            with self._lock:
+                handles = {entry["ReceiptHandle"]: entry["Id"] for entry in Entries}
+                deleted = {handles[message["ReceiptHandle"]] for message in queue if message["ReceiptHandle"] in handles}
+                queue[:] = [message for message in queue if message["ReceiptHandle"] not in handles]
+            return self._batch_response(Entries, deleted)
+
+    def change_message_visibility_batch(self, QueueUrl: str, Entries: list[dict]) -> dict:
+        with self._call("ChangeMessageVisibilityBatch"):
+            queue = self._queue(QueueUrl, "ChangeMessageVisibilityBatch")
+            self._validate_batch(Entries, "ChangeMessageVisibilityBatch")
+            with self._sent:
+                entries = {entry["ReceiptHandle"]: entry for entry in Entries}
+                changed = set()
+                for message in queue:
+                    entry = entries.get(message["ReceiptHandle"])
+                    if entry is not None:
+                        message["visible_at"] = time.monotonic() + entry["VisibilityTimeout"]
+                        changed.add(entry["Id"])
+                self._sent.notify_all()
+            return self._batch_response(Entries, changed)
+
+    def messages(self, QueueUrl: str) -> list[str]:
+        """The bodies of the messages in the queue (received or not), in the order they were sent."""
+        with self._lock:
+            return [message["Body"] for message in self.queues[QueueUrl]]
+
+    def _batch_response(self, entries: list[dict], succeeded: set[str]) -> dict:
+        # Receipt handles are only valid until the message is received again or deleted
+        response = {"Successful": [{"Id": entry["Id"]} for entry in entries if entry["Id"] in succeeded]}
+        failed = [{"Id": entry["Id"], "SenderFault": True, "Code": "ReceiptHandleIsInvalid"}
+                  for entry in entries if entry["Id"] not in succeeded]
+        if failed:
+            response["Failed"] = failed
+        return response
+
+    @contextmanager
+    def _call(self, operation: str) -> Iterator[None]:
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency)
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _queue(self, url: str, operation: str) -> list[dict]:
+        if url not in self.queues:
+            raise self._error("AWS.SimpleQueueService.NonExistentQueue", "The specified queue does not exist.", operation)
+        return self.queues[url]
+
+    def _validate_batch(self, entries: list[dict], operation: str) -> None:
+        if not entries:
+            raise self._error("AWS.SimpleQueueService.EmptyBatchRequest",
+                              "The batch request doesn't contain any entries.", operation)
+        if len(entries) > MAX_BATCH_ENTRIES:
+            raise self._error("AWS.SimpleQueueService.TooManyEntriesInBatchRequest",
+                              f"Maximum number of entries per request are {MAX_BATCH_ENTRIES}.", operation)
+        if len({entry["Id"] for entry in entries}) != len(entries):
+            raise self._error("AWS.SimpleQueueService.BatchEntryIdsNotDistinct",
+                              "Two or more batch entries have the same Id.", operation)
+
+    @staticmethod
+    def _url(queue_name: str) -> str:
+        return f"https://sqs.fake.localhost/000000000000/{queue_name}"
+
+    @staticmethod
+    def _error(code: str, message: str, operation: str) -> "ClientError":
+        from botocore.exceptions import ClientError
+        return ClientError({"Error": {"Code": code, "Message": message}}, operation)
@@ -1,25 +1,273 @@
-from typing import Iterable
+import json
+import mmap
+import os
+import tempfile
+import time
+from typing import Iterable, Iterator, Optional
 
-from petal.src.logger import logger
+from petal.src.logger import RecordSampler
+from petal.src.core.cache import file_fingerprint
 from petal.src.core.operators.Reader import Reader
+from petal.src.core.utils import flatten
+
+READ_MODES = ("lines", "chunked", "mmap")
+
+
+def split_byte_ranges(file_path: str, n: int) -> list[tuple[int, int]]:
+    """
+    Splits a file into at most n contiguous byte ranges of roughly equal size.
+    Every range boundary falls right after a newline, so no line spans two ranges.
+
+    :param file_path: The file to split
+    :param n: The number of ranges wanted
+    :return: A list of (start, end) byte offsets, end excluded
+    """
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, 'rb') as f:
+        for idx in range(1, n):
+            target = size * idx // n
+            if target <= bounds[-1]:
+                continue
+            # Start one byte early, so a newline right before the target ends the range there
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
 
 
 class FileReader(Reader):
 
-    def __init__(self, operator_id: str, file_path: str):
+    def __init__(self, operator_id: str, file_path: str, read_mode: str = "lines", chunk_size: int = 1 << 20,
+                 byte_range: Optional[tuple[int, int]] = None, encoding: str = "utf-8",
+                 checkpoint: Optional[str] = None, follow: bool = False, poll_interval: float = 1.0,
+                 idle_timeout: Optional[float] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param file_path: The file to read, one record per line
+        :param read_mode: "lines" iterates over the file in text mode,
+            "chunked" reads large binary blocks and splits them into lines,
+            "mmap" does the same over a memory map of the file
+        :param chunk_size: Size in bytes of the blocks read in chunked and mmap modes
+        :param byte_range: Only read the lines in [start, end) - see split_byte_ranges. Reads in chunked mode
+            unless read_mode is mmap
+        :param encoding: Encoding of the file, must be ASCII-compatible (eg. utf-8, latin-1). Lines end at '\n'
+            in every mode and keep their line ending as is, eg. '\r\n'
+        :param checkpoint: Path of a file keeping the byte offset read up to. Each run starts from the offset
+            committed by the previous one, and commits its own only once the whole pipeline has succeeded
+            (see BaseOperator.commit). A trailing line without a newline is left for the next run
+        :param follow: Keep reading as the file grows (like `tail -f`) instead of stopping at the end of the file,
+            reopening it when it's rotated and starting over when it's truncated
+        :param poll_interval: Seconds to wait between checks for new data when following
+        :param idle_timeout: Stop following once no new data has arrived for this many seconds, None follows forever.
+            Required with a checkpoint, which is only committed once the run ends
+        """
         super().__init__(operator_id)
+        if read_mode not in READ_MODES:
+            raise ValueError(f"Unknown read mode '{read_mode}', expected one of {READ_MODES}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if (checkpoint or follow) and (byte_range is not None or read_mode == "mmap"):
+            raise ValueError("A FileReader with a checkpoint or following a file can't use byte_range or mmap")
+        if checkpoint and follow and idle_timeout is None:
+            # The offset would never be committed, and every restart would read the whole file again
+            raise ValueError("A FileReader following a file with a checkpoint needs an idle_timeout")
         self.file_path = file_path
+        self.read_mode = read_mode
+        self.chunk_size = chunk_size
+        self.byte_range = byte_range
+        self.encoding = encoding
+        self.checkpoint = checkpoint
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        # The checkpoint to commit once the records read so far have been processed by the pipeline
+        self._pending_checkpoint: Optional[dict] = None
+
+    @classmethod
+    def split(cls, operator_id: str, file_path: str, n: int, **kwargs) -> list["FileReader"]:
+        """
+        Creates up to n readers, each reading its own newline-aligned byte range of the file,
+        with operator ids `<operator_id>_<idx>`.
+        """
+        return [cls(f"{operator_id}_{idx}", file_path, byte_range=byte_range, **kwargs)
+                for idx, byte_range in enumerate(split_byte_ranges(file_path, n))]
+
+    def cache_config(self) -> Optional[dict]:
+        if self.checkpoint or self.follow:
+            return None
+        try:
+            fingerprint = file_fingerprint(self.file_path)
+        except FileNotFoundError:
+            return None
+        return {"file": fingerprint, "read_mode": self.read_mode, "byte_range": self.byte_range,
+                "encoding": self.encoding}
+
+    def commit(self) -> None:
+        if self.checkpoint is None or self._pending_checkpoint is None:
+            return
+        # Write then rename, so a crash never leaves a corrupt checkpoint behind
+        directory = os.path.dirname(os.path.abspath(self.checkpoint))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with open(fd, 'w') as f:
+            json.dump(self._pending_checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint)
+        self.log.info("\t\tFileReader: committed offset %s of %s", self._pending_checkpoint['offset'], self.file_path)
+        self._pending_checkpoint = None
 
     def process(self) -> Iterable[str]:
-        logger.info(f"\t\tFileReader: reading file {self.file_path}.")
+        if self.checkpoint or self.follow:
+            return flatten(self._read_incremental())
+        if self.read_mode == "lines" and self.byte_range is None:
+            return self._read_lines()
+        return flatten(self._read_line_batches())
+
+    def process_batches(self, batch_size: int) -> Iterable[list[str]]:
+        if self.checkpoint or self.follow:
+            return self._rebatch(self._read_incremental(), batch_size)
+        if self.read_mode == "lines" and self.byte_range is None:
+            return super().process_batches(batch_size=batch_size)
+        return self._rebatch(self._read_line_batches(), batch_size)
+
+    def _read_lines(self) -> Iterator[str]:
+        self.log.info("\t\tFileReader: reading file %s.", self.file_path)
+        sample = RecordSampler(self.log)
         try:
-            with open(self.file_path, 'r') as f:
-                ctr = 0
-                for line in f.readlines():
-                    logger.info(f'\t\tFileReader: reading line {ctr}...')
-                    yield line
-                    ctr += 1
-            logger.info("\t\tFileReader: done reading.")
+            # Only split on '\n' and don't translate line endings, like the binary read modes
+            with open(self.file_path, 'r', encoding=self.encoding, newline='\n') as f:
+                if sample.enabled:
+                    for ctr, line in enumerate(f):
+                        sample(ctr, "\t\tFileReader: reading line %d...", ctr)
+                        yield line
+                else:
+                    yield from f
+            self.log.info("\t\tFileReader: done reading.")
         except FileNotFoundError as e:
-            logger.error(f"\t\tFileReader: no such file {self.file_path}")
+            self.log.error("\t\tFileReader: no such file %s", self.file_path)
             raise e
+
+    def _read_line_batches(self) -> Iterator[list[str]]:
+        # Only whole lines are decoded, the partial line at the end of a block is carried over to the next one
+        self.log.info("\t\tFileReader: reading file %s (%s, range=%s).", self.file_path, self.read_mode, self.byte_range)
+        remainder = b''
+        for block in self._read_blocks():
+            if remainder:
+                block = remainder + block
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                remainder = block
+                continue
+            remainder = block[cut:]
+            lines = block[:cut].decode(self.encoding).split('\n')
+            lines.pop()
+            yield [line + '\n' for line in lines]
+        if remainder:
+            yield [remainder.decode(self.encoding)]
+        self.log.info("\t\tFileReader: done reading.")
+
+    def _load_checkpoint(self, stat: os.stat_result) -> int:
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as f:
+            checkpoint = json.load(f)
+        if checkpoint["inode"] != stat.st_ino:
+            self.log.info("\t\tFileReader: %s was rotated since the last checkpoint, reading from the start",
+                          self.file_path)
+            return 0
+        if checkpoint["offset"] > stat.st_size:
+            self.log.info("\t\tFileReader: %s was truncated since the last checkpoint, reading from the start",
+                          self.file_path)
+            return 0
+        return checkpoint["offset"]
+
+    def _read_incremental(self) -> Iterator[list[str]]:
+        # Reads whole lines from the checkpointed offset, tracking the offset right after the last complete line
+        self._pending_checkpoint = None
+        f = open(self.file_path, 'rb')
+        try:
+            stat = os.fstat(f.fileno())
+            offset = self._load_checkpoint(stat)
+            f.seek(offset)
+            self.log.info("\t\tFileReader: reading file %s from offset %s.", self.file_path, offset)
+            inode, remainder = stat.st_ino, b''
+            last_data = time.monotonic()
+            while True:
+                block = f.read(self.chunk_size)
+                if block:
+                    last_data = time.monotonic()
+                    block = remainder + block
+                    cut = block.rfind(b'\n') + 1
+                    remainder = block[cut:]
+                    if cut:
+                        offset += cut
+                        self._pending_checkpoint = {"inode": inode, "offset": offset}
+                        lines = block[:cut].decode(self.encoding).split('\n')
+                        lines.pop()
+                        yield [line + '\n' for line in lines]
+                    continue
+                if not self.follow:
+                    break
+
+                # At the end of the file: the file may have been rotated (the old one is fully read by now)
+                # or truncated, otherwise wait for more data
+                try:
+                    current = os.stat(self.file_path)
+                except FileNotFoundError:
+                    current = None
+                if current is not None and current.st_ino != inode:
+                    self.log.info("\t\tFileReader: %s was rotated, reopening it", self.file_path)
+                    if remainder:
+                        # The old file won't grow anymore, its last line is complete even without a newline
+                        yield [remainder.decode(self.encoding)]
+                    f.close()
+                    f = open(self.file_path, 'rb')
+                    inode, offset, remainder = os.fstat(f.fileno()).st_ino, 0, b''
+                    continue
+                if os.fstat(f.fileno()).st_size < offset + len(remainder):
+                    self.log.info("\t\tFileReader: %s was truncated, reading from the start", self.file_path)
+                    f.seek(0)
+                    offset, remainder = 0, b''
+                    continue
+                if self.idle_timeout is not None and time.monotonic() - last_data >= self.idle_timeout:
+                    break
+                time.sleep(self.poll_interval)
+        finally:
+            f.close()
+        self.log.info("\t\tFileReader: done reading %s at offset %s.", self.file_path, offset)
+
+    def _read_blocks(self) -> Iterator[bytes]:
+        start, end = self.byte_range or (0, None)
+        try:
+            with open(self.file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                end = size if end is None else min(end, size)
+                if start >= end:
+                    return
+                if self.read_mode == "mmap":
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        for position in range(start, end, self.chunk_size):
+                            yield mapped[position:min(position + self.chunk_size, end)]
+                    return
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    block = f.read(min(self.chunk_size, remaining))
+                    if not block:
+                        return
+                    remaining -= len(block)
+                    yield block
+        except FileNotFoundError as e:
+            self.log.error("\t\tFileReader: no such file %s", self.file_path)
+            raise e
+
+    @staticmethod
+    def _rebatch(batches: Iterable[list[str]], batch_size: int) -> Iterator[list[str]]:
+        for batch in batches:
+            for idx in range(0, len(batch), batch_size):
+                yield batch[idx:idx + batch_size]
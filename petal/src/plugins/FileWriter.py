@@ -1,20 +1,165 @@
+import glob
+import os
+import re
+import tempfile
 from collections.abc import Iterable
+from typing import Optional
 
-from petal.src.logger import logger
 from petal.src.core.operators.Writer import Writer
 
 
+def _default_permissions(path: str) -> int:
+    if os.path.exists(path):
+        return os.stat(path).st_mode & 0o777
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
 class FileWriter(Writer):
 
-    def __init__(self, operator_id, file_path: str):
+    def __init__(self, operator_id, file_path: str, buffer_size: int = -1, atomic: bool = False,
+                 append: bool = False, max_bytes: Optional[int] = None, max_records: Optional[int] = None,
+                 encoding: Optional[str] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param file_path: The file to write. With rotation, parts are named `<root>.<00000-99999><ext>`
+        :param buffer_size: Write buffer size in bytes, -1 uses Python's default
+        :param atomic: Write each file to a temporary file, fsync it and rename it into place once complete,
+            so readers never see a partial file and a failed run leaves the previous file intact
+        :param append: Append to the existing file (or last part) instead of overwriting it. Not atomic.
+            Without it, the parts of a previous run beyond the last part written are removed once the run succeeds
+        :param max_bytes: Rotate to a new part file before it exceeds this many bytes
+        :param max_records: Rotate to a new part file once it holds this many records
+        :param encoding: Encoding of the output file, defaults to the platform's like open()
+        """
         super().__init__(operator_id)
+        if atomic and append:
+            raise ValueError("A FileWriter can't be both atomic and append to an existing file")
+        if (max_bytes is not None and max_bytes < 1) or (max_records is not None and max_records < 1):
+            raise ValueError("max_bytes and max_records must be at least 1")
         self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.atomic = atomic
+        self.append = append
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.encoding = encoding
+        # The files completed during the last run
+        self.written_files: list[str] = []
+
+        self._file = None
+        self._target_path = None
+        self._temp_path = None
+        self._part = 0
+        self._bytes = 0
+        self._records = 0
+
+    @property
+    def rotating(self) -> bool:
+        return self.max_bytes is not None or self.max_records is not None
+
+    def part_path(self, part: int) -> str:
+        root, ext = os.path.splitext(self.file_path)
+        return f"{root}.{part:05d}{ext}"
 
     def process(self, data: Iterable[str]) -> None:
-        logger.info(f"FileWriter: writing to file {self.file_path}.")
-        with open(self.file_path, 'w') as f:
-            ctr = 0
-            logger.info(f"FileWriter: writing line {ctr}...")
-            f.writelines(data)
-        logger.info(f"FileWriter: done writing.")
+        self._write([data], batched=False)
+
+    def process_batches(self, batches: Iterable[list[str]], batch_size: int) -> None:
+        self._write(batches, batched=True)
+
+    def _write(self, batches: Iterable[Iterable[str]], batched: bool) -> None:
+        self.log.info("FileWriter: writing to file %s.", self.file_path)
+        self.written_files = []
+        self._open(self._first_part())
+        try:
+            for batch in batches:
+                if self.rotating:
+                    for record in batch:
+                        self._write_record(record)
+                elif batched:
+                    # One write call per batch rather than per line
+                    self._file.write(''.join(batch))
+                else:
+                    self._file.writelines(batch)
+            self._close()
+        except BaseException:
+            self._abort()
+            raise
+        if self.rotating and not self.append:
+            self._remove_stale_parts()
+        self.log.info("FileWriter: done writing %s.", self.written_files)
+
+    def _write_record(self, record: str) -> None:
+        size = len(record.encode(self._file.encoding)) if self.max_bytes is not None else 0
+        if self._records and ((self.max_records is not None and self._records >= self.max_records)
+                              or (self.max_bytes is not None and self._bytes + size > self.max_bytes)):
+            self._close()
+            self._open(self._part + 1)
+        self._file.write(record)
+        self._records += 1
+        self._bytes += size
+
+    def existing_parts(self) -> dict[int, str]:
+        """
+        The part files on disk, by part number.
+        """
+        root, ext = os.path.splitext(self.file_path)
+        pattern = re.compile(re.escape(root) + r"\.(\d{5})" + re.escape(ext) + "$")
+        return {int(match.group(1)): path for path in glob.glob(glob.escape(root) + ".*" + glob.escape(ext))
+                if (match := pattern.match(path))}
+
+    def _first_part(self) -> int:
+        if not (self.rotating and self.append):
+            return 0
+        # Keep appending to the last part written by a previous run
+        return max(self.existing_parts(), default=0)
+
+    def _remove_stale_parts(self) -> None:
+        # Parts left over from a previous, longer run would otherwise be read along with the new ones
+        for part, path in sorted(self.existing_parts().items()):
+            if part > self._part:
+                self.log.info("FileWriter: removing stale part %s.", path)
+                os.remove(path)
+
+    def _open(self, part: int) -> None:
+        self._part = part
+        self._records = 0
+        path = self.part_path(part) if self.rotating else self.file_path
+        if self.atomic:
+            directory, name = os.path.split(os.path.abspath(path))
+            fd, self._temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+            self._file = open(fd, 'w', buffering=self.buffer_size, encoding=self.encoding)
+        else:
+            self._file = open(path, 'a' if self.append else 'w', buffering=self.buffer_size, encoding=self.encoding)
+        self._target_path = path
+        if self.append:
+            self._bytes = self._file.tell()
+            if self.max_records is not None:
+                with open(path, 'rb') as existing:
+                    self._records = sum(1 for _ in existing)
+        else:
+            self._bytes = 0
+
+    def _close(self) -> None:
+        if self.atomic:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            # mkstemp creates the file as owner-only, give it the permissions open() would have
+            os.chmod(self._temp_path, _default_permissions(self._target_path))
+            os.replace(self._temp_path, self._target_path)
+            self._temp_path = None
+        else:
+            self._file.close()
+        self.written_files.append(self._target_path)
+        self._file = None
 
+    def _abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._temp_path is not None:
+            os.remove(self._temp_path)
+            self._temp_path = None
@@ -0,0 +1,145 @@
+import math
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from petal.src.core.aggregation import Combiner, Window
+from petal.src.core.cache import callable_fingerprint
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own, validate_ownership
+
+
+class GroupBy(NonTerminalOperator):
+    """
+    Aggregates records by key, optionally within time windows, with incremental combiners
+    (see petal.src.core.aggregation): only one state per open key (and window) is kept in memory.
+
+    Each output record is a dict with the group's `key`, `window_start` and `window_end` when windowed,
+    and the result of every aggregation by name. Without a window, groups are output at the end of the stream.
+    With one, each window is output as soon as it closes, ie. once a record at least `allowed_lateness`
+    past its end has been seen, and the remaining windows at the end of the stream.
+    """
+
+    def __init__(self, operator_id: str, key: Optional[Callable[[Any], Any]], aggregations: dict[str, Combiner],
+                 window: Optional[Window] = None, timestamp: Optional[Callable[[Any], float]] = None,
+                 allowed_lateness: float = 0, ownership: Optional[str] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param key: Extracts the group key of a record, must be hashable. None aggregates all records together
+        :param aggregations: Combiner of each output field, by name, eg. {"events": Count()}
+        :param window: A TumblingWindow or SlidingWindow
+        :param timestamp: Extracts the timestamp of a record (a number, eg. epoch seconds), required with a window
+        :param allowed_lateness: How far behind the latest timestamp seen a record may be and still be counted
+            in its windows. Records arriving after some or all of their windows are closed are left out of those
+            windows and counted in `late_records`
+        :param ownership: Data ownership mode, see petal.src.core.ownership
+        """
+        super().__init__(operator_id)
+        if not aggregations:
+            raise ValueError("At least one aggregation is required")
+        if window is not None and timestamp is None:
+            raise ValueError("A windowed aggregation needs a timestamp extractor")
+        if allowed_lateness < 0:
+            raise ValueError("allowed_lateness can't be negative")
+        self.key = key
+        self.aggregations = aggregations
+        self.window = window
+        self.timestamp = timestamp
+        self.allowed_lateness = allowed_lateness
+        self.ownership = validate_ownership(ownership)
+        # Records of the last run left out of some or all of their windows, because they were already closed
+        self.late_records = 0
+
+    def cache_config(self) -> Optional[dict]:
+        functions = [callable_fingerprint(func) if func is not None else "none" for func in (self.key, self.timestamp)]
+        combiners = {name: combiner.config() for name, combiner in self.aggregations.items()}
+        if None in functions or None in combiners.values():
+            return None
+        return {"key": functions[0], "timestamp": functions[1], "aggregations": combiners,
+                "window": self.window.config() if self.window else None, "allowed_lateness": self.allowed_lateness}
+
+    def process(self, data: Iterable[Any]) -> Iterator[dict]:
+        data = own(data, self.data_ownership())
+        if self.window is None:
+            return self._aggregate(data)
+        return self._aggregate_windows(data)
+
+    def _add(self, groups: dict, record: Any) -> None:
+        key = self.key(record) if self.key is not None else None
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [combiner.create() for combiner in self.aggregations.values()]
+        for idx, combiner in enumerate(self.aggregations.values()):
+            states[idx] = combiner.add_record(states[idx], record)
+
+    def _output(self, key: Any, states: list, window_start: Optional[float] = None) -> dict:
+        output = {}
+        if self.key is not None:
+            output["key"] = key
+        if self.window is not None:
+            output["window_start"] = window_start
+            output["window_end"] = window_start + self.window.size
+        for (name, combiner), state in zip(self.aggregations.items(), states):
+            output[name] = combiner.result(state)
+        return output
+
+    def _aggregate(self, data: Iterable[Any]) -> Iterator[dict]:
+        groups = {}
+        for record in data:
+            self._add(groups, record)
+        self.log.info("GroupBy: aggregated %d groups", len(groups))
+        for key, states in groups.items():
+            yield self._output(key, states)
+
+    def _aggregate_windows(self, data: Iterable[Any]) -> Iterator[dict]:
+        window = self.window
+        # Groups of each pane by pane start, see Window
+        panes: dict[float, dict] = {}
+        # Start of the earliest window not output yet
+        next_window: Optional[float] = None
+        watermark = -math.inf
+        self.late_records = 0
+
+        def close(until: float) -> Iterator[dict]:
+            # Outputs the windows ending by `until`, skipping windows without any record
+            nonlocal next_window
+            while panes:
+                next_window = max(next_window, window.first_window(min(panes)))
+                if next_window + window.size > until:
+                    return
+                yield from self._output_window(panes, next_window)
+                next_window += window.slide
+                for pane in [pane for pane in panes if pane < next_window]:
+                    del panes[pane]
+
+        for record in data:
+            timestamp = self.timestamp(record)
+            pane = window.pane(timestamp)
+            if next_window is None:
+                next_window = window.first_window(window.pane(timestamp - self.allowed_lateness))
+            if window.first_window(pane) < next_window:
+                # Some of the windows covering the record are closed, or all of them once its own pane is
+                self.late_records += 1
+                if pane < next_window:
+                    continue
+            self._add(panes.setdefault(pane, {}), record)
+            if timestamp - self.allowed_lateness > watermark:
+                watermark = timestamp - self.allowed_lateness
+                if next_window + window.size <= watermark:
+                    yield from close(watermark)
+        yield from close(math.inf)
+        if self.late_records:
+            self.log.warning("GroupBy: %d records arrived after some or all of their windows closed",
+                             self.late_records)
+
+    def _output_window(self, panes: dict, start: float) -> Iterator[dict]:
+        combiners = list(self.aggregations.values())
+        merged = {}
+        end = start + self.window.size
+        for pane in sorted(pane for pane in panes if start <= pane < end):
+            for key, states in panes[pane].items():
+                if key not in merged:
+                    merged[key] = list(states)
+                else:
+                    merged[key] = [combiner.merge(state, other)
+                                   for combiner, state, other in zip(combiners, merged[key], states)]
+        for key, states in merged.items():
+            yield self._output(key, states, start)
@@ -0,0 +1,149 @@
+import sys
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from petal.src.core.spill import PickleSerializer, SpilledRecords
+from petal.src.plugins.KeyedJoiner import KeyedJoiner, pair
+
+BUILD_SIDES = ("auto", "left", "right")
+
+# Records buffered per partition before they're written to its file
+_FLUSH_SIZE = 1024
+
+
+class HashJoiner(KeyedJoiner):
+    """
+    Joins by loading one input (the build side) into a hash table, then streaming the other (the probe side)
+    through it, in O(n + m). Keys must be hashable. Matches are output in the order of the probe side,
+    followed by the unmatched build records of left/right/outer joins.
+
+    When the build side exceeds the memory budget, both inputs are hash-partitioned to temporary files and
+    joined one partition at a time (a grace hash join), so only one partition of the build side is in memory.
+    """
+
+    def __init__(self, operator_id: str, left_key: Callable[[Any], Any], right_key: Optional[Callable[[Any], Any]] = None,
+                 how: str = "inner", merge_func: Callable[[Any, Any], Any] = pair, build: str = "auto",
+                 memory_budget: Optional[int] = None, partitions: int = 16, spill_dir: Optional[str] = None,
+                 ownership: Optional[str] = None):
+        """
+        :param build: The input loaded into memory. "auto" picks the smaller input when both are materialized
+            (batch and threaded modes), and the right one otherwise
+        :param memory_budget: Estimated bytes the build side may take in memory before spilling,
+            defaults to the pipeline's memory_budget. None never spills
+        :param partitions: Number of partitions written to disk when spilling
+        :param spill_dir: Where partitions are written, defaults to the pipeline's spill_dir
+        See KeyedJoiner for the other parameters.
+        """
+        super().__init__(operator_id, left_key, right_key, how, merge_func, ownership)
+        if build not in BUILD_SIDES:
+            raise ValueError(f"Unknown build side '{build}', expected one of {BUILD_SIDES}")
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        self.build = build
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+
+    def cache_config(self) -> Optional[dict]:
+        config = super().cache_config()
+        # Which side is built changes the output order
+        return None if config is None else {**config, "build": self.build}
+
+    def join(self, left: Iterable[Any], right: Iterable[Any]) -> Iterator[Any]:
+        if self._build_left(left, right):
+            merge = self.merge_func
+            yield from self._hash_join(left, right, self.left_key, self.right_key, merge,
+                                       keep_build=self.keep_left, keep_probe=self.keep_right)
+        else:
+            def merge(build_record, probe_record):
+                return self.merge_func(probe_record, build_record)
+
+            yield from self._hash_join(right, left, self.right_key, self.left_key, merge,
+                                       keep_build=self.keep_right, keep_probe=self.keep_left)
+
+    def _build_left(self, left: Iterable[Any], right: Iterable[Any]) -> bool:
+        if self.build == "auto":
+            return hasattr(left, '__len__') and hasattr(right, '__len__') and len(left) < len(right)
+        return self.build == "left"
+
+    def _budget(self) -> Optional[int]:
+        if self.memory_budget is not None:
+            return self.memory_budget
+        return getattr(self.pipeline, 'memory_budget', None)
+
+    def _hash_join(self, build: Iterable[Any], probe: Iterable[Any], build_key: Callable, probe_key: Callable,
+                   merge: Callable, keep_build: bool, keep_probe: bool) -> Iterator[Any]:
+        budget = self._budget()
+        table, size = {}, sys.getsizeof({})
+        records = iter(build)
+        for record in records:
+            table.setdefault(build_key(record), []).append(record)
+            size += sys.getsizeof(record) + 8
+            if budget is not None and size > budget:
+                yield from self._grace_join(table, records, probe, build_key, probe_key, merge, keep_build, keep_probe)
+                return
+        self.log.info("HashJoiner: built a table of %d keys", len(table))
+        yield from self._probe(table, probe, probe_key, merge, keep_build, keep_probe)
+
+    @staticmethod
+    def _probe(table: dict, probe: Iterable[Any], probe_key: Callable, merge: Callable, keep_build: bool,
+               keep_probe: bool) -> Iterator[Any]:
+        matched = set()
+        for record in probe:
+            key = probe_key(record)
+            matches = table.get(key)
+            if matches:
+                if keep_build:
+                    matched.add(key)
+                for build_record in matches:
+                    yield merge(build_record, record)
+            elif keep_probe:
+                yield merge(None, record)
+        if keep_build:
+            for key, build_records in table.items():
+                if key not in matched:
+                    for build_record in build_records:
+                        yield merge(build_record, None)
+
+    def _grace_join(self, table: dict, build_rest: Iterator[Any], probe: Iterable[Any], build_key: Callable,
+                    probe_key: Callable, merge: Callable, keep_build: bool, keep_probe: bool) -> Iterator[Any]:
+        self.log.info("HashJoiner: build side exceeds the memory budget, joining it in %d partitions on disk",
+                      self.partitions)
+        spill_dir = self.spill_dir or getattr(self.pipeline, 'spill_dir', None)
+        build_parts = self._partition(
+            (record for records in table.values() for record in records), build_rest, build_key, spill_dir)
+        table.clear()
+        try:
+            probe_parts = self._partition((), iter(probe), probe_key, spill_dir)
+            try:
+                for build_part, probe_part in zip(build_parts, probe_parts):
+                    part_table = {}
+                    for record in build_part:
+                        part_table.setdefault(build_key(record), []).append(record)
+                    yield from self._probe(part_table, probe_part, probe_key, merge, keep_build, keep_probe)
+            finally:
+                for part in probe_parts:
+                    part.close()
+        finally:
+            for part in build_parts:
+                part.close()
+
+    def _partition(self, head: Iterable[Any], rest: Iterator[Any], key: Callable,
+                   spill_dir: Optional[str]) -> list[SpilledRecords]:
+        parts = [SpilledRecords(PickleSerializer(), spill_dir) for _ in range(self.partitions)]
+        buffers = [[] for _ in range(self.partitions)]
+        try:
+            for records in (head, rest):
+                for record in records:
+                    idx = hash(key(record)) % self.partitions
+                    buffers[idx].append(record)
+                    if len(buffers[idx]) >= _FLUSH_SIZE:
+                        parts[idx].extend(buffers[idx])
+                        buffers[idx].clear()
+            for part, buffer in zip(parts, buffers):
+                part.extend(buffer)
+                part.seal()
+        except BaseException:
+            for part in parts:
+                part.seal().close()
+            raise
+        return parts
@@ -1,8 +1,12 @@
-from petal.src.core.operators import Mapper
+from petal.src.core.operators.Mapper import Mapper
+
+
+def identity(x):
+    return x
 
 
 class IdentityTransformer(Mapper):
+    pass_through = True
 
-    def __init__(self, operator_id: str):
-        super().__init__(operator_id)
-        self.mapping_func = lambda x: x
+    def __init__(self, operator_id: str, **kwargs):
+        super().__init__(operator_id, identity, **kwargs)
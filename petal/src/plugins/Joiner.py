@@ -1,14 +1,20 @@
-import copy
-from typing import Any, Iterable, Callable
+from typing import Any, Iterable, Callable, Optional
 from functools import reduce
 
+from petal.src.core.cache import callable_fingerprint
 from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own, validate_ownership
 
 
 class Joiner(NonTerminalOperator):
-    def __init__(self, operator_id: str, reducer_func: Callable):
+    def __init__(self, operator_id: str, reducer_func: Callable, ownership: Optional[str] = None):
         super().__init__(operator_id)
         self.reducer_func = reducer_func
+        self.ownership = validate_ownership(ownership)
+
+    def cache_config(self) -> Optional[dict]:
+        fingerprint = callable_fingerprint(self.reducer_func)
+        return None if fingerprint is None else {"reducer_func": fingerprint}
 
     def process(self, *data: Iterable[Iterable[Any]]) -> Iterable[Any]:
-        return reduce(self.reducer_func, copy.deepcopy(data))
+        return reduce(self.reducer_func, [own(stream, self.data_ownership()) for stream in data])
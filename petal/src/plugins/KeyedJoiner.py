@@ -0,0 +1,66 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from petal.src.core.cache import callable_fingerprint
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own, validate_ownership
+
+JOIN_TYPES = ("inner", "left", "right", "outer")
+
+
+def pair(left: Any, right: Any) -> tuple[Any, Any]:
+    return left, right
+
+
+class KeyedJoiner(NonTerminalOperator, ABC):
+    """
+    Joins the records of two inputs whose keys are equal, like a SQL join. The left input is the one
+    connected first. Each match is output as `merge_func(left_record, right_record)`, a (left, right)
+    tuple by default. Outer joins pass None for the missing side of unmatched records.
+    """
+
+    def __init__(self, operator_id: str, left_key: Callable[[Any], Any], right_key: Optional[Callable[[Any], Any]] = None,
+                 how: str = "inner", merge_func: Callable[[Any, Any], Any] = pair, ownership: Optional[str] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param left_key: Extracts the join key of a left record
+        :param right_key: Extracts the join key of a right record, defaults to left_key
+        :param how: "inner" only outputs matches, "left"/"right" also output the unmatched records of that side,
+            "outer" those of both sides
+        :param merge_func: Combines a left and a right record into an output record
+        :param ownership: Data ownership mode, see petal.src.core.ownership
+        """
+        super().__init__(operator_id)
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Unknown join type '{how}', expected one of {JOIN_TYPES}")
+        self.left_key = left_key
+        self.right_key = right_key or left_key
+        self.how = how
+        self.merge_func = merge_func
+        self.ownership = validate_ownership(ownership)
+
+    @property
+    def keep_left(self) -> bool:
+        return self.how in ("left", "outer")
+
+    @property
+    def keep_right(self) -> bool:
+        return self.how in ("right", "outer")
+
+    def validate(self) -> None:
+        if len(self.upstream) != 2:
+            raise ValueError(f"{self.operator_id}: a join takes exactly 2 inputs, got {len(self.upstream)}")
+
+    def cache_config(self) -> Optional[dict]:
+        fingerprints = [callable_fingerprint(func) for func in (self.left_key, self.right_key, self.merge_func)]
+        if None in fingerprints:
+            return None
+        return {"keys": fingerprints[:2], "merge_func": fingerprints[2], "how": self.how}
+
+    def process(self, left: Iterable[Any], right: Iterable[Any]) -> Iterator[Any]:
+        ownership = self.data_ownership()
+        return self.join(own(left, ownership), own(right, ownership))
+
+    @abstractmethod
+    def join(self, left: Iterable[Any], right: Iterable[Any]) -> Iterator[Any]:
+        pass
@@ -1,6 +1,5 @@
 from typing import Any
 
-from petal.src.logger import logger
 from petal.src.core.operators.Sink import Sink
 
 
@@ -10,4 +9,4 @@ class NoOpSink(Sink):
         super().__init__(operator_id)
 
     def process(self, data: Any) -> None:
-        logger.info("NoOpSink: no-op")
+        self.log.info("NoOpSink: no-op")
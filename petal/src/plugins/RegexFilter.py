@@ -3,6 +3,11 @@ from petal.src.core.operators.Filter import Filter
 
 
 class RegexFilter(Filter):
-    def __init__(self, operator_id, pattern):
-        super().__init__(operator_id, lambda x: self.pattern.search(x))
+    def __init__(self, operator_id, pattern, **kwargs):
+        # A bound method of the compiled pattern (unlike a lambda) can be pickled to worker processes
         self.pattern = re.compile(pattern)
+        super().__init__(operator_id, self.pattern.search, **kwargs)
+
+    def cache_config(self):
+        return {"pattern": self.pattern.pattern, "flags": self.pattern.flags,
+                "unordered": self.parallelism > 1 and not self.ordered}
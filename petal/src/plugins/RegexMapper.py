@@ -2,7 +2,29 @@ import re
 from petal.src.core.operators.Mapper import Mapper
 
 
+class FirstMatch:
+    """Picklable mapping function returning the first regex match of a record."""
+
+    def __init__(self, pattern: re.Pattern):
+        self.pattern = pattern
+
+    def __call__(self, record: str):
+        # Same result as findall(record)[0], without scanning the rest of the record
+        match = self.pattern.search(record)
+        if match is None:
+            raise IndexError(f"No match of {self.pattern.pattern!r}")
+        if self.pattern.groups == 0:
+            return match.group()
+        if self.pattern.groups == 1:
+            return match.group(1) or ""
+        return match.groups(default="")
+
+
 class RegexMapper(Mapper):
-    def __init__(self, operator_id: str, pattern: str):
-        super().__init__(operator_id, lambda x: self.pattern.findall(x)[0])
+    def __init__(self, operator_id: str, pattern: str, **kwargs):
         self.pattern = re.compile(pattern)
+        super().__init__(operator_id, FirstMatch(self.pattern), **kwargs)
+
+    def cache_config(self):
+        return {"pattern": self.pattern.pattern, "flags": self.pattern.flags,
+                "unordered": self.parallelism > 1 and not self.ordered}
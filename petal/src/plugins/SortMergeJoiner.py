@@ -0,0 +1,63 @@
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from petal.src.plugins.KeyedJoiner import KeyedJoiner
+
+_DONE = (None, None)
+
+
+class SortMergeJoiner(KeyedJoiner):
+    """
+    Joins two inputs already sorted by their keys (ascending) by merging them in a single pass, in O(n + m).
+    Both inputs are streamed: only the records sharing the current key are held in memory, so it suits
+    large or unbounded sorted inputs (eg. time-ordered logs). Raises ValueError if an input isn't sorted.
+    Keys must be comparable, and output records are in key order.
+    """
+
+    def join(self, left: Iterable[Any], right: Iterable[Any]) -> Iterator[Any]:
+        left_groups = self._groups(left, self.left_key, "left")
+        right_groups = self._groups(right, self.right_key, "right")
+        left_key, left_records = next(left_groups, _DONE)
+        right_key, right_records = next(right_groups, _DONE)
+
+        while left_records is not None and right_records is not None:
+            if left_key < right_key:
+                if self.keep_left:
+                    yield from (self.merge_func(record, None) for record in left_records)
+                left_key, left_records = next(left_groups, _DONE)
+            elif right_key < left_key:
+                if self.keep_right:
+                    yield from (self.merge_func(None, record) for record in right_records)
+                right_key, right_records = next(right_groups, _DONE)
+            else:
+                for left_record in left_records:
+                    for right_record in right_records:
+                        yield self.merge_func(left_record, right_record)
+                left_key, left_records = next(left_groups, _DONE)
+                right_key, right_records = next(right_groups, _DONE)
+
+        # One of the inputs is exhausted, the rest of the other has no match
+        if left_records is not None and self.keep_left:
+            yield from (self.merge_func(record, None) for record in left_records)
+            for _, records in left_groups:
+                yield from (self.merge_func(record, None) for record in records)
+        if right_records is not None and self.keep_right:
+            yield from (self.merge_func(None, record) for record in right_records)
+            for _, records in right_groups:
+                yield from (self.merge_func(None, record) for record in records)
+
+    def _groups(self, data: Iterable[Any], key_func: Callable, side: str) -> Iterator[tuple[Any, list]]:
+        # Consecutive records with the same key
+        group_key: Optional[Any] = None
+        group: list = []
+        for record in data:
+            key = key_func(record)
+            if group and key != group_key:
+                if key < group_key:
+                    raise ValueError(f"{self.operator_id}: the {side} input isn't sorted by its key "
+                                     f"({key!r} after {group_key!r})")
+                yield group_key, group
+                group = []
+            group_key = key
+            group.append(record)
+        if group:
+            yield group_key, group
@@ -1,12 +1,24 @@
-import copy
-from typing import Any, Iterable
+from typing import Any, Iterable, Optional
 
 from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.ownership import own, validate_ownership
 
 
 class Splitter(NonTerminalOperator):
-    def __init__(self, operator_id):
+    pass_through = True
+
+    def __init__(self, operator_id, ownership: Optional[str] = None):
         super().__init__(operator_id)
+        self.ownership = validate_ownership(ownership)
+
+    def cache_config(self) -> Optional[dict]:
+        return {}
 
     def process(self, data: Any) -> Iterable[Any]:
-        return copy.deepcopy(data)
+        # Routing never mutates records, so only the defensive deepcopy policy copies here.
+        # Otherwise every consumer receives the same input by reference.
+        return own(data, self.data_ownership(), writes=False)
+
+    def process_batches(self, batches: Iterable[list], batch_size: int) -> Iterable[list]:
+        # Batches are passed through whole, deep-copied one batch at a time if the policy requires it
+        return own(batches, self.data_ownership(), writes=False)
@@ -0,0 +1,323 @@
+import math
+import queue
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from petal.src.core.operators.Reader import Reader
+from petal.src.core.streams import END, Failure
+from petal.src.core.utils import chunked
+from petal.src.plugins.SqsWriter import MAX_BATCH_ENTRIES, RETRYABLE_ERRORS, get_queue_url
+
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+# SQS limits on ReceiveMessage
+MAX_WAIT_TIME = 20
+MAX_VISIBILITY_TIMEOUT = 12 * 60 * 60
+
+
+class SqsReader(Reader):
+
+    def __init__(self, operator_id: str, queue_name: str, aws_region: Optional[str] = None, receivers: int = 4,
+                 max_messages: Optional[int] = None, idle_timeout: Optional[float] = None,
+                 wait_time: int = MAX_WAIT_TIME, visibility_timeout: int = 30, buffer_size: int = 100,
+                 max_retries: int = 5, backoff: float = 0.1, max_backoff: float = 10.0,
+                 sqs_client: Optional["BaseClient"] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param queue_name: Name of the SQS queue
+        :param aws_region: Region of the queue, used to create the boto3 client
+        :param receivers: Number of threads long-polling the queue concurrently
+        :param max_messages: Stop once this many messages have been received
+        :param idle_timeout: Stop once no message has been received for this many seconds.
+            At least one of max_messages and idle_timeout is required, since messages are only deleted once
+            the run ends. stop() ends the run earlier
+        :param wait_time: Long polling duration of each receive request in seconds, at most 20
+        :param visibility_timeout: Seconds a received message stays hidden from other consumers. It's extended
+            for as long as the message hasn't been deleted, so slow pipelines don't see messages redelivered
+        :param buffer_size: Max number of received messages waiting to be read downstream
+        :param max_retries: Number of times a failed delete or a throttled receive is retried
+        :param backoff: Delay before the first retry in seconds, doubled on every retry (with jitter)
+        :param max_backoff: Max delay between two retries in seconds
+        :param sqs_client: The SQS client to use instead of creating one, eg. a FakeSqsClient
+        """
+        super().__init__(operator_id)
+        if receivers < 1 or buffer_size < 1:
+            raise ValueError("receivers and buffer_size must be at least 1")
+        if not 0 <= wait_time <= MAX_WAIT_TIME:
+            raise ValueError(f"wait_time must be between 0 and {MAX_WAIT_TIME} seconds")
+        if not 1 <= visibility_timeout <= MAX_VISIBILITY_TIMEOUT:
+            raise ValueError(f"visibility_timeout must be between 1 and {MAX_VISIBILITY_TIMEOUT} seconds")
+        if max_messages is None and idle_timeout is None:
+            # An endless run would never delete what it reads, and would keep extending an ever-growing set of leases
+            raise ValueError("An SqsReader needs max_messages or idle_timeout, "
+                             "messages are only deleted once the run ends")
+        self.queue_name = queue_name
+        self.receivers = receivers
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.wait_time = wait_time if idle_timeout is None else min(wait_time, math.ceil(idle_timeout))
+        self.visibility_timeout = visibility_timeout
+        self.buffer_size = buffer_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sqs_client = sqs_client if sqs_client is not None else self.create_boto_client(aws_region)
+        self.queue_url = get_queue_url(self.sqs_client, queue_name)
+        # Counts of the last run
+        self.stats: dict = {}
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Receipt handle -> visibility deadline of every message received and not deleted yet
+        self._leases: dict[str, float] = {}
+        # Receipt handles of the messages read downstream, deleted on commit
+        self._read: list[str] = []
+        self._remaining: Optional[int] = None
+        self._last_message = 0.0
+        self._heartbeat: Optional[threading.Thread] = None
+        self._heartbeat_stop = threading.Event()
+
+    def create_boto_client(self, aws_region: str) -> "BaseClient":
+        import boto3
+        return boto3.client("sqs", aws_region)
+
+    def stop(self) -> None:
+        """
+        Stops receiving messages: the stream ends once the messages already received are read,
+        and the run completes (and deletes them) normally. Safe to call from any thread.
+        """
+        self._stop.set()
+
+    def process(self) -> Iterator[str]:
+        """
+        Yields the body of every message received. Messages are only deleted from the queue once the
+        pipeline has processed them successfully (see commit), a failed run leaves them to be redelivered.
+        """
+        self._stop.clear()
+        self._read = []
+        self._remaining = self.max_messages
+        self._last_message = time.monotonic()
+        self.stats = {"received": 0, "deleted": 0, "extended": 0, "released": 0}
+        self._start_heartbeat()
+        self.log.info("SqsReader: receiving from %s with %d receivers.", self.queue_name, self.receivers)
+
+        buffer = queue.Queue(maxsize=self.buffer_size)
+        threads = [threading.Thread(target=self._receive, args=(buffer,), name=f"{self.operator_id}-receiver-{idx}",
+                                    daemon=True) for idx in range(self.receivers)]
+        for thread in threads:
+            thread.start()
+        finished = 0
+        try:
+            while finished < len(threads):
+                item = buffer.get()
+                if item is END:
+                    finished += 1
+                    continue
+                if isinstance(item, Failure):
+                    raise item.exc
+                receipt_handle, body = item
+                with self._lock:
+                    self._read.append(receipt_handle)
+                yield body
+        finally:
+            self._stop.set()
+            # Messages received but not read downstream (eg. the stream was closed early) are made visible again
+            unread = []
+            while True:
+                try:
+                    item = buffer.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, tuple):
+                    unread.append(item[0])
+            self._release(unread)
+        self.log.info("SqsReader: received %d messages from %s.", len(self._read), self.queue_name)
+
+    def commit(self) -> None:
+        # Every message read has been processed by the whole pipeline
+        with self._lock:
+            handles, self._read = self._read, []
+        for batch in chunked(handles, MAX_BATCH_ENTRIES):
+            self._batch_request(self.sqs_client.delete_message_batch, batch, "deleted")
+        self._stop_heartbeat()
+        with self._lock:
+            # Messages never handed over downstream are left to expire
+            self._leases.clear()
+        self.log.info("SqsReader: deleted %d messages from %s (%d visibility extensions, %d released).",
+                      self.stats.get("deleted", 0), self.queue_name, self.stats.get("extended", 0),
+                      self.stats.get("released", 0))
+
+    def abort(self) -> None:
+        # Make the messages of the failed run visible again right away, rather than after their timeout
+        self._stop.set()
+        with self._lock:
+            self._read = []
+            handles = list(self._leases)
+        self._stop_heartbeat()
+        self._release(handles)
+
+    def _receive(self, buffer: queue.Queue) -> None:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        attempt = 0
+        try:
+            while not self._stop.is_set():
+                count = self._reserve()
+                if not count:
+                    break
+                try:
+                    response = self.sqs_client.receive_message(
+                        QueueUrl=self.queue_url,
+                        MaxNumberOfMessages=count,
+                        WaitTimeSeconds=self.wait_time,
+                        VisibilityTimeout=self.visibility_timeout,
+                    )
+                    attempt = 0
+                except (ClientError, BotoCoreError) as e:
+                    self._unreserve(count)
+                    code = e.response['Error']['Code'] if isinstance(e, ClientError) else type(e).__name__
+                    attempt += 1
+                    if isinstance(e, ClientError) and code not in RETRYABLE_ERRORS or attempt > self.max_retries:
+                        raise
+                    self.log.warning("SqsReader: receiving from %s failed with %s, retrying", self.queue_name, code)
+                    time.sleep(self._delay(attempt))
+                    continue
+
+                messages = response.get('Messages', [])
+                self._unreserve(count - len(messages))
+                now = time.monotonic()
+                with self._lock:
+                    stopped = self._stop.is_set()
+                    if not stopped:
+                        for message in messages:
+                            self._leases[message['ReceiptHandle']] = now + self.visibility_timeout
+                        self.stats["received"] += len(messages)
+                        if messages:
+                            self._last_message = now
+                    idle = now - self._last_message
+                if stopped:
+                    # Stopped (or aborted) during the request
+                    self._release([message['ReceiptHandle'] for message in messages])
+                    break
+                for message in messages:
+                    if not self._put(buffer, (message['ReceiptHandle'], message['Body'])):
+                        # The stream was closed, the messages not handed over expire on their own
+                        break
+                if self.idle_timeout is not None and idle >= self.idle_timeout:
+                    break
+        except BaseException as e:
+            self._put(buffer, Failure(e))
+        finally:
+            self._put(buffer, END)
+
+    def _put(self, buffer: queue.Queue, item) -> bool:
+        # Waits for room in the buffer, unless the stream is closed meanwhile
+        while True:
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self._stop.is_set() and item is not END:
+                    return False
+
+    def _reserve(self) -> int:
+        # Claims up to one request's worth of the messages left to receive
+        with self._lock:
+            if self._remaining is None:
+                return MAX_BATCH_ENTRIES
+            count = min(MAX_BATCH_ENTRIES, self._remaining)
+            self._remaining -= count
+            return count
+
+    def _unreserve(self, count: int) -> None:
+        with self._lock:
+            if self._remaining is not None:
+                self._remaining += count
+
+    def _start_heartbeat(self) -> None:
+        if self._heartbeat is not None and self._heartbeat.is_alive():
+            return
+        self._heartbeat_stop.clear()
+        self._heartbeat = threading.Thread(target=self._extend_visibility, name=f"{self.operator_id}-heartbeat",
+                                           daemon=True)
+        self._heartbeat.start()
+
+    def _stop_heartbeat(self) -> None:
+        self._heartbeat_stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+    def _extend_visibility(self) -> None:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        # Extends the leases that would expire before the next check by another visibility timeout
+        interval = self.visibility_timeout / 3
+        while not self._heartbeat_stop.wait(interval):
+            now = time.monotonic()
+            with self._lock:
+                expiring = [handle for handle, deadline in self._leases.items() if deadline - now < 2 * interval]
+            for batch in chunked(expiring, MAX_BATCH_ENTRIES):
+                try:
+                    self._batch_request(self.sqs_client.change_message_visibility_batch, batch, "extended",
+                                        VisibilityTimeout=self.visibility_timeout)
+                except (ClientError, BotoCoreError) as e:
+                    self.log.warning("SqsReader: failed to extend the visibility of %d messages: %s", len(batch), e)
+
+    def _release(self, handles: list[str]) -> None:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        for batch in chunked(handles, MAX_BATCH_ENTRIES):
+            try:
+                self._batch_request(self.sqs_client.change_message_visibility_batch, batch, "released",
+                                    VisibilityTimeout=0)
+            except (ClientError, BotoCoreError) as e:
+                self.log.warning("SqsReader: failed to release %d messages: %s", len(batch), e)
+
+    def _batch_request(self, request, handles: list[str], counter: str, **entry_args) -> None:
+        """
+        Sends a delete or change visibility batch request, retrying the entries failing server-side.
+        Deleted and released messages are no longer leased, extended ones get a new deadline.
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        pending = {str(idx): handle for idx, handle in enumerate(handles)}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._delay(attempt))
+            try:
+                response = request(QueueUrl=self.queue_url, Entries=[
+                    {'Id': entry_id, 'ReceiptHandle': handle, **entry_args} for entry_id, handle in pending.items()])
+            except ClientError as e:
+                if e.response['Error']['Code'] not in RETRYABLE_ERRORS or attempt == self.max_retries:
+                    raise
+                continue
+            succeeded = [pending[entry['Id']] for entry in response.get('Successful', [])]
+            failed = response.get('Failed', [])
+            now = time.monotonic()
+            with self._lock:
+                self.stats[counter] = self.stats.get(counter, 0) + len(succeeded)
+                for handle in succeeded:
+                    if counter == "extended":
+                        self._leases[handle] = now + self.visibility_timeout
+                    else:
+                        self._leases.pop(handle, None)
+                for entry in failed:
+                    if entry.get('SenderFault'):
+                        # eg. the receipt handle expired and the message was received again, so it's no longer ours
+                        self._leases.pop(pending[entry['Id']], None)
+            for entry in failed:
+                # Releasing a message already received again by another consumer is harmless
+                if entry.get('SenderFault') and counter != "released":
+                    self.log.warning("SqsReader: a message couldn't be %s (%s)", counter, entry['Code'])
+            pending = {entry['Id']: pending[entry['Id']] for entry in failed if not entry.get('SenderFault')}
+            if not pending:
+                return
+        self.log.warning("SqsReader: %d messages couldn't be %s after %d retries", len(pending), counter,
+                         self.max_retries)
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
@@ -1,79 +1,266 @@
-from typing import Iterable
-from itertools import islice
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
-import boto3
-from botocore.client import BaseClient
-from botocore.exceptions import ClientError, BotoCoreError
-
-from petal.src.logger import logger
+from petal.src.logger import RecordSampler, logger
+from petal.src.core.streams import drain
 from petal.src.core.operators.Writer import Writer
 
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+# SQS limits on a SendMessageBatch request
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+# Errors failing a whole request that are worth retrying, any other ClientError fails the write
+RETRYABLE_ERRORS = {"ThrottlingException", "Throttling", "RequestThrottled", "ServiceUnavailable", "InternalError",
+                    "InternalFailure", "KmsThrottled", "AWS.SimpleQueueService.KmsThrottled"}
+
+
+def get_queue_url(sqs_client: "BaseClient", queue_name: str) -> str:
+    """
+    Returns the specified SQS queue url if it exists.
+    Throws error if not.
+
+    :param sqs_client: boto3 client to access the AWS SDK
+    :param queue_name: Name of the SQS queue
+    :return: The url of the queue
+    """
+    # botocore takes longer to import than the rest of petal, so it's only imported once an SQS operator is created
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    try:
+        # Get the queue URL (this checks that it exists)
+        response = sqs_client.get_queue_url(QueueName=queue_name)
+        queue_url = response['QueueUrl']
+        if queue_url:
+            return queue_url
+        else:
+            raise ValueError("No queue URL")
+    except ClientError as e:
+        logger.error("ClientError: %s", e.response['Error']['Message'])
+        raise e
+    except BotoCoreError as e:
+        logger.error("BotoCoreError: %s", e)
+        raise e
+
 
 class SqsWriter(Writer):
-    def __init__(self, operator_id: str, queue_name: str, aws_region: str):
+    def __init__(self, operator_id: str, queue_name: str, aws_region: Optional[str] = None,
+                 max_in_flight: int = 8, batch_size: int = MAX_BATCH_ENTRIES, max_batch_bytes: int = MAX_BATCH_BYTES,
+                 max_retries: int = 5, backoff: float = 0.1, max_backoff: float = 10.0,
+                 sqs_client: Optional["BaseClient"] = None):
+        """
+        :param operator_id: Unique id of the operator
+        :param queue_name: Name of the SQS queue
+        :param aws_region: Region of the queue, used to create the boto3 client
+        :param max_in_flight: Number of SendMessageBatch requests sent concurrently
+        :param batch_size: Max number of messages per request, at most 10
+        :param max_batch_bytes: Max total size of the message bodies of a request, at most 256KB
+        :param max_retries: Number of times failed messages are re-sent before giving up on them
+        :param backoff: Delay before the first retry in seconds, doubled on every retry (with jitter)
+        :param max_backoff: Max delay between two retries in seconds
+        :param sqs_client: The SQS client to use instead of creating one, eg. a FakeSqsClient
+        """
         super().__init__(operator_id)
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        if not 1 <= batch_size <= MAX_BATCH_ENTRIES:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_ENTRIES}")
+        if not 1 <= max_batch_bytes <= MAX_BATCH_BYTES:
+            raise ValueError(f"max_batch_bytes must be between 1 and {MAX_BATCH_BYTES}")
         self.queue_name = queue_name
-        self.sqs_client = self.create_boto_client(aws_region)
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sqs_client = sqs_client if sqs_client is not None else self.create_boto_client(aws_region)
         self.queue_url = self.validate_queue_exists(queue_name)
+        # Messages that couldn't be sent during the last run, with the error code of their last attempt
+        self.failed: list[tuple[str, str]] = []
+        # Throughput and latency of the last run, see summary()
+        self.stats: dict = {}
+        self._stats_lock = threading.Lock()
 
-    def create_boto_client(self, aws_region: str) -> BaseClient:
+    def create_boto_client(self, aws_region: str) -> "BaseClient":
+        import boto3
         return boto3.client("sqs", aws_region)
 
     def validate_queue_exists(self, queue_name: str) -> str:
+        return get_queue_url(self.sqs_client, queue_name)
+
+    def pack_batches(self, messages: Iterable[str]) -> Iterator[list[str]]:
+        """
+        Lazily groups the messages into batches of at most `batch_size` messages and `max_batch_bytes` bytes.
+        Raises ValueError for a single message larger than `max_batch_bytes`.
         """
-        Returns the specified SQS queue url if it exists.
-        Throws error if not.
+        batch, batch_bytes = [], 0
+        for message in messages:
+            size = self._message_size(message)
+            if self._batch_full(batch, batch_bytes, size):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(message)
+            batch_bytes += size
+        if batch:
+            yield batch
 
-        :param sqs_client: boto3 client to access the AWS SDK
-        :param queue_name Name of the SQS queue
-        :return: True if the queue exists and is writable, False otherwise
+    def _message_size(self, message: str) -> int:
+        size = len(message.encode('utf-8'))
+        if size > self.max_batch_bytes:
+            raise ValueError(f"A message of {size} bytes exceeds the {self.max_batch_bytes} bytes SQS limit")
+        return size
+
+    def _batch_full(self, batch: list[str], batch_bytes: int, size: int) -> bool:
+        # Whether a message of `size` bytes must start a new batch
+        return bool(batch) and (len(batch) == self.batch_size or batch_bytes + size > self.max_batch_bytes)
+
+    def send_messages_to_queue(self, messages: Iterable[str]) -> None:
         """
-        try:
-            # Get the queue URL (this checks that it exists)
-            response = self.sqs_client.get_queue_url(QueueName=queue_name)
-            queue_url = response['QueueUrl']
-            if queue_url:
-                return queue_url
-            else:
-                raise ValueError("No queue URL")
-        except ClientError as e:
-            logger.error(f"ClientError: {e.response['Error']['Message']}")
-            raise e
-        except BotoCoreError as e:
-            logger.error(f"BotoCoreError: {str(e)}")
-            raise e
-
-    def send_messages_to_queue(self, messages: Iterable[str], batch_size: int = 10) -> None:
+        Sends the messages to the queue, with up to `max_in_flight` batch requests in flight at once.
+        Messages failing server-side are retried with exponential backoff, and the write fails with
+        a RuntimeError once all the other messages are sent if any message couldn't be.
+
+        :param messages: Stream of messages to send, consumed lazily
         """
-        Sends a list of messages to the specified SQS queue in batches of 10.
+        self._reset()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=self.operator_id) as pool:
+            in_flight = set()
+            try:
+                for batch in self.pack_batches(messages):
+                    if len(in_flight) >= self.max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    in_flight.add(pool.submit(self._send_batch, batch))
+                for future in in_flight:
+                    future.result()
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+        self._finish(started)
 
-        :param batch_size:
-        :param messages: List of messages to send
+    def _reset(self) -> None:
+        self.failed = []
+        self.stats = {"messages": 0, "requests": 0, "retries": 0, "latencies": []}
+
+    def _finish(self, started: float) -> None:
+        # Logs the summary of the run, and fails it if any message couldn't be sent
+        self.stats["elapsed"] = time.perf_counter() - started
+        summary = self.summary()
+        self.log.info("SqsWriter: sent %d messages to %s in %.2fs (%.0f messages/sec, %d requests, %d retries, "
+                      "p50 %.1fms, p99 %.1fms), %d failed", summary["sent"], self.queue_name, summary["elapsed"],
+                      summary["messages_per_sec"], summary["requests"], summary["retries"],
+                      summary["latency_p50"] * 1000, summary["latency_p99"] * 1000, summary["failed"])
+        if self.failed:
+            codes = sorted({code for _, code in self.failed})
+            raise RuntimeError(f"{len(self.failed)} messages couldn't be sent to {self.queue_name} ({', '.join(codes)}), "
+                               f"see {self.operator_id}.failed")
+
+    def summary(self) -> dict:
+        """
+        Throughput and request latency of the last run, sent counts the messages accepted by SQS.
         """
+        latencies = sorted(self.stats.get("latencies", []))
+        elapsed = self.stats.get("elapsed", 0.0)
+        sent = self.stats.get("messages", 0) - len(self.failed)
+
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "sent": sent,
+            "failed": len(self.failed),
+            "requests": self.stats.get("requests", 0),
+            "retries": self.stats.get("retries", 0),
+            "elapsed": elapsed,
+            "messages_per_sec": sent / elapsed if elapsed else 0.0,
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+        }
+
+    def _send_batch(self, messages: list[str]) -> None:
+        # Entry ids only need to be unique within a request
+        pending = {str(idx): message for idx, message in enumerate(messages)}
+        failed = []
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._delay(attempt))
+            errors = self._request(pending, retry=attempt > 0)
+            pending = self._settle(pending, errors, failed, last_attempt=attempt == self.max_retries)
+            if not pending:
+                break
+        self._record_batch(messages, failed)
+
+    @staticmethod
+    def _settle(pending: dict[str, str], errors: dict[str, tuple[str, bool]], failed: list[tuple[str, str]],
+                last_attempt: bool) -> dict[str, str]:
+        # Collects the messages failing for good into `failed`, returns the ones to retry
+        failed.extend((pending[entry_id], code) for entry_id, (code, retryable) in errors.items()
+                      if not retryable or last_attempt)
+        return {} if last_attempt else {entry_id: pending[entry_id] for entry_id, (_, retryable) in errors.items()
+                                        if retryable}
+
+    def _record_batch(self, messages: list[str], failed: list[tuple[str, str]]) -> None:
+        with self._stats_lock:
+            self.stats["messages"] += len(messages)
+            self.failed.extend(failed)
+
+    def _request(self, entries: dict[str, str], retry: bool) -> dict[str, tuple[str, bool]]:
+        """
+        Sends a single SendMessageBatch request, returns the error code of each failed entry by id,
+        and whether it's worth retrying.
+        """
+        started = time.perf_counter()
         try:
-            # Use iterator to avoid loading everything into memory
-            message_iter = iter(messages)
-            while True:
-                batch = list(islice(message_iter, batch_size))
-                if not batch:
-                    break
-
-                entries = [
-                    {
-                        'Id': str(idx),
-                        'MessageBody': msg
-                    } for idx, msg in enumerate(batch)
-                ]
-
-                self.sqs_client.send_message_batch(
-                    QueueUrl=self.queue_url,
-                    Entries=entries
-                )
-
-        except ClientError as e:
-            print(f"ClientError while sending messages: {e.response['Error']['Message']}")
-        except BotoCoreError as e:
-            print(f"BotoCoreError while sending messages: {str(e)}")
+            response = self.sqs_client.send_message_batch(QueueUrl=self.queue_url, Entries=self._entries(entries))
+        except Exception as e:
+            return self._request_failed(e, entries)
+        finally:
+            self._record_request(started, retry)
+        return self._failed_entries(response)
+
+    @staticmethod
+    def _entries(entries: dict[str, str]) -> list[dict]:
+        return [{'Id': entry_id, 'MessageBody': message} for entry_id, message in entries.items()]
+
+    def _request_failed(self, error: Exception, entries: dict[str, str]) -> dict[str, tuple[str, bool]]:
+        # Re-raises the errors that aren't worth retrying, otherwise fails every entry of the request
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        if isinstance(error, ClientError):
+            code = error.response['Error']['Code']
+            if code not in RETRYABLE_ERRORS:
+                raise error
+        elif isinstance(error, BotoCoreError):
+            code = type(error).__name__
+        else:
+            raise error
+        self.log.warning("SqsWriter: request to %s failed with %s, retrying", self.queue_name, code)
+        return {entry_id: (code, True) for entry_id in entries}
+
+    def _record_request(self, started: float, retry: bool) -> None:
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["retries"] += retry
+            self.stats["latencies"].append(time.perf_counter() - started)
+
+    @staticmethod
+    def _failed_entries(response: dict) -> dict[str, tuple[str, bool]]:
+        # Sender faults (eg. an invalid message) fail the same way every time
+        return {entry['Id']: (entry['Code'], not entry.get('SenderFault', False)) for entry in response.get('Failed', [])}
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter, so concurrent requests failing together don't retry together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
 
     def process(self, data: Iterable[str]) -> None:
         self.send_messages_to_queue(data)
@@ -84,10 +271,14 @@ class MockSqsWriter(Writer):
         super().__init__(operator_id)
         self.aws_region = aws_region
         self.queue_url = f"mock_url_for_{queue_name}"
-        logger.info(f"Mocking get_queue_url for queue:{queue_name}")
+        self.log.info("Mocking get_queue_url for queue:%s", queue_name)
 
     def process(self, data: Iterable[str]) -> None:
-        logger.info(f"Mocking enqueue to {self.queue_url}:")
+        self.log.info("Mocking enqueue to %s:", self.queue_url)
+        # Every enqueued item is logged at INFO level, sampled (see petal.src.logger.configure)
+        sample = RecordSampler(self.log, level=logging.INFO)
+        if not sample.enabled:
+            drain(data)
+            return
         for idx, item in enumerate(data):
-            clean_itm = item.strip('\n')
-            logger.info(f"{idx}) `{clean_itm}`")
+            sample(idx, "%d) `%s`", idx, item.strip('\n'))
@@ -1,7 +1,20 @@
-from typing import Iterable, Any
+import heapq
+from itertools import chain
+from collections.abc import Iterator
+from typing import Any, Callable, Iterable, Optional
 
+from petal.src.core.cache import callable_fingerprint
+from petal.src.core.ownership import own
+from petal.src.core.streams import interleave
 from petal.src.plugins.Joiner import Joiner
 
+# How the input streams are combined
+CONCATENATE = "concatenate"
+AS_AVAILABLE = "as_available"
+SORTED_MERGE = "sorted_merge"
+
+FAN_IN_MODES = (CONCATENATE, AS_AVAILABLE, SORTED_MERGE)
+
 
 # Takes in a list of streams and flattens them all into a single output stream
 def concatenate_inputs(*args: Iterable[Iterable[Any]]) -> Iterable[Any]:
@@ -11,5 +24,40 @@ def concatenate_inputs(*args: Iterable[Iterable[Any]]) -> Iterable[Any]:
 
 class StreamJoiner(Joiner):
 
-    def __init__(self, operator_id: str):
-        super().__init__(operator_id, concatenate_inputs)
+    def __init__(self, operator_id: str, fan_in: str = CONCATENATE, key: Optional[Callable[[Any], Any]] = None,
+                 buffer_size: int = 1024, **kwargs):
+        """
+        :param operator_id: Unique id of the operator
+        :param fan_in: "concatenate" outputs the inputs one after the other, in the order they were connected.
+            "as_available" consumes every input concurrently and outputs records as soon as any input has some,
+            so a slow input doesn't delay the others. "sorted_merge" merges inputs sorted by `key` into
+            a single sorted stream (a k-way merge on a heap), without sorting everything
+        :param key: Sort key of the sorted merge, defaults to the records themselves
+        :param buffer_size: Max number of records buffered by the as_available mode
+        """
+        super().__init__(operator_id, concatenate_inputs, **kwargs)
+        if fan_in not in FAN_IN_MODES:
+            raise ValueError(f"Unknown fan-in mode '{fan_in}', expected one of {FAN_IN_MODES}")
+        self.fan_in = fan_in
+        self.key = key
+        self.buffer_size = buffer_size
+
+    def cache_config(self) -> Optional[dict]:
+        if self.fan_in == AS_AVAILABLE:
+            # The output order depends on timing
+            return None
+        if self.fan_in == SORTED_MERGE:
+            fingerprint = callable_fingerprint(self.key) if self.key is not None else "identity"
+            return None if fingerprint is None else {"fan_in": self.fan_in, "key": fingerprint}
+        return super().cache_config()
+
+    def process(self, *data: Iterable[Iterable[Any]]) -> Iterable[Any]:
+        if self.fan_in == CONCATENATE:
+            return super().process(*data)
+        streams = [own(stream, self.data_ownership()) for stream in data]
+        if self.fan_in == SORTED_MERGE:
+            return heapq.merge(*streams, key=self.key)
+        if not any(isinstance(stream, Iterator) for stream in streams):
+            # Materialized inputs are all available already
+            return chain.from_iterable(streams)
+        return interleave(streams, self.buffer_size)
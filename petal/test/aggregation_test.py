@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from petal.src.core.aggregation import ApproxDistinct, Count, Max, Min, SlidingWindow, Sum, TumblingWindow
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.Aggregate import Aggregate
+from petal.src.plugins.GroupBy import GroupBy
+from petal.test.helpers import CollectSink, ListSource
+
+# (timestamp, ip, bytes)
+EVENTS = [(0, "a", 10), (5, "b", 20), (30, "a", 5), (59, "a", 1), (60, "b", 7), (61, "a", 3), (130, "a", 2)]
+
+
+def timestamp(event):
+    return event[0]
+
+
+def ip(event):
+    return event[1]
+
+
+def size(event):
+    return event[2]
+
+
+# -------------------------------
+# AGGREGATION TESTS
+# -------------------------------
+
+def test_group_by_key():
+    group_by = GroupBy("by_ip", ip, {"events": Count(), "bytes": Sum(size), "first": Min(timestamp),
+                                     "last": Max(timestamp)})
+    assert list(group_by.process(iter(EVENTS))) == [
+        {"key": "a", "events": 5, "bytes": 21, "first": 0, "last": 130},
+        {"key": "b", "events": 2, "bytes": 27, "first": 5, "last": 60},
+    ]
+
+
+def test_tumbling_windows_are_output_as_they_close():
+    group_by = GroupBy("per_minute", ip, {"events": Count()}, window=TumblingWindow(60), timestamp=timestamp)
+    output = group_by.process(iter(EVENTS))
+    assert next(output) == {"key": "a", "window_start": 0, "window_end": 60, "events": 3}
+    assert list(output) == [
+        {"key": "b", "window_start": 0, "window_end": 60, "events": 1},
+        {"key": "b", "window_start": 60, "window_end": 120, "events": 1},
+        {"key": "a", "window_start": 60, "window_end": 120, "events": 1},
+        {"key": "a", "window_start": 120, "window_end": 180, "events": 1},
+    ]
+
+
+def test_sliding_windows():
+    aggregate = Aggregate("total", {"bytes": Sum(size)}, window=SlidingWindow(60, 30), timestamp=timestamp)
+    windows = {(window["window_start"], window["window_end"]): window["bytes"]
+               for window in aggregate.process(iter(EVENTS))}
+    assert windows == {(-30, 30): 30, (0, 60): 36, (30, 90): 16, (60, 120): 10, (90, 150): 2, (120, 180): 2}
+
+
+def test_late_records_are_dropped_past_the_allowed_lateness():
+    events = [(0, "a", 1), (65, "a", 1), (50, "a", 1), (130, "a", 1), (10, "a", 1)]
+    group_by = GroupBy("late", ip, {"events": Count()}, window=TumblingWindow(60), timestamp=timestamp,
+                       allowed_lateness=30)
+    assert [window["events"] for window in group_by.process(iter(events))] == [2, 1, 1]
+    assert group_by.late_records == 1
+
+
+def test_late_records_are_left_out_of_closed_sliding_windows():
+    # The record at 40 arrives after [0, 60) closed but is still counted in [30, 90), the one at 10 is dropped
+    events = [(0, "a", 1), (85, "a", 1), (40, "a", 1), (10, "a", 1)]
+    aggregate = Aggregate("late", {"events": Count()}, window=SlidingWindow(60, 30), timestamp=timestamp)
+    windows = {window["window_start"]: window["events"] for window in aggregate.process(iter(events))}
+    assert windows == {-30: 1, 0: 1, 30: 2, 60: 1}
+    assert aggregate.late_records == 2
+
+
+def test_approx_distinct():
+    rng = random.Random(0)
+    values = [rng.randrange(10_000_000) for _ in range(50_000)]
+    (result,) = Aggregate("distinct", {"ips": ApproxDistinct()}).process(iter(values))
+    assert abs(result["ips"] - len(set(values))) / len(set(values)) < 0.05
+
+    small = next(Aggregate("distinct", {"ips": ApproxDistinct()}).process(iter("abcabcd")))
+    assert small["ips"] == 4
+
+
+def test_aggregation_in_a_pipeline():
+    with Pipeline("aggregate", mode="streaming") as dag:
+        per_minute = GroupBy("per_minute", ip, {"events": Count()}, window=TumblingWindow(60), timestamp=timestamp)
+        sink = CollectSink("sink")
+        ListSource("events", EVENTS) >> per_minute >> sink
+    dag.run()
+    assert sum(window["events"] for window in sink.records) == len(EVENTS)
+
+
+def test_windows_need_a_timestamp():
+    with pytest.raises(ValueError):
+        GroupBy("per_minute", ip, {"events": Count()}, window=TumblingWindow(60))
+    with pytest.raises(ValueError):
+        SlidingWindow(60, 25)
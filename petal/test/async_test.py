@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import pytest
+
+from petal.src.core.async_engine import SYNC_CHUNK_SIZE
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.operators.NonTerminalOperator import NonTerminalOperator
+from petal.src.core.operators.Reader import Reader
+from petal.src.core.operators.Writer import Writer
+from petal.src.plugins.Splitter import Splitter
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+
+class AsyncCounter(Reader):
+    def __init__(self, operator_id, n):
+        super().__init__(operator_id)
+        self.n = n
+        self.pulled = 0
+
+    async def process(self):
+        for i in range(self.n):
+            self.pulled += 1
+            yield i
+
+
+class AsyncIncrement(NonTerminalOperator):
+    async def process(self, data):
+        async for record in data:
+            yield record + 1
+
+
+class AsyncSlowWriter(Writer):
+    """Simulates a network write per record, all of them in flight at once."""
+
+    def __init__(self, operator_id):
+        super().__init__(operator_id)
+        self.records = []
+
+    async def process(self, data):
+        async def send(record):
+            await asyncio.sleep(0.1)
+            self.records.append(record)
+
+        await asyncio.gather(*[send(record) async for record in data])
+
+
+# -------------------------------
+# ASYNC ENGINE TESTS
+# -------------------------------
+
+def test_async_operators_end_to_end():
+    with Pipeline("async") as dag:
+        sink = AsyncSlowWriter("sink")
+        AsyncCounter("source", 50) >> AsyncIncrement("increment") >> sink
+
+    start = time.monotonic()
+    asyncio.run(dag.run_async())
+    # 50 writes of 0.1s each are all in flight concurrently
+    assert time.monotonic() - start < 1
+    assert sorted(sink.records) == list(range(1, 51))
+
+
+def test_sync_operators_are_bridged():
+    with Pipeline("mixed") as dag:
+        sink = CollectSink("sink")
+        AsyncCounter("source", 10) >> Mapper("double", lambda x: x * 2) >> AsyncIncrement("increment") >> sink
+
+    asyncio.run(dag.run_async())
+    assert sink.records == [x * 2 + 1 for x in range(10)]
+
+
+def test_async_matches_batch_on_diamond():
+    def build():
+        with Pipeline("diamond", buffer_size=2) as dag:
+            splitter = Splitter("splitter")
+            joiner = StreamJoiner("joiner")
+            sink = CollectSink("sink")
+            ListSource("source", range(20)) >> splitter
+            splitter >> Mapper("double", lambda x: x * 2) >> joiner
+            splitter >> Mapper("negate", lambda x: -x) >> joiner
+            joiner >> sink
+        return dag, sink
+
+    dag, async_sink = build()
+    asyncio.run(dag.run_async())
+    dag, batch_sink = build()
+    dag.run()
+    assert async_sink.records == batch_sink.records
+
+
+def test_async_backpressure():
+    class Stalled(CollectSink):
+        async def process(self, data):
+            await asyncio.sleep(0.2)
+            self.pulled_while_stalled = source.pulled
+            self.records = [record async for record in data]
+
+    with Pipeline("backpressure", buffer_size=5) as dag:
+        source = AsyncCounter("source", 1000)
+        sink = Stalled("sink")
+        source >> sink
+
+    asyncio.run(dag.run_async())
+    # The source stopped once the channel was full...
+    assert sink.pulled_while_stalled <= 5 + 1
+    # ...and resumed once the sink started reading
+    assert sink.records == list(range(1000))
+
+
+def test_sync_operators_are_bridged_in_chunks_with_backpressure():
+    class CountingSource(ListSource):
+        pulled = 0
+
+        def process(self):
+            for record in super().process():
+                CountingSource.pulled += 1
+                yield record
+
+    class Stalled(CollectSink):
+        async def process(self, data):
+            await asyncio.sleep(0.2)
+            self.pulled_while_stalled = CountingSource.pulled
+            self.records = [record async for record in data]
+
+    with Pipeline("chunks", buffer_size=5) as dag:
+        sink = Stalled("sink")
+        CountingSource("source", range(5000)) >> Mapper("double", lambda x: x * 2) >> sink
+
+    asyncio.run(dag.run_async())
+    # On top of the 2 channels, the source and the mapper hold at most a chunk of outputs each,
+    # and the mapper a chunk of inputs
+    assert sink.pulled_while_stalled <= 2 * 5 + 3 * SYNC_CHUNK_SIZE + 1
+    assert sink.records == [x * 2 for x in range(5000)]
+
+
+def test_async_propagates_errors():
+    class Exploding(NonTerminalOperator):
+        async def process(self, data):
+            async for record in data:
+                raise RuntimeError("boom")
+            yield
+
+    with Pipeline("errors") as dag:
+        AsyncCounter("source", 3) >> Exploding("explode") >> CollectSink("sink")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(dag.run_async())
+
+
+def test_run_rejects_async_operators():
+    with Pipeline("sync") as dag:
+        AsyncCounter("source", 3) >> CollectSink("sink")
+
+    with pytest.raises(ValueError, match="run_async"):
+        dag.run()
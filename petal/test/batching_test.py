@@ -0,0 +1,77 @@
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.utils import chunked, flatten
+from petal.src.plugins.FileWriter import FileWriter
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.Splitter import Splitter
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+
+# -------------------------------
+# BATCH PROTOCOL TESTS
+# -------------------------------
+
+def test_chunked_and_flatten_round_trip():
+    assert list(flatten(chunked(range(10), 4))) == list(range(10))
+
+
+def test_mapper_is_batch_native():
+    mapper = Mapper("double", lambda x: x * 2)
+    assert list(mapper.process_batches([[1, 2], [3]], batch_size=2)) == [[2, 4], [6]]
+
+
+def test_filter_drops_empty_batches():
+    evens = Filter("evens", lambda x: x % 2 == 0)
+    assert list(evens.process_batches([[1, 3], [2, 5]], batch_size=2)) == [[2]]
+
+
+def test_record_at_a_time_operator_is_adapted():
+    # CollectSink only implements process(), and is fed through the default adapter
+    sink = CollectSink("sink")
+    assert sink.process_batches([[1, 2], [3]], batch_size=2) is None
+    assert sink.records == [1, 2, 3]
+
+
+def test_vectorized_functions_receive_whole_batches():
+    seen = []
+
+    def total_per_batch(batch):
+        seen.append(len(batch))
+        return [sum(batch)] * len(batch)
+
+    mapper = Mapper("vectorized", total_per_batch, vectorized=True, chunk_size=3)
+    assert list(mapper.process(range(5))) == [3, 3, 3, 7, 7]
+    assert seen == [3, 2]
+
+    evens = Filter("evens", lambda batch: [x % 2 == 0 for x in batch], vectorized=True)
+    assert list(evens.process(range(5))) == [0, 2, 4]
+
+
+# -------------------------------
+# BATCHED PIPELINE TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded"])
+def test_batched_pipeline_matches_unbatched(mode, tmp_path):
+    lines = [f"{'PING' if i % 3 == 0 else 'HELO'} {i}\n" for i in range(100)]
+
+    def build(batch_size, out_file):
+        with Pipeline("batched", mode=mode, batch_size=batch_size) as dag:
+            splitter = Splitter("splitter")
+            joiner = StreamJoiner("joiner")
+            sink = CollectSink("sink")
+            ListSource("source", lines) >> RegexFilter("pings", "PING") >> splitter
+            splitter >> Mapper("upper", str.lower) >> joiner
+            splitter >> FileWriter("writer", str(out_file))
+            joiner >> sink
+        dag.run()
+        return sink.records
+
+    unbatched = build(None, tmp_path / "unbatched.txt")
+    batched = build(7, tmp_path / "batched.txt")
+    assert batched == unbatched
+    assert (tmp_path / "batched.txt").read_text() == (tmp_path / "unbatched.txt").read_text()
@@ -0,0 +1,39 @@
+import json
+
+from petal.src import bench
+
+
+# -------------------------------
+# BENCH TESTS
+# -------------------------------
+
+def test_generated_records_have_the_requested_width(tmp_path):
+    path = tmp_path / "input.txt"
+    bench.generate_input(str(path), 50, record_width=64)
+    lines = path.read_text().splitlines()
+    assert len(lines) == 50
+    assert all(len(line) == 64 for line in lines)
+
+
+def test_suite_runs_every_shape_and_mode(tmp_path):
+    suite = bench.run_suite(records=300, repeat=1, work_dir=str(tmp_path))
+    cases = {(result["shape"], result["mode"]) for result in suite["results"]}
+    assert cases == {(shape, mode) for shape in bench.SHAPES for mode in bench.BENCH_MODES}
+    for result in suite["results"]:
+        assert result["records_per_sec"] > 0
+        assert result["first_output_latency"] is not None and result["peak_rss"] > 0
+
+    path = tmp_path / "results.json"
+    bench.save(suite, str(path))
+    assert json.loads(path.read_text())["parameters"]["records"] == 300
+
+
+def test_compare_against_a_baseline():
+    def suite(records_per_sec):
+        return {"results": [{"shape": "linear", "mode": "batch", "batch_size": None,
+                             "records_per_sec": records_per_sec, "first_output_latency": 0.1, "peak_rss": 1}]}
+
+    (change,) = bench.compare(suite(150.0), suite(100.0))
+    assert change["records_per_sec"] == 0.5
+    assert change["first_output_latency"] == 0.0
+    assert "+50.0% records/sec" in bench.format_results(suite(150.0), [change])
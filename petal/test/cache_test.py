@@ -0,0 +1,159 @@
+import argparse
+import os
+
+import pytest
+
+from petal.src.cli import cache_clear, cache_info
+from petal.src.core.cache import MISS, OperatorCache, cache_key, callable_fingerprint
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FileReader import FileReader
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import RegexMapper
+from petal.test.helpers import CollectSink
+
+LINES = [f"{'PING' if i % 2 else 'HELO'} from 10.0.0.{i}\n" for i in range(20)]
+
+
+class CountingFilter(RegexFilter):
+    """A RegexFilter counting how many times it was executed."""
+    calls = 0
+
+    def process(self, data):
+        CountingFilter.calls += 1
+        return super().process(data)
+
+
+def last_octet(ip):
+    return int(ip.split(".")[-1])
+
+
+def build(file_path, cache, pattern="PING", mode="batch"):
+    with Pipeline("cached", mode=mode, cache=cache) as dag:
+        sink = CollectSink("sink")
+        (FileReader("reader", file_path) >> CountingFilter("pings", pattern)
+         >> RegexMapper("ips", r"(?:[0-9]{1,3}\.){3}[0-9]{1,3}") >> Mapper("octets", last_octet) >> sink)
+    return dag, sink
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("".join(LINES))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    CountingFilter.calls = 0
+
+
+# -------------------------------
+# CACHE TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode", ["batch", "threaded"])
+def test_second_run_is_served_from_cache(tmp_path, input_file, mode):
+    cache = OperatorCache(str(tmp_path / "cache"))
+    dag, first = build(input_file, cache, mode=mode)
+    dag.run()
+    assert CountingFilter.calls == 1
+
+    dag, second = build(input_file, cache, mode=mode)
+    dag.run()
+    # Only the sink runs, reading the cached output of the last operator
+    assert CountingFilter.calls == 1
+    assert second.records == first.records == list(range(1, 20, 2))
+
+
+def test_changed_configuration_invalidates_downstream(tmp_path, input_file):
+    cache = OperatorCache(str(tmp_path / "cache"))
+    build(input_file, cache)[0].run()
+    dag, sink = build(input_file, cache, pattern="HELO")
+    dag.run()
+    assert CountingFilter.calls == 2
+    assert sink.records == list(range(0, 20, 2))
+
+
+def test_changed_file_invalidates_cache(tmp_path, input_file):
+    cache = OperatorCache(str(tmp_path / "cache"))
+    build(input_file, cache)[0].run()
+    with open(input_file, 'a') as f:
+        f.write("PING from 10.0.0.42\n")
+    dag, sink = build(input_file, cache)
+    dag.run()
+    assert CountingFilter.calls == 2
+    assert sink.records[-1] == 42
+
+
+def test_uncacheable_operators_always_run():
+    assert callable_fingerprint(last_octet) is not None
+    assert callable_fingerprint(lambda x: x) is not None
+    offset = 1
+    assert callable_fingerprint(lambda x: x + offset) is None
+    assert callable_fingerprint(len) is None
+    with Pipeline("keys"):
+        reader = FileReader("missing", "does_not_exist.txt")
+        mapper = Mapper("closure", lambda x: x + offset)
+    assert cache_key(reader, []) is None
+    assert cache_key(mapper, ["some key"]) is None
+
+
+def test_default_arguments_are_part_of_the_fingerprint():
+    def scale(x, factor=2):
+        return x * factor
+    fingerprint = callable_fingerprint(scale)
+    scale.__defaults__ = (3,)
+    assert callable_fingerprint(scale) != fingerprint
+
+    def keyword_only(x, *, factor=2):
+        return x * factor
+    fingerprint = callable_fingerprint(keyword_only)
+    keyword_only.__kwdefaults__ = {"factor": 3}
+    assert callable_fingerprint(keyword_only) != fingerprint
+
+    def sentinel(x, missing=object()):
+        return x
+    assert callable_fingerprint(sentinel) is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = OperatorCache(str(tmp_path / "cache"), max_bytes=250)
+    for idx, key in enumerate(["a", "b", "c"]):
+        cache.put(key, "x" * 100, f"op_{key}")
+        # Make the last use order explicit, file mtimes may be too coarse
+        os.utime(os.path.join(cache.directory, f"{key}.pkl"), (idx, idx))
+        if key == "b":
+            cache.get("a")
+            os.utime(os.path.join(cache.directory, "a.pkl"), (10, 10))
+    assert cache.get("b") is MISS
+    assert cache.get("a") == "x" * 100
+    assert cache.size() <= 250
+
+
+def test_entries_and_clear(tmp_path, input_file):
+    cache = OperatorCache(str(tmp_path / "cache"))
+    build(input_file, cache)[0].run()
+    assert {entry["operator_id"] for entry in cache.entries()} == {"reader", "pings", "ips", "octets"}
+    assert cache.clear() == 4
+    assert cache.entries() == []
+
+
+def test_cache_not_supported_in_streaming(tmp_path):
+    with pytest.raises(ValueError, match="streaming"):
+        Pipeline("streaming", mode="streaming", cache=OperatorCache(str(tmp_path / "cache")))
+
+
+def test_cache_directory_is_created_on_first_write(tmp_path, capsys):
+    directory = str(tmp_path / "cache")
+    cache_info(argparse.Namespace(dir=directory))
+    cache_clear(argparse.Namespace(dir=directory))
+    assert capsys.readouterr().out == f"No cache in {directory}\nRemoved 0 entries from {directory}\n"
+    cache = OperatorCache(directory)
+    assert not os.path.exists(directory)
+    assert cache.get("a") is MISS and cache.entries() == []
+
+    cache.put("a", "value", "op_a")
+    assert cache.get("a") == "value"
+    cache_info(argparse.Namespace(dir=directory))
+    assert capsys.readouterr().out.endswith(f"1 entries, {cache.size()} bytes in {directory}\n")
@@ -0,0 +1,111 @@
+import pickle
+
+import pytest
+
+from petal.src.core.cluster import LocalCluster
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FileReader import FileReader
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+LINES = [f"{'PING' if i % 3 else 'HELO'} {i}" for i in range(3000)]
+
+
+def shout(line: str) -> str:
+    return line.upper() + "!"
+
+
+def fail_on_helo(line: str) -> str:
+    if line.startswith("HELO 9"):
+        raise ValueError(f"bad line: {line}")
+    return line
+
+
+@pytest.fixture(scope="module")
+def cluster():
+    with LocalCluster(workers=2, chunk_size=256) as cluster:
+        yield cluster
+
+
+def build(cluster, target="cluster", mode="batch", batch_size=None, optimize=False):
+    with Pipeline("cluster", mode=mode, batch_size=batch_size, optimize=optimize, executors={"cluster": cluster}) as dag:
+        source = ListSource("source", LINES)
+        joiner = StreamJoiner("joiner").run_on(target)
+        sink = CollectSink("sink")
+        source >> RegexFilter("pings", "PING").run_on(target) >> Mapper("shout", shout).run_on(target) >> joiner
+        source >> RegexFilter("helos", "HELO").run_on(target) >> joiner
+        joiner >> sink
+    return dag, sink
+
+
+# -------------------------------
+# LOCAL CLUSTER TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode, batch_size", [("batch", None), ("streaming", None), ("threaded", None),
+                                              ("batch", 100), ("streaming", 100)])
+def test_cluster_output_matches_local(cluster, mode, batch_size):
+    dag, remote = build(cluster, "cluster", mode, batch_size)
+    dag.run()
+    dag, local = build(cluster, "local", mode, batch_size)
+    dag.run()
+    assert remote.records == local.records and len(remote.records) == len(LINES)
+
+
+def test_operators_are_spread_over_workers(cluster):
+    dag, _ = build(cluster)
+    dag.run()
+    load = cluster.load()
+    assert sorted(op_id for worker in load for op_id in worker["operators"]) == ["helos", "joiner", "pings", "shout"]
+    assert all(len(worker["operators"]) == 2 and worker["runs"] > 0 for worker in load)
+    assert sum(worker["records_in"] for worker in load) >= len(LINES) * 2
+
+
+def test_operator_errors_are_raised_on_the_coordinator(cluster):
+    with Pipeline("failing", mode="streaming", executors={"cluster": cluster}) as dag:
+        ListSource("source", LINES) >> Mapper("fail", fail_on_helo).run_on("cluster") >> CollectSink("sink")
+
+    with pytest.raises(ValueError, match="bad line: HELO 9"):
+        dag.run()
+
+
+def test_validation(cluster, tmp_path):
+    with Pipeline("unknown") as dag:
+        ListSource("source", LINES) >> Mapper("shout", shout).run_on("cluster") >> CollectSink("sink")
+    with pytest.raises(ValueError, match="unknown execution target"):
+        dag.run()
+
+    with Pipeline("lambda", executors={"cluster": cluster}) as dag:
+        ListSource("source", LINES) >> Mapper("lambda", lambda line: line).run_on("cluster") >> CollectSink("sink")
+    with pytest.raises(ValueError, match="picklable"):
+        dag.run()
+
+    with Pipeline("reader", executors={"cluster": cluster}) as dag:
+        FileReader("reader", file_path=str(tmp_path / "lines.txt")).run_on("cluster") >> CollectSink("sink")
+    with pytest.raises(ValueError, match="commit"):
+        dag.run()
+
+
+def test_chains_are_only_fused_on_the_same_target(cluster):
+    with Pipeline("fusing", optimize=True, executors={"cluster": cluster}) as dag:
+        sink = CollectSink("sink")
+        (ListSource("source", LINES) >> RegexFilter("pings", "PING").run_on("cluster")
+         >> Mapper("shout", shout).run_on("cluster") >> Mapper("local_shout", shout) >> sink)
+
+    assert dag.plan().fused == {"pings+shout": ["pings", "shout"]}
+    assert "[pings+shout] FusedOperator <- source (fused: pings >> shout) (on: cluster)" in dag.explain()
+    dag.run()
+    assert sink.records[0] == "PING 1!!"
+
+
+def test_operators_are_pickled_without_the_graph():
+    with Pipeline("pickled", ownership="immutable") as dag:
+        mapper = Mapper("shout", shout)
+        ListSource("source", LINES) >> mapper >> CollectSink("sink")
+
+    copy = pickle.loads(pickle.dumps(mapper))
+    assert copy.upstream == [] and copy.downstream == []
+    assert copy.data_ownership() == "immutable"
+    assert mapper.upstream and mapper.pipeline is dag
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+
+import pytest
+
+from petal.src.core.operators.Writer import Writer
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FileReader import FileReader, split_byte_ranges
+from petal.test.helpers import CollectSink
+
+CONTENT = "".join(f"line {i} {'x' * (i % 7)}\n" for i in range(200)) + "no trailing newline"
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text(CONTENT)
+    return str(path)
+
+
+# -------------------------------
+# FILE READER TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("read_mode", ["lines", "chunked", "mmap"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_read_modes_match_line_iteration(input_file, read_mode, chunk_size):
+    reader = FileReader("reader", input_file, read_mode=read_mode, chunk_size=chunk_size)
+    assert list(reader.process()) == CONTENT.splitlines(keepends=True)
+
+
+def test_read_modes_keep_line_endings(tmp_path):
+    path = tmp_path / "crlf.txt"
+    path.write_bytes("caf\u00e9 1\r\nline\r2\r\n\r\nno trailing newline\r".encode("latin-1"))
+    expected = ["caf\u00e9 1\r\n", "line\r2\r\n", "\r\n", "no trailing newline\r"]
+    for read_mode in ["lines", "chunked", "mmap"]:
+        reader = FileReader("reader", str(path), read_mode=read_mode, chunk_size=5, encoding="latin-1")
+        assert list(reader.process()) == expected, read_mode
+
+
+def test_batches_respect_batch_size(input_file):
+    reader = FileReader("reader", input_file, read_mode="chunked", chunk_size=256)
+    batches = list(reader.process_batches(batch_size=10))
+    assert all(len(batch) <= 10 for batch in batches)
+    assert [line for batch in batches for line in batch] == CONTENT.splitlines(keepends=True)
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+    assert list(FileReader("reader", str(path), read_mode="mmap").process()) == []
+    assert split_byte_ranges(str(path), 4) == [(0, 0)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 8, 1000])
+def test_split_byte_ranges_are_newline_aligned(input_file, n):
+    ranges = split_byte_ranges(input_file, n)
+    assert len(ranges) <= n
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(CONTENT)
+    data = CONTENT.encode()
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert data[end - 1:end] == b"\n"
+
+
+@pytest.mark.parametrize("read_mode", ["chunked", "mmap"])
+def test_split_readers_cover_the_file(input_file, read_mode):
+    readers = FileReader.split("reader", input_file, 4, read_mode=read_mode, chunk_size=50)
+    assert [reader.operator_id for reader in readers] == ["reader_0", "reader_1", "reader_2", "reader_3"]
+    lines = [line for reader in readers for line in reader.process()]
+    assert lines == CONTENT.splitlines(keepends=True)
+
+
+def test_missing_file():
+    with pytest.raises(FileNotFoundError):
+        list(FileReader("reader", "/no/such/file", read_mode="chunked").process())
+
+
+def test_unknown_read_mode(input_file):
+    with pytest.raises(ValueError, match="read mode"):
+        FileReader("reader", input_file, read_mode="telepathy")
+
+
+# -------------------------------
+# CHECKPOINT / FOLLOW TESTS
+# -------------------------------
+
+class FailingSink(Writer):
+    def process(self, data):
+        list(data)
+        raise RuntimeError("sink failed")
+
+
+def run_checkpointed(file_path, checkpoint, mode="batch", sink_class=CollectSink):
+    with Pipeline("tail", mode=mode) as dag:
+        sink = sink_class("sink")
+        FileReader("reader", file_path, checkpoint=checkpoint) >> sink
+    dag.run()
+    return getattr(sink, "records", None)
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded"])
+def test_checkpoint_reads_only_new_lines(tmp_path, mode):
+    path, checkpoint = tmp_path / "log.txt", str(tmp_path / "log.checkpoint")
+    path.write_text("a\nb\npartial")
+    assert run_checkpointed(str(path), checkpoint, mode) == ["a\n", "b\n"]
+    with open(path, 'a') as f:
+        f.write(" line\nc\n")
+    assert run_checkpointed(str(path), checkpoint, mode) == ["partial line\n", "c\n"]
+    assert run_checkpointed(str(path), checkpoint, mode) == []
+
+
+def test_failed_run_does_not_commit(tmp_path):
+    path, checkpoint = tmp_path / "log.txt", str(tmp_path / "log.checkpoint")
+    path.write_text("a\nb\n")
+    with pytest.raises(RuntimeError):
+        run_checkpointed(str(path), checkpoint, sink_class=FailingSink)
+    assert not os.path.exists(checkpoint)
+    assert run_checkpointed(str(path), checkpoint) == ["a\n", "b\n"]
+
+
+def test_checkpoint_after_truncation_and_rotation(tmp_path):
+    path, checkpoint = tmp_path / "log.txt", str(tmp_path / "log.checkpoint")
+    path.write_text("a\nb\n")
+    run_checkpointed(str(path), checkpoint)
+    path.write_text("c\n")
+    assert run_checkpointed(str(path), checkpoint) == ["c\n"]
+    os.rename(path, tmp_path / "log.txt.1")
+    path.write_text("d\ne\n")
+    assert run_checkpointed(str(path), checkpoint) == ["d\n", "e\n"]
+
+
+def test_follow_tails_a_growing_rotated_file(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text("a\n")
+
+    def write():
+        time.sleep(0.05)
+        with open(path, 'a') as f:
+            f.write("b\n")
+        time.sleep(0.05)
+        os.rename(path, tmp_path / "log.txt.1")
+        path.write_text("c\n")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    reader = FileReader("reader", str(path), follow=True, poll_interval=0.01, idle_timeout=0.5)
+    assert list(reader.process()) == ["a\n", "b\n", "c\n"]
+    writer.join()
+
+
+def test_follow_keeps_the_unterminated_last_line_of_a_rotated_file(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text("a\nb")
+
+    def rotate():
+        time.sleep(0.05)
+        os.rename(path, tmp_path / "log.txt.1")
+        path.write_text("c\n")
+
+    writer = threading.Thread(target=rotate)
+    writer.start()
+    reader = FileReader("reader", str(path), follow=True, poll_interval=0.01, idle_timeout=0.5)
+    assert list(reader.process()) == ["a\n", "b", "c\n"]
+    writer.join()
+
+
+def test_checkpoint_rejects_byte_range(input_file, tmp_path):
+    with pytest.raises(ValueError):
+        FileReader("reader", input_file, checkpoint=str(tmp_path / "checkpoint"), byte_range=(0, 10))
+
+
+def test_following_with_a_checkpoint_needs_an_idle_timeout(input_file, tmp_path):
+    with pytest.raises(ValueError, match="idle_timeout"):
+        FileReader("reader", input_file, checkpoint=str(tmp_path / "checkpoint"), follow=True)
+    FileReader("reader", input_file, checkpoint=str(tmp_path / "checkpoint"), follow=True, idle_timeout=1)
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from petal.src.plugins.FileWriter import FileWriter
+
+LINES = [f"line {i}\n" for i in range(10)]
+
+
+def failing_stream(lines, fail_after):
+    for idx, line in enumerate(lines):
+        if idx == fail_after:
+            raise RuntimeError("boom")
+        yield line
+
+
+# -------------------------------
+# FILE WRITER TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_write(tmp_path, atomic):
+    path = tmp_path / "out.txt"
+    writer = FileWriter("writer", str(path), atomic=atomic, buffer_size=1 << 16)
+    writer.process(iter(LINES))
+    assert path.read_text() == "".join(LINES)
+    assert writer.written_files == [str(path)]
+
+
+def test_batched_write(tmp_path):
+    path = tmp_path / "out.txt"
+    FileWriter("writer", str(path)).process_batches([LINES[:4], LINES[4:]], batch_size=4)
+    assert path.read_text() == "".join(LINES)
+
+
+def test_atomic_write_keeps_previous_file_on_failure(tmp_path):
+    path = tmp_path / "out.txt"
+    path.write_text("previous run\n")
+    writer = FileWriter("writer", str(path), atomic=True)
+    with pytest.raises(RuntimeError, match="boom"):
+        writer.process(failing_stream(LINES, fail_after=5))
+    assert path.read_text() == "previous run\n"
+    # No temporary file is left behind
+    assert os.listdir(tmp_path) == ["out.txt"]
+
+
+def test_atomic_write_has_regular_permissions(tmp_path):
+    path = tmp_path / "out.txt"
+    FileWriter("writer", str(path), atomic=True).process(LINES)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_append(tmp_path):
+    path = tmp_path / "out.txt"
+    path.write_text("first\n")
+    FileWriter("writer", str(path), append=True).process(["second\n"])
+    assert path.read_text() == "first\nsecond\n"
+
+
+def test_rotation_by_record_count(tmp_path):
+    writer = FileWriter("writer", str(tmp_path / "out.txt"), max_records=4)
+    writer.process(LINES)
+    assert writer.written_files == [str(tmp_path / f"out.0000{idx}.txt") for idx in range(3)]
+    assert [len(open(path).readlines()) for path in writer.written_files] == [4, 4, 2]
+
+
+def test_rotation_by_size(tmp_path):
+    writer = FileWriter("writer", str(tmp_path / "out.txt"), max_bytes=20, atomic=True)
+    writer.process_batches([LINES], batch_size=10)
+    # Each line is 7 bytes, so 2 fit in 20 bytes
+    assert len(writer.written_files) == 5
+    assert all(os.path.getsize(path) <= 20 for path in writer.written_files)
+    assert "".join(open(path).read() for path in writer.written_files) == "".join(LINES)
+
+
+def test_rotation_appends_to_last_part(tmp_path):
+    FileWriter("writer", str(tmp_path / "out.txt"), max_records=4).process(LINES[:6])
+    writer = FileWriter("writer", str(tmp_path / "out.txt"), max_records=4, append=True)
+    writer.process(LINES[6:])
+    assert writer.written_files == [str(tmp_path / "out.00001.txt"), str(tmp_path / "out.00002.txt")]
+    assert (tmp_path / "out.00001.txt").read_text() == "".join(LINES[4:8])
+    assert (tmp_path / "out.00002.txt").read_text() == "".join(LINES[8:])
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_rotation_removes_stale_parts(tmp_path, atomic):
+    (tmp_path / "out.notes.txt").write_text("not a part\n")
+    FileWriter("writer", str(tmp_path / "out.txt"), max_records=2, atomic=atomic).process(LINES)
+    writer = FileWriter("writer", str(tmp_path / "out.txt"), max_records=2, atomic=atomic)
+    writer.process(LINES[:3])
+    assert sorted(os.listdir(tmp_path)) == ["out.00000.txt", "out.00001.txt", "out.notes.txt"]
+    assert "".join(open(path).read() for path in writer.written_files) == "".join(LINES[:3])
+
+
+def test_atomic_append_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="atomic"):
+        FileWriter("writer", str(tmp_path / "out.txt"), atomic=True, append=True)
@@ -0,0 +1,30 @@
+from typing import Any, Iterable
+
+from petal.src.core.operators.Reader import Reader
+from petal.src.core.operators.Writer import Writer
+
+
+class ListSource(Reader):
+    """Yields the given records, counting how many have been pulled so far."""
+
+    def __init__(self, operator_id: str, records: Iterable[Any]):
+        super().__init__(operator_id)
+        self.records = records
+        self.pulled = 0
+
+    def process(self) -> Iterable[Any]:
+        for record in self.records:
+            self.pulled += 1
+            yield record
+
+
+class CollectSink(Writer):
+    """Collects every record it receives into `self.records`."""
+
+    def __init__(self, operator_id: str):
+        super().__init__(operator_id)
+        self.records = []
+
+    def process(self, data: Iterable[Any]) -> None:
+        for record in data:
+            self.records.append(record)
@@ -0,0 +1,96 @@
+import random
+from collections import Counter
+
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.HashJoiner import HashJoiner
+from petal.src.plugins.SortMergeJoiner import SortMergeJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+JOIN_TYPES = ["inner", "left", "right", "outer"]
+
+
+def key(record):
+    return record[0]
+
+
+def nested_loop_join(left, right, how):
+    output = [(l, r) for l in left for r in right if key(l) == key(r)]
+    if how in ("left", "outer"):
+        output += [(l, None) for l in left if not any(key(l) == key(r) for r in right)]
+    if how in ("right", "outer"):
+        output += [(None, r) for r in right if not any(key(l) == key(r) for l in left)]
+    return Counter(output)
+
+
+@pytest.fixture
+def inputs():
+    rng = random.Random(0)
+    left = sorted((rng.randrange(50), f"l{i}") for i in range(200))
+    right = sorted((rng.randrange(25, 75), f"r{i}") for i in range(100))
+    return left, right
+
+
+# -------------------------------
+# JOIN TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("how", JOIN_TYPES)
+@pytest.mark.parametrize("make_joiner", [
+    lambda how: HashJoiner("join", key, how=how),
+    lambda how: HashJoiner("join", key, how=how, build="left"),
+    lambda how: HashJoiner("join", key, how=how, memory_budget=2000, partitions=4),
+    lambda how: SortMergeJoiner("join", key, how=how),
+])
+def test_joins_match_a_nested_loop_join(inputs, how, make_joiner):
+    left, right = inputs
+    joined = make_joiner(how).process(iter(left), iter(right))
+    assert Counter(joined) == nested_loop_join(left, right, how)
+
+
+def test_hash_join_spills_to_disk(inputs, tmp_path):
+    left, right = inputs
+    joiner = HashJoiner("join", key, how="outer", memory_budget=2000, partitions=4, spill_dir=str(tmp_path))
+    joined = joiner.process(iter(left), iter(right))
+    output = [next(joined)]
+    # One file per partition of each side, deleted once joined
+    assert len(list(tmp_path.iterdir())) == 8
+    output.extend(joined)
+    assert Counter(output) == nested_loop_join(left, right, "outer")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sort_merge_join_streams_in_key_order():
+    left = iter([(1, "a"), (2, "b"), (2, "c"), (4, "d")])
+    right = iter([(2, "x"), (3, "y"), (4, "z")])
+    joined = SortMergeJoiner("join", key, how="outer", merge_func=lambda l, r: (l and l[1], r and r[1]))
+    assert list(joined.process(left, right)) == [("a", None), ("b", "x"), ("c", "x"), (None, "y"), ("d", "z")]
+
+
+def test_sort_merge_join_rejects_unsorted_input():
+    with pytest.raises(ValueError, match="right input isn't sorted"):
+        list(SortMergeJoiner("join", key).process([(1, "a")], [(2, "x"), (1, "y")]))
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming"])
+def test_join_in_a_pipeline(mode):
+    with Pipeline("join", mode=mode) as dag:
+        ips = ListSource("ips", ["10.0.0.1 PING", "10.0.0.2 HELO", "10.0.0.3 PING"])
+        hosts = ListSource("hosts", ["10.0.0.1 web", "10.0.0.3 db"])
+        joiner = HashJoiner("join", lambda line: line.split()[0], how="left",
+                            merge_func=lambda event, host: f"{event} {host.split()[1] if host else '?'}")
+        sink = CollectSink("sink")
+        ips >> joiner
+        hosts >> joiner
+        joiner >> sink
+    dag.run()
+    assert sink.records == ["10.0.0.1 PING web", "10.0.0.2 HELO ?", "10.0.0.3 PING db"]
+
+
+def test_join_takes_two_inputs():
+    with Pipeline("join") as dag:
+        joiner = HashJoiner("join", key)
+        ListSource("only", []) >> joiner >> CollectSink("sink")
+    with pytest.raises(ValueError, match="exactly 2 inputs"):
+        dag.run()
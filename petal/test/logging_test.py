@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+
+from petal.src import logger as petal_logging
+from petal.src.logger import RecordSampler, configure, logger, operator_logger, preview, quiet, set_operator_level
+from petal.src.plugins.FileReader import FileReader
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    level = logger.level
+    yield
+    configure(level=level, sample_every=1, preview_records=3, preview_chars=80)
+    for operator_id in ("reader", "other"):
+        set_operator_level(operator_id, logging.NOTSET)
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(100)))
+    return str(path)
+
+
+def line_messages(caplog):
+    return [record for record in caplog.records if "reading line" in record.getMessage()]
+
+
+# -------------------------------
+# LOGGING TESTS
+# -------------------------------
+
+def test_preview_is_truncated():
+    assert preview(list(range(1000))) == "[0, 1, 2, ... (1000 records)]"
+    assert preview(["x" * 200]) == f"['{'x' * 79}...]"
+    assert preview([[1, 2], None]) == "[[1, 2], None]"
+    assert preview(iter([])) == "<list_iterator>"
+
+
+def test_per_record_logging_is_sampled(input_file, caplog):
+    configure(level=logging.DEBUG, sample_every=10)
+    with caplog.at_level(logging.DEBUG):
+        assert len(list(FileReader("reader", input_file).process())) == 100
+    assert len(line_messages(caplog)) == 10
+
+
+def test_per_operator_levels(input_file, caplog):
+    set_operator_level("reader", logging.DEBUG)
+    with caplog.at_level(logging.DEBUG):
+        list(FileReader("reader", input_file).process())
+        list(FileReader("other", input_file).process())
+    assert {record.name for record in line_messages(caplog)} == {"petal.reader"}
+
+
+def test_quiet_mode_does_no_per_record_work(input_file, caplog):
+    quiet()
+    assert not RecordSampler(operator_logger("reader")).enabled
+    with caplog.at_level(logging.DEBUG):
+        assert len(list(FileReader("reader", input_file).process())) == 100
+    assert not [record for record in caplog.records if record.name.startswith("petal")]
+
+
+def test_invalid_sampling():
+    with pytest.raises(ValueError):
+        petal_logging.configure(sample_every=0)
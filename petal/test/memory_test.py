@@ -0,0 +1,84 @@
+import weakref
+
+import pytest
+
+from petal.src.core.memory import OutputStore, PeakMemoryMonitor
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.operators.Reader import Reader
+from petal.src.core.pipeline import Pipeline
+from petal.test.helpers import CollectSink
+
+
+class Records(list):
+    """A list that can be weakly referenced."""
+
+
+class RecordsSource(Reader):
+    def __init__(self, operator_id, records):
+        super().__init__(operator_id)
+        self.records = records
+        self.output = None
+
+    def process(self):
+        output = Records(self.records)
+        self.output = weakref.ref(output)
+        return output
+
+
+class ReleaseCheckSink(CollectSink):
+    """Records whether the source's output was already released when it ran."""
+
+    def __init__(self, operator_id, source):
+        super().__init__(operator_id)
+        self.source = source
+        self.source_released = None
+
+    def process(self, data):
+        self.source_released = self.source.output() is None
+        super().process(data)
+
+
+# -------------------------------
+# MEMORY TESTS
+# -------------------------------
+
+def test_store_releases_after_last_consumer():
+    upstream = {"source": [], "a": ["source"], "b": ["source", "a"]}
+    store = OutputStore(upstream, ["source", "a", "b"])
+    store.put("source", [1, 2])
+    assert store.consume(["source"]) == [[1, 2]]
+    store.put("a", [3])
+    assert len(store) == 2
+    assert store.consume(["source", "a"]) == [[1, 2], [3]]
+    assert len(store) == 0
+    # Nobody consumes b's output
+    store.put("b", [4])
+    assert len(store) == 0
+
+
+@pytest.mark.parametrize("mode", ["batch", "threaded"])
+def test_outputs_released_once_consumed(mode):
+    with Pipeline("release", mode=mode) as dag:
+        source = RecordsSource("source", range(10))
+        sink = ReleaseCheckSink("sink", source)
+        source >> Mapper("double", lambda x: 2 * x) >> sink
+    dag.run()
+    assert sink.records == [2 * x for x in range(10)]
+    assert sink.source_released
+
+
+def test_peak_rss_is_reported():
+    with Pipeline("rss") as dag:
+        RecordsSource("source", range(10)) >> CollectSink("sink")
+    dag.run()
+    assert dag.peak_rss > 0
+
+
+def test_monitor_sees_temporary_allocations():
+    with PeakMemoryMonitor() as baseline:
+        pass
+    with PeakMemoryMonitor() as monitor:
+        blob = b"x" * (64 << 20)
+        monitor.sample()
+        del blob
+    assert monitor.peak >= baseline.peak + (32 << 20)
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from petal.src.core.metrics import MetricsHook
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.Splitter import Splitter
+from petal.test.helpers import CollectSink, ListSource
+
+RECORDS = [f"record {i}" for i in range(100)]
+
+
+def slow_upper(record):
+    time.sleep(0.001)
+    return record.upper()
+
+
+def allocate(record):
+    return [record] * 10_000
+
+
+class RecordingHook(MetricsHook):
+    def __init__(self):
+        self.events = []
+
+    def before_operator(self, operator, metrics):
+        self.events.append(("before", operator.operator_id))
+
+    def after_operator(self, operator, metrics):
+        self.events.append(("after", operator.operator_id))
+
+    def on_batch(self, operator, batch, metrics):
+        self.events.append(("batch", operator.operator_id))
+
+
+def build(mode="batch", **kwargs):
+    with Pipeline("metrics", mode=mode, metrics=True, **kwargs) as dag:
+        sink = CollectSink("sink")
+        ListSource("source", RECORDS) >> Filter("even", lambda r: int(r.split()[1]) % 2 == 0) \
+            >> Mapper("upper", slow_upper) >> sink
+    return dag, sink
+
+
+# -------------------------------
+# METRICS TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded", "async"])
+def test_record_counts(mode):
+    dag, sink = build("batch" if mode == "async" else mode)
+    if mode == "async":
+        asyncio.run(dag.run_async())
+    else:
+        dag.run()
+    operators = dag.run_metrics.operators
+    assert operators["even"].records_in == 100
+    assert operators["even"].records_out == 50
+    assert operators["upper"].records_out == 50
+    assert operators["sink"].records_in == 50
+    if mode != "async":
+        assert operators["upper"].bytes_out == sum(len(record) for record in sink.records)
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming"])
+def test_time_is_attributed_to_the_slow_operator(mode):
+    dag, _ = build(mode)
+    dag.run()
+    assert dag.run_metrics.slowest(1)[0].operator_id == "upper"
+    assert dag.run_metrics.operators["upper"].wall_time >= 0.05
+    if mode == "streaming":
+        # The sink pulls through the whole chain, but only its own work is counted
+        assert dag.run_metrics.operators["sink"].blocked_upstream >= 0.05
+        assert dag.run_metrics.operators["sink"].wall_time < 0.05
+
+
+def test_fan_out_buffer_and_blocked_time():
+    with Pipeline("fan_out", mode="streaming", buffer_size=4, metrics=True) as dag:
+        splitter = Splitter("split")
+        ListSource("source", RECORDS) >> splitter
+        splitter >> Mapper("slow", slow_upper) >> CollectSink("slow_sink")
+        splitter >> CollectSink("fast_sink")
+    dag.run()
+    split = dag.run_metrics.operators["split"]
+    assert 0 < split.peak_buffer <= 4
+    assert split.blocked_downstream > 0
+
+
+def test_hooks_and_batches():
+    hook = RecordingHook()
+    with Pipeline("hooks", batch_size=10, hooks=[hook]) as dag:
+        ListSource("source", RECORDS) >> Mapper("upper", str.upper) >> CollectSink("sink")
+    dag.run()
+    assert hook.events[:2] == [("before", "source"), ("batch", "source")]
+    assert hook.events.count(("batch", "upper")) == 10
+    assert hook.events[-1] == ("after", "sink")
+    assert dag.run_metrics.operators["upper"].batches_out == 10
+
+
+def test_fused_stages_and_json_export(tmp_path):
+    dag, _ = build(optimize=True)
+    dag.run()
+    path = tmp_path / "run.json"
+    dag.run_metrics.to_json(str(path))
+    summary = json.loads(path.read_text())
+    assert summary["pipeline"] == "metrics" and summary["peak_rss"] > 0
+    fused = summary["operators"]["even+upper"]
+    assert fused["stages"] == {"even": {"records_in": 100, "records_out": 50},
+                               "upper": {"records_in": 50, "records_out": 50}}
+
+
+def test_profilers():
+    dag, _ = build(profile="cpu")
+    dag.run()
+    assert "slow_upper" in dag.run_metrics.operators["upper"].profile
+
+    with Pipeline("memory", profile="memory") as dag:
+        ListSource("source", RECORDS) >> Mapper("allocate", allocate) >> CollectSink("sink")
+    dag.run()
+    assert dag.run_metrics.operators["allocate"].memory_peak > 100 * 10_000 * 8
+
+    with pytest.raises(ValueError):
+        Pipeline("profiled", mode="streaming", profile="cpu")
+
+
+def test_metrics_disabled_by_default():
+    with Pipeline("plain") as dag:
+        ListSource("source", RECORDS) >> CollectSink("sink")
+    dag.run()
+    assert dag.run_metrics is None
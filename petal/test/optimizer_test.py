@@ -0,0 +1,96 @@
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.FusedOperator import FusedOperator
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.ownership import IMMUTABLE
+from petal.src.plugins.IdentityTransformer import IdentityTransformer
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import RegexMapper
+from petal.src.plugins.Splitter import Splitter
+from petal.test.helpers import CollectSink, ListSource
+
+LINES = [f"{'PING' if i % 2 else 'HELO'} from 10.0.0.{i}\n" for i in range(20)]
+
+
+def build_chain(mode="batch", optimize=True):
+    with Pipeline("chain", mode=mode, optimize=optimize) as dag:
+        sink = CollectSink("sink")
+        (ListSource("source", LINES) >> RegexFilter("pings", "PING") >> IdentityTransformer("identity")
+         >> RegexMapper("ips", r"(?:[0-9]{1,3}\.){3}[0-9]{1,3}") >> Mapper("last_octet", lambda ip: int(ip.split(".")[-1]))
+         >> Filter("small", lambda x: x < 10) >> sink)
+    return dag, sink
+
+
+# -------------------------------
+# OPTIMIZER TESTS
+# -------------------------------
+
+def test_chain_is_fused_and_identity_removed():
+    dag, _ = build_chain()
+    plan = dag.plan()
+    assert plan.removed == ["identity"]
+    assert plan.fused == {"pings+ips+last_octet+small": ["pings", "ips", "last_octet", "small"]}
+    assert plan.upstream["sink"] == ["pings+ips+last_octet+small"]
+    assert plan.upstream["pings+ips+last_octet+small"] == ["source"]
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded"])
+def test_optimized_output_matches_unoptimized(mode):
+    dag, optimized = build_chain(mode, optimize=True)
+    dag.run()
+    dag, unoptimized = build_chain(mode, optimize=False)
+    dag.run()
+    assert optimized.records == unoptimized.records == [1, 3, 5, 7, 9]
+
+
+def test_fused_operator_keeps_per_stage_metrics():
+    mapper = Mapper("double", lambda x: x * 2)
+    evens = Filter("small", lambda x: x < 10)
+    fused = FusedOperator("fused", [mapper, evens])
+    assert list(fused.process(range(10))) == [0, 2, 4, 6, 8]
+    assert fused.stage_metrics == {
+        "double": {"records_in": 10, "records_out": 10},
+        "small": {"records_in": 10, "records_out": 5},
+    }
+
+
+def test_fan_out_is_not_fused():
+    with Pipeline("fan_out", optimize=True) as dag:
+        double = Mapper("double", lambda x: x * 2)
+        ListSource("source", range(3)) >> double
+        double >> Mapper("a", lambda x: x) >> CollectSink("sink_a")
+        double >> Mapper("b", lambda x: x) >> CollectSink("sink_b")
+
+    assert dag.plan().fused == {}
+
+
+def test_single_consumer_splitter_is_collapsed():
+    with Pipeline("splitter", optimize=True) as dag:
+        sink = CollectSink("sink")
+        ListSource("source", range(3)) >> Splitter("splitter") >> sink
+
+    assert dag.plan().upstream["sink"] == ["source"]
+    dag.run()
+    assert sink.records == [0, 1, 2]
+
+
+def test_defensive_splitter_is_kept_when_upstream_is_shared():
+    with Pipeline("shared") as dag:
+        source = ListSource("source", range(3))
+        source >> Splitter("splitter") >> CollectSink("a")
+        source >> CollectSink("b")
+
+    dag.optimize = True
+    assert dag.plan().removed == []
+    dag.ownership = IMMUTABLE
+    assert dag.plan().removed == ["splitter"]
+
+
+def test_explain(capsys):
+    dag, _ = build_chain()
+    text = dag.explain()
+    assert "[pings+ips+last_octet+small] FusedOperator <- source (fused: pings >> ips >> last_octet >> small)" in text
+    assert "Removed pass-through operators: identity" in text
+    assert text in capsys.readouterr().out
@@ -0,0 +1,110 @@
+import pytest
+
+from petal.src.core.ownership import COPY_ON_WRITE, DEEPCOPY, IMMUTABLE, is_immutable, own
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.plugins.Splitter import Splitter
+from petal.test.helpers import CollectSink, ListSource
+
+
+# -------------------------------
+# OWNERSHIP POLICY TESTS
+# -------------------------------
+
+def test_immutable_shares_input():
+    data = [{"a": 1}]
+    assert own(data, IMMUTABLE) is data
+
+
+def test_deepcopy_copies_records():
+    data = [{"a": 1}]
+    copied = own(data, DEEPCOPY)
+    assert copied == data
+    assert copied[0] is not data[0]
+
+
+def test_copy_on_write_only_copies_mutable_records():
+    text, record = "line", {"a": 1}
+    copied = own([text, record], COPY_ON_WRITE)
+    assert copied[0] is text
+    assert copied[1] == record and copied[1] is not record
+
+
+def test_copy_on_write_does_not_copy_for_routing():
+    data = [{"a": 1}]
+    assert own(data, COPY_ON_WRITE, writes=False) is data
+
+
+def test_own_is_lazy_for_iterators():
+    pulled = []
+
+    def stream():
+        for i in range(3):
+            pulled.append(i)
+            yield [i]
+
+    copied = own(stream(), DEEPCOPY)
+    assert pulled == []
+    assert list(copied) == [[0], [1], [2]]
+
+
+def test_is_immutable():
+    assert is_immutable(("a", 1, (2.0, None)))
+    assert not is_immutable(("a", []))
+    assert not is_immutable({"a": 1})
+
+
+# -------------------------------
+# PIPELINE OWNERSHIP TESTS
+# -------------------------------
+
+def mutate(record):
+    record["seen"] = True
+    return record
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming"])
+def test_splitter_shares_records_when_immutable(mode):
+    records = [{"id": i} for i in range(3)]
+    with Pipeline("shared", mode=mode, ownership=IMMUTABLE) as dag:
+        splitter = Splitter("splitter")
+        left, right = CollectSink("left"), CollectSink("right")
+        ListSource("source", records) >> splitter
+        splitter >> left
+        splitter >> right
+
+    dag.run()
+    assert all(a is b for a, b in zip(left.records, records))
+    assert all(a is b for a, b in zip(right.records, records))
+
+
+@pytest.mark.parametrize("ownership", [COPY_ON_WRITE, DEEPCOPY])
+def test_mutating_branch_does_not_leak_into_sibling(ownership):
+    records = [{"id": i} for i in range(3)]
+    with Pipeline("isolated", ownership=ownership) as dag:
+        splitter = Splitter("splitter")
+        mutated, untouched = CollectSink("mutated"), CollectSink("untouched")
+        ListSource("source", records) >> splitter
+        splitter >> Mapper("mutate", mutate) >> mutated
+        splitter >> untouched
+
+    dag.run()
+    assert all(record["seen"] for record in mutated.records)
+    assert all("seen" not in record for record in untouched.records)
+    assert all("seen" not in record for record in records)
+
+
+def test_operator_ownership_overrides_pipeline():
+    records = [{"id": 0}]
+    with Pipeline("override", ownership=IMMUTABLE) as dag:
+        sink = CollectSink("sink")
+        ListSource("source", records) >> Mapper("mutate", mutate, ownership=DEEPCOPY) >> sink
+
+    dag.run()
+    assert sink.records == [{"id": 0, "seen": True}]
+    assert records == [{"id": 0}]
+
+
+def test_unknown_ownership_mode():
+    with pytest.raises(ValueError, match="ownership"):
+        Pipeline("bad", ownership="borrowed")
@@ -0,0 +1,80 @@
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.utils import chunked
+from petal.src.core.operators.Filter import Filter
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.parallel import filter_chunk, map_chunk, parallel_apply
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import RegexMapper
+from petal.test.helpers import CollectSink, ListSource
+
+
+def square(x):
+    return x * x
+
+
+def is_odd(x):
+    return x % 2 == 1
+
+
+# -------------------------------
+# CHUNKED DISPATCH TESTS
+# -------------------------------
+
+def test_chunked():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+
+def test_parallel_apply_ordered():
+    result = parallel_apply(map_chunk, square, range(100), parallelism=2, chunk_size=7)
+    assert list(result) == [x * x for x in range(100)]
+
+
+def test_parallel_apply_unordered():
+    result = parallel_apply(filter_chunk, is_odd, range(100), parallelism=2, chunk_size=7, ordered=False)
+    assert sorted(result) == list(range(1, 100, 2))
+
+
+# -------------------------------
+# PARALLEL OPERATOR TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode", ["batch", "streaming"])
+def test_parallel_mapper_and_filter(mode):
+    with Pipeline("parallel", mode=mode) as dag:
+        sink = CollectSink("sink")
+        odds = Filter("odds", is_odd, parallelism=2, chunk_size=10)
+        squares = Mapper("squares", square, parallelism=2, chunk_size=10)
+        ListSource("source", range(100)) >> odds >> squares >> sink
+
+    dag.run()
+    assert sink.records == [x * x for x in range(1, 100, 2)]
+
+
+def test_parallel_regex_operators():
+    lines = ["PING from 10.0.0.1\n", "HELO from 10.0.0.2\n", "PING from 10.0.0.3\n"]
+    with Pipeline("regex") as dag:
+        sink = CollectSink("sink")
+        pings = RegexFilter("pings", "PING", parallelism=2, chunk_size=1)
+        ips = RegexMapper("ips", r"(?:[0-9]{1,3}\.){3}[0-9]{1,3}", parallelism=2, chunk_size=1)
+        ListSource("source", lines) >> pings >> ips >> sink
+
+    dag.run()
+    assert sink.records == ["10.0.0.1", "10.0.0.3"]
+
+
+def test_validate_rejects_unpicklable_functions():
+    with Pipeline("unpicklable") as dag:
+        ListSource("source", [1]) >> Mapper("lambda", lambda x: x, parallelism=2) >> CollectSink("sink")
+
+    with pytest.raises(ValueError, match="picklable"):
+        dag.validate()
+
+
+def test_in_process_lambda_is_allowed():
+    with Pipeline("in_process") as dag:
+        ListSource("source", [1]) >> Mapper("lambda", lambda x: x) >> CollectSink("sink")
+
+    dag.validate()
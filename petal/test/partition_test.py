@@ -0,0 +1,147 @@
+import pytest
+
+from petal.src.core.aggregation import Count
+from petal.src.core.cluster import LocalCluster
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.partition import Partition
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FileWriter import FileWriter
+from petal.src.plugins.GroupBy import GroupBy
+from petal.src.plugins.HashJoiner import HashJoiner
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import RegexMapper
+from petal.test.helpers import CollectSink, ListSource
+
+LINES = [f"{'HELO' if i % 4 else 'PING'} from 10.0.{i % 7}.{i % 13}" for i in range(2000)]
+IP = r"(?:[0-9]{1,3}\.){3}[0-9]{1,3}"
+
+
+def ip_of(line: str) -> str:
+    return line.split()[-1]
+
+
+def identity(value):
+    return value
+
+
+def first(pair):
+    return pair[0]
+
+
+def build(replicas=4, key=ip_of, mode="batch", batch_size=None, optimize=False, target=None, executors=None):
+    with Pipeline("partitioned", mode=mode, batch_size=batch_size, optimize=optimize, executors=executors) as dag:
+        source = ListSource("source", LINES)
+        sink = CollectSink("sink")
+        with Partition("by_ip", replicas, key=key, target=target):
+            counts = (source >> RegexFilter("helos", "HELO") >> RegexMapper("ips", IP)
+                      >> GroupBy("counts", identity, {"helos": Count()}))
+        counts >> sink
+    return dag, sink
+
+
+def expected_counts() -> list[dict]:
+    dag, sink = build(replicas=1)
+    dag.run()
+    return sorted(sink.records, key=lambda group: group["key"])
+
+
+# -------------------------------
+# PARTITION TESTS
+# -------------------------------
+
+def test_sub_dag_is_replicated():
+    dag, _ = build()
+    plan = dag.plan()
+    assert plan.partitions == {"by_ip": [f"by_ip#{idx}" for idx in range(4)]}
+    assert plan.replicas["counts"] == [f"counts#{idx}" for idx in range(4)]
+    assert plan.upstream["helos#2"] == ["by_ip#2"] and plan.upstream["ips#2"] == ["helos#2"]
+    assert plan.upstream["counts"] == [f"counts#{idx}" for idx in range(4)]
+    assert plan.upstream["sink"] == ["counts"]
+    assert "Replicated operators: helos (x4), ips (x4), counts (x4)" in dag.explain()
+
+
+@pytest.mark.parametrize("mode, batch_size", [("batch", None), ("streaming", None), ("threaded", None),
+                                              ("streaming", 64)])
+def test_keyed_aggregation_matches_single_replica(mode, batch_size):
+    dag, sink = build(mode=mode, batch_size=batch_size, optimize=True)
+    dag.run()
+    assert sorted(sink.records, key=lambda group: group["key"]) == expected_counts()
+
+
+def test_keys_stay_on_one_replica():
+    dag, sink = build(mode="streaming")
+    dag.run()
+    # Each IP is counted by a single replica, so there's a single group per IP
+    keys = [group["key"] for group in sink.records]
+    assert len(keys) == len(set(keys)) == len({ip_of(line) for line in LINES if "HELO" in line})
+
+
+def test_round_robin_spreads_records_evenly():
+    with Pipeline("round_robin", metrics=True) as dag:
+        source, sink = ListSource("source", range(300)), CollectSink("sink")
+        with Partition("spread", 3):
+            source >> Mapper("double", lambda x: 2 * x) >> sink
+
+    dag.run()
+    assert sorted(sink.records) == [2 * x for x in range(300)]
+    assert [dag.run_metrics.operators[f"double#{idx}"].records_out for idx in range(3)] == [100, 100, 100]
+
+
+def test_co_partitioned_join():
+    with Pipeline("join", mode="streaming") as dag:
+        left = ListSource("left", [(i % 50, "left") for i in range(200)])
+        right = ListSource("right", [(i, "right") for i in range(50)])
+        sink = CollectSink("sink")
+        with Partition("by_key", 4, key=first):
+            joiner = HashJoiner("joiner", first)
+            left >> joiner
+            right >> joiner
+        joiner >> sink
+
+    assert set(dag.plan().partitions) == {"by_key:left", "by_key:right"}
+    dag.run()
+    assert len(sink.records) == 200
+    assert all(left_record[0] == right_record[0] for left_record, right_record in sink.records)
+
+
+def test_replicas_on_a_cluster():
+    with LocalCluster(workers=2) as cluster:
+        dag, sink = build(replicas=2, mode="streaming", target="cluster", executors={"cluster": cluster})
+        dag.run()
+        assert sorted(sink.records, key=lambda group: group["key"]) == expected_counts()
+        assert sorted(op_id for worker in cluster.load() for op_id in worker["operators"]) == [
+            "counts#0", "counts#1", "helos#0", "helos#1", "ips#0", "ips#1"]
+
+
+def test_invalid_partitions(tmp_path):
+    with Pipeline("source") as dag:
+        with Partition("with_source", 2):
+            ListSource("source", LINES) >> CollectSink("sink")
+    with pytest.raises(ValueError, match="sources can't be replicated"):
+        dag.plan()
+
+    with Pipeline("writer", mode="threaded") as dag:
+        source = ListSource("source", LINES)
+        with Partition("with_writer", 4):
+            source >> FileWriter("writer", file_path=str(tmp_path / "out.txt"))
+    with pytest.raises(ValueError, match=r"sinks can't be replicated, create \['writer'\]"):
+        dag.run()
+
+    with pytest.raises(ValueError, match="nested"):
+        with Pipeline("nested"):
+            with Partition("outer", 2):
+                with Partition("inner", 2):
+                    Mapper("double", lambda x: 2 * x)
+
+
+def test_planning_within_the_pipeline_context_keeps_its_operators():
+    with Pipeline("in_context", mode="streaming") as dag:
+        source, sink = ListSource("source", range(100)), CollectSink("sink")
+        with Partition("spread", 2):
+            source >> Mapper("double", lambda x: 2 * x) >> sink
+        nodes = dict(dag.nodes)
+        dag.explain()
+        dag.run()
+        dag.run()
+    assert dag.nodes == nodes
+    assert sorted(sink.records) == sorted([2 * x for x in range(100)] * 2)
@@ -0,0 +1,117 @@
+import re
+
+import pytest
+
+from petal.src.core.operators.Route import Route
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.regex import MultiPattern, literal_prefix
+from petal.src.plugins.IdentityTransformer import IdentityTransformer
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.RegexMapper import FirstMatch, RegexMapper
+from petal.src.plugins.Splitter import Splitter
+from petal.test.helpers import CollectSink, ListSource
+
+PATTERNS = ["PING", "PIN", r"^HELO", r"10\.0\.0\.1\d", r"errors?", r"\bfrom\b", "ING from", r"[0-9]+$"]
+LINES = ["PING from 10.0.0.12", "HELO from 10.0.0.3", "error PINGING", "nothing here", "", "from 42",
+         "PINPING", "xHELO errors 10.0.0.19", "PIN", "fromage 7"]
+
+
+def build_splitter(mode="batch", optimize=True):
+    with Pipeline("splitter", mode=mode, optimize=optimize) as dag:
+        source = ListSource("source", [f"{kind} from 10.0.0.{i}" for i in range(30) for kind in ("PING", "HELO", "ACK")])
+        splitter = Splitter("splitter")
+        pings, helos = CollectSink("pings_sink"), CollectSink("ips_sink")
+        source >> splitter
+        splitter >> RegexFilter("pings", "PING") >> pings
+        splitter >> RegexFilter("helos", r"^HELO") >> RegexMapper("ips", r"\d+$") >> helos
+    return dag, pings, helos
+
+
+# -------------------------------
+# MULTI-PATTERN TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("pattern, prefix", [("PING", "PING"), (r"errors?", "error"), (r"10\.0", "10"),
+                                             (r"^HELO", ""), ("a|b", ""), (r"ab{2}", "a")])
+def test_literal_prefix(pattern, prefix):
+    assert literal_prefix(pattern) == prefix
+
+
+def test_matches_agree_with_separate_searches():
+    compiled = [re.compile(pattern) for pattern in PATTERNS]
+    patterns = MultiPattern(compiled)
+    for line in LINES:
+        expected = tuple(idx for idx, pattern in enumerate(compiled) if pattern.search(line))
+        assert patterns.matches(line) == expected, line
+
+
+def test_uncombinable_patterns():
+    with pytest.raises(ValueError):
+        MultiPattern([re.compile(r"(a)\1"), re.compile("b")])
+    with pytest.raises(ValueError):
+        MultiPattern([re.compile("a", re.IGNORECASE), re.compile("b")])
+    with pytest.raises(ValueError):
+        MultiPattern([re.compile("(?i)a"), re.compile("b")])
+
+
+# -------------------------------
+# ROUTING TESTS
+# -------------------------------
+
+def test_sibling_filters_are_routed():
+    dag, _, _ = build_splitter()
+    plan = dag.plan()
+    assert plan.routed == {"helos|pings": ["helos", "pings"]}
+    assert plan.upstream["helos|pings"] == ["source"]
+    assert isinstance(plan.nodes["pings"], Route) and plan.upstream["pings"] == ["helos|pings"]
+    assert "[helos|pings] RegexRouter <- source (routes: helos, pings)" in dag.explain()
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded"])
+def test_routed_output_matches_unoptimized(mode):
+    dag, pings, helos = build_splitter(mode, optimize=True)
+    dag.run()
+    dag, unoptimized_pings, unoptimized_helos = build_splitter(mode, optimize=False)
+    dag.run()
+    assert pings.records == unoptimized_pings.records and len(pings.records) == 30
+    assert helos.records == unoptimized_helos.records == [str(i) for i in range(30)]
+
+
+def test_planning_within_the_pipeline_context_keeps_its_operators():
+    with Pipeline("in_context", optimize=True) as dag:
+        source = ListSource("source", ["PING 1", "HELO 2", "PING 3"])
+        pings, helos = CollectSink("pings_sink"), CollectSink("helos_sink")
+        source >> RegexFilter("pings", "PING") >> pings
+        source >> RegexFilter("helos", "HELO") >> RegexMapper("ids", r"\d+") >> IdentityTransformer("id") >> helos
+        nodes = dict(dag.nodes)
+        dag.explain()
+        dag.run()
+        dag.run()
+    assert dag.nodes == nodes
+    assert pings.records == ["PING 1", "PING 3"] * 2
+    assert helos.records == ["2"] * 2
+
+
+def test_different_flags_are_not_combined():
+    with Pipeline("flags", optimize=True) as dag:
+        source = ListSource("source", ["a", "B"])
+        source >> RegexFilter("a", "a") >> CollectSink("a_sink")
+        source >> RegexFilter("b", re.compile("b", re.IGNORECASE)) >> CollectSink("b_sink")
+
+    assert dag.plan().routed == {}
+
+
+# -------------------------------
+# REGEX MAPPER TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("pattern, record", [(r"\d+", "ab 12 34"), (r"(\d)(\d)", "ab 12 34"), (r"a(x)?", "ab"),
+                                             (r"(\d+)", "ab 12 34")])
+def test_first_match_is_findall_first(pattern, record):
+    compiled = re.compile(pattern)
+    assert FirstMatch(compiled)(record) == compiled.findall(record)[0]
+
+
+def test_first_match_without_match():
+    with pytest.raises(IndexError):
+        FirstMatch(re.compile(r"\d"))("abc")
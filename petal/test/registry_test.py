@@ -0,0 +1,86 @@
+import subprocess
+import sys
+
+import pytest
+
+from petal.src.core import registry
+from petal.src.core.operators.BaseOperator import BaseOperator
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.registry import BUILTIN_PLUGINS, available_plugins, get_plugin, register_plugin
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.test.helpers import CollectSink, ListSource
+
+
+class FakeEntryPoint:
+    def __init__(self, name: str, cls: type):
+        self.name = name
+        self.cls = cls
+        self.loads = 0
+
+    def load(self) -> type:
+        self.loads += 1
+        return self.cls
+
+
+class Uppercase(Mapper):
+    def __init__(self, operator_id: str):
+        super().__init__(operator_id, str.upper)
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(registry, "_plugins", {})
+    monkeypatch.setattr(registry, "_entry_points", {})
+
+
+def test_builtin_plugins_resolve_to_their_class():
+    assert get_plugin("RegexFilter") is RegexFilter
+    for name in BUILTIN_PLUGINS:
+        cls = get_plugin(name)
+        assert cls.__name__ == name and issubclass(cls, BaseOperator)
+
+
+def test_registered_plugin_runs_in_a_pipeline():
+    register_plugin()(Uppercase)
+    register_plugin("shout")(Uppercase)
+    assert get_plugin("Uppercase") is get_plugin("shout") is Uppercase
+    assert {"Uppercase", "shout", "FileReader"}.issubset(available_plugins())
+
+    with Pipeline("registry") as dag:
+        sink = CollectSink("sink")
+        ListSource("source", ["a", "b"]) >> get_plugin("shout")("upper") >> sink
+    dag.run()
+    assert sink.records == ["A", "B"]
+
+
+def test_plugin_names_are_unique():
+    register_plugin()(Uppercase)
+    register_plugin()(Uppercase)
+    with pytest.raises(ValueError, match="already registered"):
+        register_plugin("Uppercase")(Mapper)
+    with pytest.raises(ValueError, match="already registered"):
+        register_plugin("FileReader")(Uppercase)
+
+
+def test_entry_points_are_loaded_on_first_use(monkeypatch):
+    entry_point = FakeEntryPoint("ThirdParty", Uppercase)
+    monkeypatch.setattr(registry, "_entry_points", {"ThirdParty": entry_point})
+    assert "ThirdParty" in available_plugins()
+    assert entry_point.loads == 0
+    assert get_plugin("ThirdParty") is get_plugin("ThirdParty") is Uppercase
+    assert entry_point.loads == 1
+
+
+def test_unknown_plugin():
+    with pytest.raises(ValueError, match="Unknown plugin 'Nope', available plugins: Aggregate"):
+        get_plugin("Nope")
+
+
+def test_startup_defers_optional_imports():
+    code = ("import sys; import petal.src.cli, petal.src.core.pipeline; "
+            "from petal.src.core.registry import get_plugin; get_plugin('MockSqsWriter')('sqs', 'queue', 'us-east-1'); "
+            "print(' '.join(m for m in ('boto3', 'botocore', 'asyncio', 'petal.examples', 'petal.src.bench') "
+            "if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
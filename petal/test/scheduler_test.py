@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.plan import Plan
+from petal.src.core.scheduler import schedule
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+
+# -------------------------------
+# SCHEDULER TESTS
+# -------------------------------
+
+def plan_dependencies(upstream: dict[str, list[str]]) -> dict[str, set[str]]:
+    # The dependencies the threaded runner schedules, ie. the upstream operators of each operator of the plan
+    plan = Plan(dict.fromkeys(upstream), upstream)
+    return {op_id: set(plan.upstream[op_id]) for op_id in plan.execution_order()}
+
+
+def test_schedule_respects_dependencies():
+    finished = []
+    lock = threading.Lock()
+
+    def task(node):
+        with lock:
+            finished.append(node)
+        return node.lower()
+
+    dependencies = plan_dependencies({"A": [], "B": ["A"], "C": ["A"], "D": ["B", "C"]})
+    results = schedule(dependencies, task, max_workers=4)
+    assert results == {"A": "a", "B": "b", "C": "c", "D": "d"}
+    assert finished[0] == "A" and finished[-1] == "D"
+
+
+def test_schedule_runs_independent_nodes_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    # Both tasks must be running at the same time to get past the barrier
+    def task(node):
+        barrier.wait()
+
+    schedule({"A": set(), "B": set()}, task, max_workers=2)
+
+
+def test_schedule_cancels_dependents_of_failed_node():
+    ran = set()
+
+    def task(node):
+        if node == "B":
+            raise RuntimeError("boom")
+        ran.add(node)
+
+    # A -> B -> C, and an independent X -> Y
+    dependencies = plan_dependencies({"A": [], "B": ["A"], "C": ["B"], "X": [], "Y": ["X"]})
+    with pytest.raises(RuntimeError, match="boom"):
+        schedule(dependencies, task, max_workers=2)
+    assert ran == {"A", "X", "Y"}
+
+
+# -------------------------------
+# THREADED PIPELINE TESTS
+# -------------------------------
+
+class SlowSource(ListSource):
+    def process(self):
+        time.sleep(0.2)
+        yield from super().process()
+
+
+def test_threaded_pipeline_overlaps_branches():
+    with Pipeline("threaded", mode="threaded", max_workers=4) as dag:
+        joiner = StreamJoiner("joiner")
+        sink = CollectSink("sink")
+        for idx in range(4):
+            SlowSource(f"source_{idx}", [idx]) >> Mapper(f"double_{idx}", lambda x: x * 2) >> joiner
+        joiner >> sink
+
+    start = time.monotonic()
+    dag.run()
+    # Sequential execution would take 4 * 0.2s
+    assert time.monotonic() - start < 0.6
+    assert sorted(sink.records) == [0, 2, 4, 6]
+
+
+def test_threaded_pipeline_propagates_errors():
+    def explode(x):
+        raise RuntimeError("boom")
+
+    with Pipeline("errors", mode="threaded") as dag:
+        sink = CollectSink("sink")
+        ListSource("source", [1]) >> Mapper("explode", explode) >> sink
+
+    with pytest.raises(RuntimeError, match="boom"):
+        dag.run()
+    assert sink.records == []
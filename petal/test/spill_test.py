@@ -0,0 +1,99 @@
+import copy
+import io
+import os
+
+import pytest
+
+from petal.src.core.operators.Mapper import Mapper
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.spill import (LengthPrefixedSerializer, Materializer, PickleSerializer, SpilledRecords,
+                                  TextSerializer)
+from petal.src.plugins.RegexFilter import RegexFilter
+from petal.src.plugins.Splitter import Splitter
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+LINES = [f"{'PING' if i % 2 else 'HELO'} from 10.0.0.{i}\n" for i in range(2000)]
+
+
+def build(mode="batch", **kwargs):
+    with Pipeline("spill", mode=mode, **kwargs) as dag:
+        pings, all_lines = CollectSink("pings"), CollectSink("all_lines")
+        splitter, joiner = Splitter("split"), StreamJoiner("join")
+        ListSource("source", LINES) >> splitter
+        splitter >> RegexFilter("filter_pings", "PING") >> pings
+        splitter >> Mapper("upper", str.upper) >> joiner
+        splitter >> joiner >> all_lines
+    return dag, pings, all_lines
+
+
+# -------------------------------
+# SPILL TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("serializer, records", [
+    (PickleSerializer(), [{"a": 1}, None, (1, 2), "text"]),
+    (TextSerializer(), ["plain", "with\nnewline\n", "back\\slash\\n", ""]),
+    (LengthPrefixedSerializer(), [b"", b"\x00\n\xff", b"bytes" * 100]),
+])
+def test_serializers_round_trip(serializer, records):
+    f = io.BytesIO()
+    assert serializer.write(f, records) == len(records)
+    f.seek(0)
+    assert list(serializer.read(f)) == records
+
+
+def test_spilled_records_replay_and_cleanup(tmp_path):
+    spilled = SpilledRecords(PickleSerializer(), str(tmp_path))
+    spilled.extend([[1], [2]])
+    spilled.seal()
+    first, second = list(spilled), list(spilled)
+    assert first == second == [[1], [2]] and len(spilled) == 2
+    # Every iteration deserializes new records, so copies can share the file
+    assert first[0] is not second[0]
+    assert copy.deepcopy(spilled) is spilled
+    path = spilled.path
+    del spilled
+    assert not os.path.exists(path)
+
+
+def test_materializer_spills_past_budget(tmp_path):
+    materializer = Materializer(memory_budget=10_000, spill_dir=str(tmp_path))
+    small = materializer.materialize("small", iter(["x"] * 10))
+    assert small == ["x"] * 10
+    big = materializer.materialize("big", iter(LINES))
+    assert isinstance(big, SpilledRecords) and list(big) == LINES
+    used = materializer.used
+    materializer.release("small")
+    assert materializer.used < used
+
+
+@pytest.mark.parametrize("mode", ["batch", "threaded"])
+@pytest.mark.parametrize("serializer", ["pickle", "text"])
+def test_pipeline_output_unchanged_when_spilling(tmp_path, monkeypatch, mode, serializer):
+    dag, expected_pings, expected_all = build(mode)
+    dag.run()
+
+    spilled = []
+    spill = Materializer._spill
+
+    def recording_spill(self, op_id, *args):
+        spilled.append(op_id)
+        return spill(self, op_id, *args)
+
+    monkeypatch.setattr(Materializer, "_spill", recording_spill)
+
+    dag, pings, all_lines = build(mode, memory_budget=20_000, spill_serializer=serializer, spill_dir=str(tmp_path))
+    dag.run()
+    assert pings.records == expected_pings.records
+    assert all_lines.records == expected_all.records
+    assert "source" in spilled
+    # Spill files are removed once their outputs are released
+    assert os.listdir(tmp_path) == []
+
+
+def test_invalid_spill_configuration():
+    with pytest.raises(ValueError):
+        Pipeline("bad", spill_serializer="json")
+    with pytest.raises(ValueError):
+        Pipeline("bad", mode="streaming", memory_budget=1 << 20)
@@ -0,0 +1,106 @@
+import time
+from typing import Any, Iterable
+
+import pytest
+
+from petal.src.core.operators.Writer import Writer
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.FakeSqsClient import FakeSqsClient
+from petal.src.plugins.SqsReader import SqsReader
+from petal.test.helpers import CollectSink
+
+
+@pytest.fixture
+def client():
+    client = FakeSqsClient(("queue",))
+    url = client.get_queue_url(QueueName="queue")["QueueUrl"]
+    for start in range(0, 100, 10):
+        client.send_message_batch(QueueUrl=url, Entries=[{"Id": str(i), "MessageBody": f"message {i}"}
+                                                          for i in range(start, start + 10)])
+    return client
+
+
+def make_reader(client, **kwargs) -> SqsReader:
+    kwargs.setdefault("idle_timeout", 0.2)
+    return SqsReader("read", "queue", sqs_client=client, backoff=0.001, **kwargs)
+
+
+class FailingSink(Writer):
+    def process(self, data: Iterable[Any]) -> None:
+        for _ in data:
+            raise RuntimeError("boom")
+
+
+class SlowSink(CollectSink):
+    def process(self, data: Iterable[Any]) -> None:
+        for record in data:
+            time.sleep(0.03)
+            self.records.append(record)
+
+
+# -------------------------------
+# SQS READER TESTS
+# -------------------------------
+
+@pytest.mark.parametrize("mode", ["batch", "streaming"])
+def test_messages_are_deleted_once_processed(client, mode):
+    with Pipeline("sqs", mode=mode) as dag:
+        reader = make_reader(client)
+        sink = CollectSink("collect")
+        reader >> sink
+    dag.run()
+
+    assert sorted(sink.records) == sorted(f"message {i}" for i in range(100))
+    assert client.messages(reader.queue_url) == []
+    assert reader.stats["received"] == reader.stats["deleted"] == 100
+
+
+def test_stops_after_max_messages(client):
+    with Pipeline("sqs") as dag:
+        reader = make_reader(client, max_messages=25, idle_timeout=None)
+        sink = CollectSink("collect")
+        reader >> sink
+    dag.run()
+    assert len(sink.records) == 25
+    assert len(client.messages(reader.queue_url)) == 75
+
+
+def test_failed_runs_leave_messages_to_be_redelivered(client):
+    with Pipeline("sqs", mode="streaming") as dag:
+        reader = make_reader(client, visibility_timeout=60)
+        reader >> FailingSink("fail")
+    with pytest.raises(RuntimeError):
+        dag.run()
+
+    assert len(client.messages(reader.queue_url)) == 100
+    # Released right away rather than after the visibility timeout
+    assert len(list(make_reader(client).process())) == 100
+
+
+def test_visibility_is_extended_for_slow_pipelines(client):
+    with Pipeline("sqs", mode="streaming") as dag:
+        reader = make_reader(client, max_messages=40, visibility_timeout=1, receivers=2, buffer_size=10)
+        sink = SlowSink("slow")
+        reader >> sink
+    dag.run()
+
+    assert len(sink.records) == len(set(sink.records)) == 40
+    assert reader.stats["extended"] > 0
+    assert client.calls["ReceiveMessage"] >= 4
+
+
+def test_stop_ends_the_stream(client):
+    reader = make_reader(client, max_messages=1000, idle_timeout=None, wait_time=0, buffer_size=5)
+    records = []
+    for record in reader.process():
+        records.append(record)
+        if len(records) == 10:
+            reader.stop()
+    reader.commit()
+    assert 10 <= len(records) < 100
+    assert len(client.messages(reader.queue_url)) == 100 - len(records)
+
+
+def test_endless_runs_are_rejected(client):
+    with pytest.raises(ValueError, match="max_messages or idle_timeout"):
+        make_reader(client, idle_timeout=None)
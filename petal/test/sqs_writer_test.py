@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.plugins.AsyncSqsWriter import AsyncSqsWriter
+from petal.src.plugins.FakeSqsClient import FakeSqsClient
+from petal.src.plugins.SqsWriter import SqsWriter
+from petal.test.helpers import ListSource
+
+
+def make_writer(client, **kwargs) -> SqsWriter:
+    return SqsWriter("write", "queue", sqs_client=client, backoff=0.001, **kwargs)
+
+
+class AsyncioSqsClient:
+    """Wraps a FakeSqsClient into a client whose calls are coroutines, like aiobotocore's."""
+
+    def __init__(self, client: FakeSqsClient, latency: float):
+        self.client = client
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def get_queue_url(self, **kwargs) -> dict:
+        return self.client.get_queue_url(**kwargs)
+
+    async def send_message_batch(self, **kwargs) -> dict:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.client.send_message_batch(**kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def run_async_writer(client, messages, **kwargs) -> AsyncSqsWriter:
+    with Pipeline("sqs_async") as dag:
+        writer = AsyncSqsWriter("write", "queue", sqs_client=client, backoff=0.001, **kwargs)
+        ListSource("read", messages) >> writer
+    asyncio.run(dag.run_async())
+    return writer
+
+
+# -------------------------------
+# SQS WRITER TESTS
+# -------------------------------
+
+def test_writes_every_message_concurrently():
+    client = FakeSqsClient(("queue",), latency=0.01)
+    messages = [f"message {i}" for i in range(200)]
+    with Pipeline("sqs") as dag:
+        writer = make_writer(client, max_in_flight=4)
+        ListSource("read", messages) >> writer
+    dag.run()
+
+    assert sorted(client.messages(writer.queue_url)) == sorted(messages)
+    assert client.calls["SendMessageBatch"] == 20
+    assert client.peak_in_flight == 4
+    summary = writer.summary()
+    assert summary["sent"] == 200 and summary["failed"] == 0 and summary["messages_per_sec"] > 0
+
+
+def test_batches_are_packed_by_size():
+    writer = make_writer(FakeSqsClient(("queue",)), max_batch_bytes=1000)
+    batches = list(writer.pack_batches(["x" * 400] * 5 + ["y"] * 12))
+    assert [len(batch) for batch in batches] == [2, 2, 10, 3]
+
+    with pytest.raises(ValueError, match="exceeds"):
+        list(writer.pack_batches(["x" * 1001]))
+
+
+def test_failed_entries_are_retried():
+    client = FakeSqsClient(("queue",), failure_rate=0.3)
+    writer = make_writer(client, max_retries=20)
+    writer.process(f"message {i}" for i in range(100))
+    assert len(client.messages(writer.queue_url)) == 100
+    assert writer.summary()["retries"] > 0
+
+
+def test_sender_faults_fail_the_write_once_the_rest_is_sent():
+    client = FakeSqsClient(("queue",), fail_entry=lambda entry: "InvalidMessageContents" if "bad" in entry["MessageBody"] else None)
+    writer = make_writer(client)
+    with pytest.raises(RuntimeError, match="1 messages couldn't be sent"):
+        writer.process(["ok 1", "bad", "ok 2"])
+    assert client.messages(writer.queue_url) == ["ok 1", "ok 2"]
+    assert writer.failed == [("bad", "InvalidMessageContents")]
+    assert client.calls["SendMessageBatch"] == 1
+
+
+def test_missing_queue():
+    with pytest.raises(ClientError):
+        make_writer(FakeSqsClient(("other",)))
+
+
+def test_async_writer_keeps_hundreds_of_requests_in_flight():
+    client = AsyncioSqsClient(FakeSqsClient(("queue",)), latency=0.05)
+    messages = [f"message {i}" for i in range(5000)]
+    writer = run_async_writer(client, messages, max_in_flight=200)
+
+    assert sorted(client.client.messages(writer.queue_url)) == sorted(messages)
+    assert client.peak_in_flight == 200
+    assert writer.summary()["sent"] == 5000 and writer.summary()["requests"] == 500
+
+
+def test_async_writer_with_a_blocking_client():
+    client = FakeSqsClient(("queue",), latency=0.01, failure_rate=0.2)
+    messages = [f"message {i}" for i in range(300)]
+    writer = run_async_writer(client, messages, max_in_flight=10, max_retries=20)
+
+    assert sorted(client.messages(writer.queue_url)) == sorted(messages)
+    assert client.peak_in_flight == 10
+    assert writer.summary()["retries"] > 0
+
+
+def test_async_writer_sender_faults():
+    client = AsyncioSqsClient(FakeSqsClient(("queue",), fail_entry=lambda entry: "InvalidMessageContents"
+                                            if "bad" in entry["MessageBody"] else None), latency=0)
+    with pytest.raises(RuntimeError, match="1 messages couldn't be sent"):
+        run_async_writer(client, ["ok 1", "bad", "ok 2"])
+    queue_url = client.client.get_queue_url(QueueName="queue")["QueueUrl"]
+    assert client.client.messages(queue_url) == ["ok 1", "ok 2"]
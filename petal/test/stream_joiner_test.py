@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from petal.src.core.pipeline import Pipeline
+from petal.src.core.streams import interleave
+from petal.src.plugins.StreamJoiner import StreamJoiner
+from petal.test.helpers import CollectSink, ListSource
+
+
+class SlowSource(ListSource):
+    """Waits before yielding its records."""
+
+    def process(self):
+        time.sleep(0.3)
+        yield from super().process()
+
+
+def fan_in(mode, fan_in_mode, make_sources, **kwargs):
+    with Pipeline("fan_in", mode=mode) as dag:
+        joiner = StreamJoiner("join", fan_in=fan_in_mode, **kwargs)
+        sink = CollectSink("sink")
+        for source in make_sources():
+            source >> joiner
+        joiner >> sink
+    dag.run()
+    return sink.records
+
+
+# -------------------------------
+# STREAM JOINER TESTS
+# -------------------------------
+
+def test_as_available_isnt_held_back_by_a_slow_input():
+    def sources():
+        return [SlowSource("slow", ["slow 1", "slow 2"]), ListSource("fast", ["fast 1", "fast 2"])]
+
+    assert fan_in("streaming", "as_available", sources) == ["fast 1", "fast 2", "slow 1", "slow 2"]
+    assert fan_in("streaming", "concatenate", sources) == ["slow 1", "slow 2", "fast 1", "fast 2"]
+
+
+@pytest.mark.parametrize("mode", ["batch", "streaming", "threaded"])
+def test_sorted_merge(mode):
+    def sources():
+        return [ListSource(f"source_{i}", [(t, i) for t in range(i, 30, 3)]) for i in range(3)]
+
+    records = fan_in(mode, "sorted_merge", sources, key=lambda record: record[0])
+    assert records == [(t, t % 3) for t in range(30)]
+
+
+def test_interleave_keeps_the_order_of_each_stream():
+    merged = list(interleave([iter(range(0, 1000)), iter(range(1000, 2000))], buffer_size=10))
+    assert sorted(merged) == list(range(2000))
+    assert [record for record in merged if record < 1000] == list(range(1000))
+
+
+def test_interleave_raises_upstream_errors():
+    def failing():
+        yield 1
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        list(interleave([failing(), iter(range(10))]))
+
+
+def test_unknown_fan_in_mode():
+    with pytest.raises(ValueError):
+        StreamJoiner("join", fan_in="random")
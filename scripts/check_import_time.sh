@@ -0,0 +1,39 @@
+#!/bin/bash
+set -e
+
+# What `petal run <file>` imports before running a pipeline
+IMPORTS="import petal.src.cli, petal.src.core.pipeline"
+# Modules only some operators or commands need, which must not be imported at startup
+DEFERRED="boto3 botocore asyncio inspect petal.examples petal.src.bench"
+BUDGET_MS=${PETAL_IMPORT_BUDGET_MS:-120}
+RUNS=5
+
+echo "⏱️  Measuring the import time of petal run (budget: ${BUDGET_MS}ms)..."
+
+# Without up-to-date bytecode, the modules would be compiled as part of the measurement
+python -m compileall -q petal > /dev/null
+
+best=""
+for _ in $(seq $RUNS); do
+  # Sum of the cumulative time of the top-level imports, in microseconds
+  total=$(python -X importtime -c "$IMPORTS" 2>&1 | awk -F'|' '$3 ~ /^ [^ ]/ && $2 ~ /[0-9]/ {sum += $2} END {print sum}')
+  if [[ -z "$best" || "$total" -lt "$best" ]]; then
+    best=$total
+  fi
+done
+
+imported=$(python -X importtime -c "$IMPORTS" 2>&1 | awk -F'|' '{gsub(/ /, "", $3); print $3}')
+for module in $DEFERRED; do
+  if echo "$imported" | grep -qx "$module"; then
+    echo "❌ $module is imported at startup"
+    exit 1
+  fi
+done
+
+if [[ "$best" -gt $((BUDGET_MS * 1000)) ]]; then
+  echo "❌ Import time over budget: $((best / 1000))ms > ${BUDGET_MS}ms"
+  echo "   Run: python -X importtime -c \"$IMPORTS\""
+  exit 1
+fi
+
+echo "✅ Import time within budget: $((best / 1000))ms <= ${BUDGET_MS}ms"